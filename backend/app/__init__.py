@@ -2,38 +2,115 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from config import Config
+from app.utils.db_routing import RoutingSession
 
 # Initialize extensions
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
 
+    # Structured, queue-backed logging with request correlation ids
+    from app.utils.structured_logging import init_logging
+    init_logging(app)
+
+    # Fast JSON encoding with native datetime support
+    from app.utils.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+
+    # Connection pool sizing and instrumentation
+    from app.utils.db_pool import configure_pool, init_pool
+    configure_pool(app)
+
     # Initialize extensions
     db.init_app(app)
 
+    # Prometheus metrics (first, so every later request hook is inside the measurement)
+    if app.config['METRICS_ENABLED']:
+        from app.utils.metrics import init_metrics
+        init_metrics(app, db)
+
+    init_pool(app, db)
+
+    # Coalesce mark-read writes and flush them in the background
+    from app.utils.read_buffer import init_read_buffer
+    init_read_buffer(app, db)
+
+    # Count and time SQL per request (sampled)
+    if app.config['SQL_PROFILE_SAMPLE_RATE'] > 0:
+        from app.utils.sql_profiler import init_sql_profiler
+        init_sql_profiler(app, db)
+
+    # Route GET reads to read replicas when configured
+    if app.config['REPLICA_BIND_KEYS']:
+        from app.utils.db_routing import init_replicas
+        init_replicas(app, db)
+
+    # Attachment storage (local directory or S3-compatible bucket)
+    from app.utils.storage import init_storage
+    init_storage(app)
+
+    # Online and typing state (in memory, or Redis for several workers)
+    from app.utils.presence import init_presence
+    init_presence(app)
+
+    # Serialized inboxes per user, invalidated by the writes that change them
+    from app.utils.inbox_cache import init_inbox_cache
+    init_inbox_cache(app)
+
+    # Newest messages of active conversations, served without querying
+    from app.utils.recent_messages import init_recent_messages
+    init_recent_messages(app)
+
     # Configure CORS to allow requests from frontend
     CORS(app, resources={
         r"/api/*": {
             "origins": ["http://localhost:3000", "https://*.vercel.app"],
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"],
+            "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key", "X-Primary-Until"],
+            "expose_headers": ["Idempotent-Replayed", "X-Primary-Until"],
             "supports_credentials": True
         }
     })
 
 
     # Register blueprints
-    from app.routes import auth, messaging, jobs, users, admin
+    from app.routes import auth, messaging, jobs, users, admin, batch, presence
     app.register_blueprint(auth.bp)
     app.register_blueprint(messaging.bp)
     app.register_blueprint(jobs.bp)
     app.register_blueprint(users.bp)
     app.register_blueprint(admin.bp)
+    app.register_blueprint(batch.bp)
+    app.register_blueprint(presence.bp)
+
+    # Compress JSON responses according to Accept-Encoding
+    if app.config['COMPRESSION_ENABLED']:
+        from app.utils.compression import init_compression
+        init_compression(app)
+
+    # Configure ORM mappers now rather than on the first query, so preloaded workers inherit them
+    from sqlalchemy.orm import configure_mappers
+    configure_mappers()
+
+    @app.cli.command('init-db')
+    def init_db():
+        """Create missing database tables"""
+        db.create_all(bind_key=None)
+        print('Database tables created')
+
+    # `flask seed`: bulk synthetic data for load testing
+    from app.utils.seed import seed_command
+    app.cli.add_command(seed_command)
+
+    # `flask gc-uploads`: quarantine and delete attachments no message refers to
+    from app.utils.upload_gc import gc_uploads_command
+    app.cli.add_command(gc_uploads_command)
 
-    # Create database tables
-    with app.app_context():
-        db.create_all()
+    # Create database tables (skipped in production to keep worker startup fast)
+    if app.config['DB_CREATE_ALL']:
+        with app.app_context():
+            db.create_all(bind_key=None)
 
     return app
@@ -1,5 +1,9 @@
 from app import db
 from datetime import datetime, timezone
+from app.utils.serializers import ModelSchema
+
+# Sentinel for "load from the relationship" in Conversation.to_dict
+_LOAD = object()
 
 class Conversation(db.Model):
     __tablename__ = 'conversations'
@@ -8,33 +12,174 @@ class Conversation(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+    # Group conversations (1:1 conversations have is_group=False and no name)
+    is_group = db.Column(db.Boolean, default=False, nullable=False)
+    name = db.Column(db.String(120), nullable=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=True)
+    member_count = db.Column(db.Integer, default=0, nullable=False)
+
+    # Incremented once per message; a member's unread count is message_seq - last_read_seq
+    message_seq = db.Column(db.Integer, default=0, nullable=False)
+
+    # Bytes of attachments in the conversation, kept current on upload and delete (see app.utils.storage_quota)
+    storage_bytes = db.Column(db.BigInteger, default=0, nullable=False, index=True)
+
     # Relationships
     participants = db.relationship('ConversationParticipant', back_populates='conversation', cascade='all, delete-orphan')
     messages = db.relationship('Message', back_populates='conversation', cascade='all, delete-orphan', order_by='Message.created_at')
 
-    def to_dict(self, current_user_id=None):
-        """Convert conversation to dictionary"""
-        last_message = self.messages[-1] if self.messages else None
+    @classmethod
+    def find_direct(cls, user_id, other_user_id):
+        """Find the 1:1 conversation between two users, or None"""
+        return db.session.query(cls).join(
+            ConversationParticipant, cls.id == ConversationParticipant.conversation_id
+        ).filter(
+            cls.is_group.is_(False),
+            ConversationParticipant.user_id.in_([user_id, other_user_id])
+        ).group_by(cls.id).having(
+            db.func.count(ConversationParticipant.user_id) == 2
+        ).first()
+
+    @classmethod
+    def create_direct(cls, user_id, other_user_id):
+        """Create (and flush) a 1:1 conversation between two users"""
+        conversation = cls(is_group=False, member_count=0)
+        db.session.add(conversation)
+        db.session.flush()  # Get conversation ID
+        conversation.add_members([user_id, other_user_id])
+        db.session.flush()
+        return conversation
+
+    def add_members(self, user_ids):
+        """
+        Add users to the conversation
+
+        New members start with everything already sent marked as read.
+
+        Returns:
+            List of the created ConversationParticipant rows
+        """
+        members = [
+            ConversationParticipant(
+                conversation_id=self.id,
+                user_id=user_id,
+                last_read_seq=self.message_seq
+            )
+            for user_id in user_ids
+        ]
+        db.session.add_all(members)
+        self.member_count = Conversation.member_count + len(members)
+        return members
+
+    def remove_member(self, membership):
+        """
+        Remove a member (ConversationParticipant row) from the conversation
+
+        When the owner leaves, ownership passes to the longest-standing
+        remaining member (none left: the group keeps no owner).
+        """
+        db.session.delete(membership)
+        self.member_count = Conversation.member_count - 1
+        if self.created_by == membership.user_id:
+            successor = db.session.query(ConversationParticipant.user_id).filter(
+                ConversationParticipant.conversation_id == self.id,
+                ConversationParticipant.user_id != membership.user_id
+            ).order_by(ConversationParticipant.joined_at.asc(), ConversationParticipant.id.asc()).first()
+            self.created_by = successor[0] if successor else None
+
+    def record_message(self, sender_membership=None):
+        """
+        Account for a new message in the conversation
+
+        Bumps message_seq and updated_at in a single UPDATE of the conversation
+        row and marks the message read for its sender. Other members' unread
+        counts follow from message_seq, so no per-member rows are written.
+
+        Returns:
+            The new message_seq
+        """
+        self.message_seq = Conversation.message_seq + 1
+        self.updated_at = datetime.utcnow()
+        db.session.flush()
+
+        if sender_membership is not None:
+            sender_membership.last_read_seq = self.message_seq
+        return self.message_seq
+
+    def to_dict(self, current_user_id=None, embed_users=True, last_message=_LOAD, fields=None, membership=None):
+        """
+        Convert conversation to dictionary
+
+        Args:
+            current_user_id: ID of the user viewing the conversation
+            embed_users: Embed full user dictionaries. When False, only user ids
+                are emitted (participant_ids, other_participant_id) and the caller
+                side-loads the users.
+            last_message: Pre-loaded last message (or None if there is none).
+                Loaded from the relationship when omitted.
+            fields: Only emit (and load) these fields; None for all of them
+            membership: Pre-loaded ConversationParticipant row of current_user_id
+
+        Member lists of group conversations are not embedded (participants /
+        participant_ids are None); they are paged through the members endpoint.
+        """
+        def wanted(name):
+            return fields is None or name in fields
+
+        other_key = 'other_participant' if embed_users else 'other_participant_id'
+        list_key = 'participants' if embed_users else 'participant_ids'
+
+        data = CONVERSATION_SCHEMA.only(fields).dump(self)
 
-        # Get unread count for current user
-        unread_count = 0
-        other_participant = None
+        if wanted('last_message'):
+            if last_message is _LOAD:
+                last_message = self.messages[-1] if self.messages else None
+            data['last_message'] = last_message.to_dict(embed_sender=embed_users) if last_message else None
+
+        if wanted('unread_count'):
+            # Get unread count for current user
+            if membership is None and current_user_id:
+                membership = self.membership_of(current_user_id)
+            data['unread_count'] = membership.unread_count if membership else 0
+
+        if not (wanted(other_key) or wanted(list_key)):
+            return data
+
+        if self.is_group:
+            if wanted(other_key):
+                data[other_key] = None
+            if wanted(list_key):
+                data[list_key] = None
+            return data
+
+        other_participant_id = None
         if current_user_id:
             for participant in self.participants:
-                if participant.user_id == current_user_id:
-                    unread_count = participant.unread_count
-                else:
-                    other_participant = participant.user.to_dict()
-
-        return {
-            'id': self.id,
-            'created_at': self.created_at.isoformat() + 'Z',
-            'updated_at': self.updated_at.isoformat() + 'Z',
-            'last_message': last_message.to_dict() if last_message else None,
-            'unread_count': unread_count,
-            'other_participant': other_participant,
-            'participants': [p.user.to_dict() for p in self.participants]
-        }
+                if participant.user_id != current_user_id:
+                    other_participant_id = participant.user_id
+
+        if embed_users:
+            users = {p.user_id: p.user.to_dict() for p in self.participants}
+            if wanted('other_participant'):
+                data['other_participant'] = users.get(other_participant_id)
+            if wanted('participants'):
+                data['participants'] = list(users.values())
+        else:
+            if wanted('other_participant_id'):
+                data['other_participant_id'] = other_participant_id
+            if wanted('participant_ids'):
+                data['participant_ids'] = [p.user_id for p in self.participants]
+        return data
+
+    def membership_of(self, user_id):
+        """Get the ConversationParticipant row of a user, or None"""
+        if not self.is_group:
+            for participant in self.participants:
+                if participant.user_id == user_id:
+                    return participant
+            return None
+        # Avoid loading every member of a large group
+        return ConversationParticipant.query.filter_by(conversation_id=self.id, user_id=user_id).first()
 
 
 class ConversationParticipant(db.Model):
@@ -43,7 +188,7 @@ class ConversationParticipant(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     conversation_id = db.Column(db.Integer, db.ForeignKey('conversations.id'), nullable=False)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
-    unread_count = db.Column(db.Integer, default=0)
+    last_read_seq = db.Column(db.Integer, default=0, nullable=False)  # Conversation.message_seq when last read
     joined_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -53,6 +198,24 @@ class ConversationParticipant(db.Model):
     # Ensure a user can only be in a conversation once
     __table_args__ = (db.UniqueConstraint('conversation_id', 'user_id', name='unique_conversation_participant'),)
 
+    @property
+    def unread_count(self):
+        """Number of messages sent since this member last read the conversation"""
+        return max((self.conversation.message_seq or 0) - (self.last_read_seq or 0), 0)
+
+    def mark_read(self):
+        """
+        Mark everything in the conversation as read
+
+        Returns:
+            True if the read position moved (a write is needed), else False
+        """
+        seq = self.conversation.message_seq or 0
+        if self.last_read_seq == seq:
+            return False
+        self.last_read_seq = seq
+        return True
+
 
 class Message(db.Model):
     __tablename__ = 'messages'
@@ -71,23 +234,52 @@ class Message(db.Model):
     file_size = db.Column(db.Integer, nullable=True)  # Size in bytes
     file_type = db.Column(db.String(100), nullable=True)  # MIME type
 
+    # Client-generated id (Idempotency-Key) so a retried send returns the original message
+    client_message_id = db.Column(db.String(64), nullable=True)
+
     # Relationships
     conversation = db.relationship('Conversation', back_populates='messages')
     sender = db.relationship('User', back_populates='messages')
 
-    def to_dict(self):
-        """Convert message to dictionary"""
-        return {
-            'id': self.id,
-            'conversation_id': self.conversation_id,
-            'sender_id': self.sender_id,
-            'sender': self.sender.to_dict() if self.sender else None,
-            'content': self.content,
-            'created_at': self.created_at.isoformat() + 'Z',
-            'is_system_message': self.is_system_message,
-            'has_attachment': self.has_attachment,
-            'file_name': self.file_name,
-            'file_path': self.file_path,
-            'file_size': self.file_size,
-            'file_type': self.file_type
-        }
+    __table_args__ = (
+        # Message pages and "last message" lookups scan by conversation in id order
+        db.Index('ix_messages_conversation_id_id', 'conversation_id', 'id'),
+        # One message per sender and client id (NULLs, i.e. sends without a key, never collide)
+        db.Index('ux_messages_sender_id_client_message_id', 'sender_id', 'client_message_id', unique=True),
+        # Attachment downloads and the upload sweeper look messages up by storage key
+        db.Index('ix_messages_file_path', 'file_path'),
+    )
+
+    def to_dict(self, embed_sender=True, fields=None):
+        """
+        Convert message to dictionary
+
+        Args:
+            embed_sender: Embed the sender's user dictionary. When False only
+                sender_id is emitted and the caller side-loads the sender.
+            fields: Only emit (and load) these fields; None for all of them
+        """
+        data = MESSAGE_SCHEMA.only(fields).dump(self)
+        if embed_sender and (fields is None or 'sender' in fields):
+            data['sender'] = self.sender.to_dict() if self.sender else None
+        return data
+
+
+CONVERSATION_SCHEMA = ModelSchema(
+    'id', 'name', 'is_group', 'created_by', 'member_count', 'created_at', 'updated_at'
+)
+
+CONVERSATION_FIELDS = CONVERSATION_SCHEMA.fields + (
+    'last_message', 'unread_count', 'other_participant', 'participants'
+)
+
+CONVERSATION_FIELDS_NORMALIZED = CONVERSATION_SCHEMA.fields + (
+    'last_message', 'unread_count', 'other_participant_id', 'participant_ids'
+)
+
+MESSAGE_SCHEMA = ModelSchema(
+    'id', 'conversation_id', 'sender_id', 'content', 'created_at', 'is_system_message',
+    'has_attachment', 'file_name', 'file_path', 'file_size', 'file_type', 'client_message_id'
+)
+
+MESSAGE_FIELDS = MESSAGE_SCHEMA.fields + ('sender',)
@@ -1,5 +1,6 @@
 from app import db
 from datetime import datetime
+from app.utils.serializers import ModelSchema
 
 class JobApplication(db.Model):
     __tablename__ = 'job_applications'
@@ -16,14 +17,11 @@ class JobApplication(db.Model):
     student = db.relationship('User', foreign_keys=[student_id])
     employer = db.relationship('User', foreign_keys=[employer_id])
 
-    def to_dict(self):
-        """Convert job application to dictionary"""
-        return {
-            'id': self.id,
-            'student_id': self.student_id,
-            'employer_id': self.employer_id,
-            'job_title': self.job_title,
-            'status': self.status,
-            'applied_at': self.applied_at.isoformat() + 'Z',
-            'updated_at': self.updated_at.isoformat() + 'Z'
-        }
+    def to_dict(self, fields=None):
+        """Convert job application to dictionary (optionally only the given fields)"""
+        return JOB_APPLICATION_SCHEMA.only(fields).dump(self)
+
+
+JOB_APPLICATION_SCHEMA = ModelSchema(
+    'id', 'student_id', 'employer_id', 'job_title', 'status', 'applied_at', 'updated_at'
+)
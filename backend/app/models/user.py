@@ -1,6 +1,7 @@
 from app import db
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime
+from app.utils.serializers import ModelSchema
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -13,6 +14,9 @@ class User(db.Model):
     full_name = db.Column(db.String(120))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Bytes of attachments sent, kept current on upload and delete (see app.utils.storage_quota)
+    storage_bytes = db.Column(db.BigInteger, default=0, nullable=False, index=True)
+
     # Relationships
     conversation_participants = db.relationship('ConversationParticipant', back_populates='user', cascade='all, delete-orphan')
     messages = db.relationship('Message', back_populates='sender', cascade='all, delete-orphan')
@@ -25,13 +29,9 @@ class User(db.Model):
         """Check if provided password matches the hash"""
         return check_password_hash(self.password_hash, password)
 
-    def to_dict(self):
-        """Convert user object to dictionary"""
-        return {
-            'id': self.id,
-            'email': self.email,
-            'username': self.username,
-            'user_type': self.user_type,
-            'full_name': self.full_name,
-            'created_at': (self.created_at.isoformat() + 'Z') if self.created_at else None
-        }
+    def to_dict(self, fields=None):
+        """Convert user object to dictionary (optionally only the given fields)"""
+        return USER_SCHEMA.only(fields).dump(self)
+
+
+USER_SCHEMA = ModelSchema('id', 'email', 'username', 'user_type', 'full_name', 'created_at')
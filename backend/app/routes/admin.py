@@ -1,8 +1,11 @@
-from flask import Blueprint, jsonify, render_template_string
+from flask import Blueprint, jsonify, render_template_string, request, current_app
+from sqlalchemy.orm import load_only
 from app import db
 from app.models.user import User
 from app.models.conversation import Conversation, ConversationParticipant, Message
 from app.models.job_application import JobApplication
+from app.utils.db_pool import pool_stats
+from app.utils.decorators import admin_token_required, statement_timeout
 
 bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -275,6 +278,7 @@ HTML_TEMPLATE = '''
 '''
 
 @bp.route('/database')
+@statement_timeout(30000)
 def view_database():
     """View all database tables in a nice HTML format"""
     from datetime import datetime
@@ -305,6 +309,7 @@ def view_database():
 
 
 @bp.route('/database/json')
+@statement_timeout(30000)
 def view_database_json():
     """View all database data as JSON"""
     users = User.query.all()
@@ -318,3 +323,72 @@ def view_database_json():
         'messages': [m.to_dict() for m in messages],
         'applications': [a.to_dict() for a in applications]
     })
+
+
+@bp.route('/pool')
+@admin_token_required
+def pool_status():
+    """
+    Connection pool statistics for every engine (never waits for a connection)
+
+    Request Headers:
+        Authorization: Bearer <ADMIN_TOKEN>
+
+    Returns:
+        {
+            "primary": {
+                "size": 5, "checked_in": 4, "checked_out": 1, "overflow": 0,
+                "waits": 120, "wait_seconds_total": 0.01, "wait_seconds_max": 0.002,
+                "timeouts": 0, ...
+            },
+            "replica_0": {...}
+        }
+    """
+    return jsonify(pool_stats(db.engines)), 200
+
+
+@bp.route('/storage')
+@admin_token_required
+def storage_report():
+    """
+    Top storage consumers, from the usage counters (indexed, no scan of messages)
+
+    Request Headers:
+        Authorization: Bearer <ADMIN_TOKEN>
+
+    Query Parameters:
+        limit (int): Entries per list (default: 20, max: 100)
+
+    Returns:
+        {
+            "quotas": {"user_bytes": 1073741824, "conversation_bytes": 5368709120},
+            "users": [{"id": 1, "username": "...", "email": "...", "storage_bytes": 1234}, ...],
+            "conversations": [{"id": 1, "name": null, "is_group": false, "member_count": 2,
+                               "storage_bytes": 1234}, ...]
+        }
+    """
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
+    users = User.query.options(
+        load_only(User.id, User.username, User.email, User.storage_bytes)
+    ).filter(User.storage_bytes > 0).order_by(User.storage_bytes.desc()).limit(limit).all()
+    conversations = Conversation.query.options(
+        load_only(Conversation.id, Conversation.name, Conversation.is_group, Conversation.member_count,
+                  Conversation.storage_bytes)
+    ).filter(Conversation.storage_bytes > 0).order_by(Conversation.storage_bytes.desc()).limit(limit).all()
+
+    return jsonify({
+        'quotas': {
+            'user_bytes': current_app.config['STORAGE_QUOTA_USER_BYTES'],
+            'conversation_bytes': current_app.config['STORAGE_QUOTA_CONVERSATION_BYTES']
+        },
+        'users': [
+            {'id': u.id, 'username': u.username, 'email': u.email, 'storage_bytes': u.storage_bytes}
+            for u in users
+        ],
+        'conversations': [
+            {'id': c.id, 'name': c.name, 'is_group': c.is_group, 'member_count': c.member_count,
+             'storage_bytes': c.storage_bytes}
+            for c in conversations
+        ]
+    }), 200
@@ -4,12 +4,11 @@ from app.models.user import User
 from app.utils.jwt_utils import generate_access_token, generate_refresh_token, decode_token
 from app.utils.decorators import token_required
 import jwt
-
 import logging
 
 bp = Blueprint('auth', __name__, url_prefix='/api/auth')
 
-logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
 
 
 @bp.route('/register', methods=['POST'])
@@ -35,16 +34,13 @@ def register():
         }
     """
     try:
-        print(f"Register request headers: {request.headers}", flush=True)
-        print(f"Register request body raw: {request.get_data(as_text=True)}", flush=True)
         data = request.get_json()
-        print(f"Register request json: {data}", flush=True)
 
         # Validate required fields
         required_fields = ['email', 'username', 'password', 'user_type']
         for field in required_fields:
             if not data.get(field):
-                print(f"Missing field: {field} in {data}", flush=True)
+                logger.info('Registration rejected: missing %s', field)
                 return jsonify({'error': f'Missing required field: {field}'}), 400
 
         # Validate user_type
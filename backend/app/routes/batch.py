@@ -0,0 +1,163 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+from flask import Blueprint, request, jsonify, current_app, g
+from werkzeug.exceptions import HTTPException
+from werkzeug.test import EnvironBuilder
+from app import db
+from app.utils.decorators import token_required
+from app.utils.db_routing import STICKY_HEADER, sticky_token
+
+bp = Blueprint('batch', __name__, url_prefix='/api')
+
+METHODS = ('GET', 'POST', 'PUT', 'DELETE')
+READ_METHODS = ('GET',)
+
+# Threads for concurrent read sub-requests, shared by all batches of this process
+_executor = None
+_executor_lock = Lock()
+
+
+def _get_executor(max_workers):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='batch')
+        return _executor
+
+
+def _validate(subrequests, limit):
+    """Return an error message for a malformed batch, or None"""
+    if not isinstance(subrequests, list) or not subrequests:
+        return 'requests must be a non-empty list'
+    if len(subrequests) > limit:
+        return f'At most {limit} requests per batch'
+    for i, sub in enumerate(subrequests):
+        if not isinstance(sub, dict):
+            return f'requests[{i}] must be an object'
+        if sub.get('method', 'GET').upper() not in METHODS:
+            return f'requests[{i}]: method must be one of {", ".join(METHODS)}'
+        path = sub.get('path')
+        if not isinstance(path, str) or not path.startswith('/api/') or path.split('?')[0].rstrip('/') == '/api/batch':
+            return f'requests[{i}]: path must be an API path other than /api/batch'
+        if sub.get('json') is not None and sub.get('form') is not None:
+            return f'requests[{i}]: send either json or form, not both'
+    return None
+
+
+def _dispatch(app, sub, base_url, sticky=None):
+    """
+    Run one sub-request through routing and its view, without the app's request hooks
+
+    The caller's app context (and so the authenticated g.batch_user and the
+    database session) is reused; only the request context is new. sticky is
+    the read-your-writes token the sub-request carries, if any.
+    """
+    method = sub.get('method', 'GET').upper()
+    headers = {'Accept': 'application/json'}
+    if sticky:
+        headers[STICKY_HEADER] = sticky
+    builder = EnvironBuilder(
+        path=sub['path'], method=method, base_url=base_url,
+        headers=headers, json=sub.get('json'), data=sub.get('form')
+    )
+    with app.request_context(builder.get_environ()):
+        try:
+            try:
+                rv = app.dispatch_request()
+            except HTTPException as e:
+                return {'status': e.code, 'body': {'error': e.description}}
+            except Exception as e:
+                rv = app.handle_user_exception(e)  # e.g. 503 on pool exhaustion
+            response = app.make_response(rv)
+        except Exception as e:
+            db.session.rollback()
+            return {'status': 500, 'body': {'error': 'Request failed', 'details': str(e)}}
+    return {
+        'status': response.status_code,
+        'body': response.get_json(silent=True) if response.is_json else None
+    }
+
+
+def _dispatch_in_thread(app, sub, base_url, user, request_id, sticky):
+    # A separate app context gives this thread its own database session
+    with app.app_context():
+        g.request_id = request_id
+        g.current_user_id = user.id
+        g.batch_user = db.session.merge(user, load=False)
+        return _dispatch(app, sub, base_url, sticky)
+
+
+@bp.route('/batch', methods=['POST'])
+@token_required
+def batch(current_user):
+    """
+    Run several API requests in one round trip with one authentication check
+
+    Sub-requests run in order with the caller's token. With "concurrent":
+    true, each run of consecutive GET sub-requests executes in parallel
+    (each on its own database connection); writes always run one at a time.
+
+    Request JSON:
+        {
+            "requests": [
+                {"method": "GET", "path": "/api/auth/me"},
+                {"method": "GET", "path": "/api/messages/conversations?fields=id,unread_count"},
+                {"method": "POST", "path": "/api/messages/conversations/1/mark-read"},
+                {"method": "POST", "path": "/api/messages/conversations/1/send", "form": {"content": "Hi"}},
+                {"method": "POST", "path": "/api/jobs/applications", "json": {...}}
+            ],
+            "concurrent": false (optional)
+        }
+
+    Returns:
+        {
+            "responses": [
+                {"status": 200, "body": {...}},
+                ...
+            ]
+        }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        subrequests = data.get('requests')
+        error = _validate(subrequests, current_app.config['BATCH_MAX_REQUESTS'])
+        if error:
+            return jsonify({'error': error}), 400
+
+        app = current_app._get_current_object()
+        g.batch_user = current_user
+        concurrent = bool(data.get('concurrent')) and current_app.config['BATCH_MAX_WORKERS'] > 1
+
+        # Reads after a write in this batch must see it, as they would across separate requests
+        sticky = request.headers.get(STICKY_HEADER)
+        responses = []
+        i = 0
+        while i < len(subrequests):
+            end = i + 1
+            if concurrent and subrequests[i].get('method', 'GET').upper() in READ_METHODS:
+                while end < len(subrequests) and subrequests[end].get('method', 'GET').upper() in READ_METHODS:
+                    end += 1
+            if end - i > 1:
+                executor = _get_executor(current_app.config['BATCH_MAX_WORKERS'])
+                futures = [
+                    executor.submit(
+                        _dispatch_in_thread, app, sub, request.host_url, current_user, g.get('request_id'), sticky
+                    )
+                    for sub in subrequests[i:end]
+                ]
+                responses.extend(future.result() for future in futures)
+            else:
+                result = _dispatch(app, subrequests[i], request.host_url, sticky)
+                if app.config['REPLICA_BIND_KEYS'] and result['status'] < 400 and \
+                        subrequests[i].get('method', 'GET').upper() not in READ_METHODS:
+                    sticky = sticky_token(current_user.id)
+                responses.append(result)
+            i = end
+
+        return jsonify({'responses': responses}), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to run batch', 'details': str(e)}), 500
+    finally:
+        g.pop('batch_user', None)
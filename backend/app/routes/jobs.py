@@ -1,9 +1,13 @@
 from flask import Blueprint, request, jsonify
 from app import db
 from app.models.user import User
-from app.models.job_application import JobApplication
+from app.models.job_application import JobApplication, JOB_APPLICATION_SCHEMA
 from app.models.conversation import Conversation, ConversationParticipant, Message
 from app.utils.decorators import token_required, user_type_required
+from app.utils.unread_cache import record_message, invalidate_user
+from app.utils.inbox_cache import invalidate_inboxes
+from app.utils.fieldsets import parse_fields, column_attrs
+from sqlalchemy.orm import load_only
 from datetime import datetime
 
 bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
@@ -90,54 +94,10 @@ def accept_application(current_user, application_id):
         application.status = 'accepted'
         application.updated_at = datetime.utcnow()
 
-        # Check if conversation already exists
-        existing_conversation = db.session.query(Conversation).join(
-            ConversationParticipant, Conversation.id == ConversationParticipant.conversation_id
-        ).filter(
-            ConversationParticipant.user_id.in_([current_user.id, application.student_id])
-        ).group_by(Conversation.id).having(
-            db.func.count(ConversationParticipant.user_id) == 2
-        ).first()
-
-        if existing_conversation:
-            # Check if both users are actually in this conversation
-            participants_ids = [p.user_id for p in existing_conversation.participants]
-            if current_user.id in participants_ids and application.student_id in participants_ids:
-                conversation = existing_conversation
-            else:
-                # Create new conversation
-                conversation = Conversation()
-                db.session.add(conversation)
-                db.session.flush()
-
-                # Add participants
-                participant1 = ConversationParticipant(
-                    conversation_id=conversation.id,
-                    user_id=current_user.id
-                )
-                participant2 = ConversationParticipant(
-                    conversation_id=conversation.id,
-                    user_id=application.student_id
-                )
-                db.session.add(participant1)
-                db.session.add(participant2)
-        else:
-            # Create new conversation
-            conversation = Conversation()
-            db.session.add(conversation)
-            db.session.flush()
-
-            # Add participants
-            participant1 = ConversationParticipant(
-                conversation_id=conversation.id,
-                user_id=current_user.id
-            )
-            participant2 = ConversationParticipant(
-                conversation_id=conversation.id,
-                user_id=application.student_id
-            )
-            db.session.add(participant1)
-            db.session.add(participant2)
+        # Reuse the 1:1 conversation between employer and student if there is one
+        conversation = Conversation.find_direct(current_user.id, application.student_id)
+        if not conversation:
+            conversation = Conversation.create_direct(current_user.id, application.student_id)
 
         # Create automated congratulatory message
         student = User.query.get(application.student_id)
@@ -149,18 +109,20 @@ def accept_application(current_user, application_id):
         )
         db.session.add(congrats_message)
 
-        # Update conversation timestamp
-        conversation.updated_at = datetime.utcnow()
-
-        # Increment unread count for student
-        student_participant = ConversationParticipant.query.filter_by(
+        # Update conversation timestamp and sequence (unread for the student)
+        employer_participant = ConversationParticipant.query.filter_by(
             conversation_id=conversation.id,
-            user_id=application.student_id
+            user_id=current_user.id
         ).first()
-        student_participant.unread_count += 1
+        seq = conversation.record_message(employer_participant)
 
         db.session.commit()
 
+        invalidate_user(current_user.id)
+        invalidate_user(application.student_id)
+        record_message(conversation.id, seq, current_user.id)
+        invalidate_inboxes(current_user.id, application.student_id)
+
         return jsonify({
             'message': 'Application accepted and conversation created',
             'application': application.to_dict(),
@@ -220,19 +182,31 @@ def get_applications(current_user):
     - Students see their own applications
     - Employers see applications to their jobs
 
+    Query Parameters:
+        fields (str): Comma-separated subset of fields to return (and load)
+
     Returns:
         {
             "applications": [...]
         }
     """
     try:
+        try:
+            fields = parse_fields(JOB_APPLICATION_SCHEMA.fields)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
         if current_user.user_type == 'student':
-            applications = JobApplication.query.filter_by(student_id=current_user.id).all()
+            query = JobApplication.query.filter_by(student_id=current_user.id)
         else:  # employer
-            applications = JobApplication.query.filter_by(employer_id=current_user.id).all()
+            query = JobApplication.query.filter_by(employer_id=current_user.id)
+
+        applications = query.options(
+            load_only(*column_attrs(JobApplication, JOB_APPLICATION_SCHEMA, fields))
+        ).all()
 
         return jsonify({
-            'applications': [app.to_dict() for app in applications]
+            'applications': [app.to_dict(fields) for app in applications]
         }), 200
 
     except Exception as e:
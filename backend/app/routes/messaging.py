@@ -1,50 +1,261 @@
-from flask import Blueprint, request, jsonify, send_from_directory, current_app
+from flask import Blueprint, request, jsonify, current_app
 from app import db
 from app.models.user import User
-from app.models.conversation import Conversation, ConversationParticipant, Message
+from app.models.conversation import (
+    Conversation, ConversationParticipant, Message,
+    CONVERSATION_SCHEMA, CONVERSATION_FIELDS, CONVERSATION_FIELDS_NORMALIZED,
+    MESSAGE_SCHEMA, MESSAGE_FIELDS
+)
 from app.utils.decorators import token_required
-from sqlalchemy import or_, and_
+from app.utils.fieldsets import parse_fields, column_attrs
+from app.utils.metrics import observe_mark_read, observe_upload
+from app.utils.wire_format import negotiate_response, wants_msgpack, MSGPACK_MIMETYPE
+from app.utils.unread_cache import get_unread_counts, record_message, record_read, invalidate_user
+from app.utils.read_buffer import get_read_buffer, apply_pending_reads
+from app.utils.presence import get_presence_store
+from app.utils.storage import get_storage
+from app.utils.storage_quota import BODY_ALLOWANCE, storage_left, reserve_storage, release_storage
+from app.utils.recent_messages import recent_page, page_count, remember_message
+from app.utils.inbox_cache import (
+    cached_inbox, cache_inbox, invalidate_inboxes, invalidate_conversation_inboxes
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import joinedload, load_only
+from sqlalchemy.orm.attributes import set_committed_value
+from werkzeug.exceptions import HTTPException
 from werkzeug.utils import secure_filename
 import os
+import re
 import uuid
 
 bp = Blueprint('messaging', __name__, url_prefix='/api/messages')
 
+CLIENT_MESSAGE_ID = re.compile(r'^[\w.:-]{1,64}$')
+
+
+def replay_send(message, conversation_id):
+    """Answer a retried send with the message stored by the first attempt"""
+    if message.conversation_id != conversation_id:
+        return jsonify({'error': 'Idempotency-Key was already used in another conversation'}), 422
+    response = jsonify({
+        'message': 'Message sent successfully',
+        'data': message.to_dict()
+    })
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response, 201
+
+
+def retried_send(current_user, client_message_id, conversation_id):
+    """
+    Check a send's client message id
+
+    Returns:
+        A 400 response for a malformed id, the replayed original when the
+        send already went through, or None for a new send
+    """
+    if not CLIENT_MESSAGE_ID.match(client_message_id):
+        return jsonify({'error': 'Idempotency-Key must be 1-64 letters, digits or ._:-'}), 400
+    original = Message.query.filter_by(sender_id=current_user.id, client_message_id=client_message_id).first()
+    return replay_send(original, conversation_id) if original else None
+
 
 def allowed_file(filename):
     """Check if file extension is allowed"""
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in current_app.config['ALLOWED_EXTENSIONS']
 
 
+def wants_normalized():
+    """Check if the client asked for side-loaded users (?shape=normalized)"""
+    return request.args.get('shape') == 'normalized'
+
+
+def side_load_users(user_ids):
+    """Load every referenced user once, in a single query, keyed by id"""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return {}
+    users = User.query.filter(User.id.in_(user_ids)).all()
+    return {str(user.id): user.to_dict() for user in users}
+
+
+def trim_message(data, fields=None, embed_sender=True):
+    """Restrict a full Message.to_dict() dictionary as Message.to_dict(embed_sender, fields) would"""
+    if fields is None and embed_sender:
+        return data
+    return {
+        name: value for name, value in data.items()
+        if (fields is None or name in fields) and (embed_sender or name != 'sender')
+    }
+
+
+def latest_messages(conversation_ids, with_sender=False):
+    """Load the last message of each conversation in a single query"""
+    if not conversation_ids:
+        return {}
+    last_ids = db.session.query(db.func.max(Message.id)).filter(
+        Message.conversation_id.in_(conversation_ids)
+    ).group_by(Message.conversation_id)
+    query = Message.query.filter(Message.id.in_(last_ids))
+    if with_sender:
+        query = query.options(joinedload(Message.sender))
+    return {message.conversation_id: message for message in query.all()}
+
+
+def load_direct_members(conversations, with_users=False):
+    """Load the members of several 1:1 conversations in one query"""
+    if not conversations:
+        return
+    query = ConversationParticipant.query.filter(
+        ConversationParticipant.conversation_id.in_([c.id for c in conversations])
+    )
+    if with_users:
+        query = query.options(joinedload(ConversationParticipant.user))
+
+    members = {}
+    for member in query.all():
+        members.setdefault(member.conversation_id, []).append(member)
+    for conversation in conversations:
+        set_committed_value(conversation, 'participants', members.get(conversation.id, []))
+
+
 @bp.route('/conversations', methods=['GET'])
 @token_required
 def get_conversations(current_user):
     """
     Get all conversations for the current user
 
+    Query Parameters:
+        shape (str): "normalized" to side-load users instead of embedding them
+        fields (str): Comma-separated subset of fields to return (and load)
+
+    Served from the inbox cache (see app.utils.inbox_cache) until one of the
+    user's conversations changes.
+
     Returns:
         {
-            "conversations": [...]
+            "conversations": [...],
+            "users": {"<id>": {...}}  (normalized shape only)
         }
     """
     try:
-        # Get all conversation participants for current user
-        participants = ConversationParticipant.query.filter_by(user_id=current_user.id).all()
+        # The inbox is polled while the app is open: count that as being online
+        get_presence_store().touch(current_user.id)
+
+        normalized = wants_normalized()
+        try:
+            fields = parse_fields(CONVERSATION_FIELDS_NORMALIZED if normalized else CONVERSATION_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Cached per user and response variant (shape, fields and wire format)
+        as_msgpack = wants_msgpack()
+        variant = '|'.join((
+            'normalized' if normalized else 'embedded',
+            ','.join(sorted(fields)) if fields is not None else '*',
+            'msgpack' if as_msgpack else 'json'
+        ))
+        body, cache_token = cached_inbox(current_user.id, variant)
+        if body is not None:
+            response = current_app.response_class(body, mimetype=MSGPACK_MIMETYPE if as_msgpack else 'application/json')
+            response.vary.add('Accept')
+            return response, 200
+
+        def wanted(name):
+            return fields is None or name in fields
+
+        # Load only the conversation columns that were asked for
+        participants = ConversationParticipant.query.filter_by(user_id=current_user.id).options(
+            joinedload(ConversationParticipant.conversation).load_only(
+                *column_attrs(Conversation, CONVERSATION_SCHEMA, fields,
+                              always=('updated_at', 'is_group', 'message_seq'))
+            )
+        ).all()
+
+        apply_pending_reads(current_user.id, participants)
+
+        # Sort by most recent message
+        participants.sort(key=lambda p: p.conversation.updated_at, reverse=True)
+
+        # Member lists are only embedded for 1:1 conversations: load those in one query
+        if any(wanted(name) for name in ('other_participant', 'participants',
+                                          'other_participant_id', 'participant_ids')):
+            load_direct_members(
+                [p.conversation for p in participants if not p.conversation.is_group],
+                with_users=not normalized
+            )
+
+        last_by_conversation = {}
+        if wanted('last_message'):
+            last_by_conversation = latest_messages(
+                [p.conversation_id for p in participants], with_sender=not normalized
+            )
 
         conversations = []
+        user_ids = set()
         for participant in participants:
             conversation = participant.conversation
-            conversations.append(conversation.to_dict(current_user.id))
+            last_message = last_by_conversation.get(conversation.id)
+            data = conversation.to_dict(
+                current_user.id, embed_users=not normalized, last_message=last_message,
+                fields=fields, membership=participant
+            )
+            conversations.append(data)
+
+            if normalized:
+                user_ids.update(data.get('participant_ids') or ())
+                if data.get('other_participant_id'):
+                    user_ids.add(data['other_participant_id'])
+                if last_message:
+                    user_ids.add(last_message.sender_id)
+
+        if normalized:
+            response = negotiate_response({
+                'conversations': conversations,
+                'users': side_load_users(user_ids)
+            })
+        else:
+            response = negotiate_response({
+                'conversations': conversations
+            })
+
+        cache_inbox(current_user.id, variant, response.get_data(), cache_token,
+                    [p.conversation_id for p in participants])
+        return response, 200
 
-        # Sort by most recent message
-        conversations.sort(key=lambda x: x['updated_at'], reverse=True)
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch conversations', 'details': str(e)}), 500
 
-        return jsonify({
-            'conversations': conversations
+
+@bp.route('/unread', methods=['GET'])
+@token_required
+def get_unread(current_user):
+    """
+    Get unread message counts for the current user
+
+    Served from a per-user cached counter, cheap enough to poll.
+
+    Returns:
+        {
+            "total": 5,
+            "conversations": [
+                {"conversation_id": 1, "unread_count": 3},
+                ...
+            ]
+        }
+    """
+    try:
+        counts = get_unread_counts(current_user.id)
+
+        return negotiate_response({
+            'total': sum(counts.values()),
+            'conversations': [
+                {'conversation_id': conversation_id, 'unread_count': unread_count}
+                for conversation_id, unread_count in sorted(counts.items())
+            ]
         }), 200
 
     except Exception as e:
-        return jsonify({'error': 'Failed to fetch conversations', 'details': str(e)}), 500
+        return jsonify({'error': 'Failed to fetch unread counts', 'details': str(e)}), 500
 
 
 @bp.route('/conversations/<int:conversation_id>/messages', methods=['GET'])
@@ -56,20 +267,28 @@ def get_messages(current_user, conversation_id):
     Query Parameters:
         page (int): Page number (default: 1)
         per_page (int): Messages per page (default: 50)
+        shape (str): "normalized" to side-load senders instead of embedding them
+        fields (str): Comma-separated subset of message fields to return (and load)
+
+    Pages among the newest messages are served from memory (see
+    app.utils.recent_messages) without querying messages.
 
     Returns:
         {
             "messages": [...],
             "page": 1,
             "per_page": 50,
-            "total": 100
+            "total": 100,
+            "users": {"<id>": {...}}  (normalized shape with sender only)
         }
     """
     try:
-        # Verify user is part of the conversation
+        # Verify user is part of the conversation (with the conversation's sequence, in one query)
         participant = ConversationParticipant.query.filter_by(
             conversation_id=conversation_id,
             user_id=current_user.id
+        ).options(
+            joinedload(ConversationParticipant.conversation).load_only(Conversation.message_seq)
         ).first()
 
         if not participant:
@@ -79,19 +298,53 @@ def get_messages(current_user, conversation_id):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 50, type=int)
 
-        # Get messages with pagination
-        messages_query = Message.query.filter_by(conversation_id=conversation_id).order_by(Message.created_at.asc())
+        try:
+            fields = parse_fields(MESSAGE_FIELDS)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        normalized = wants_normalized()
+        with_sender = fields is None or 'sender' in fields
+
+        recent = recent_page(conversation_id, participant.conversation.message_seq, page, per_page)
+        if recent is not None:
+            total, items = recent
+            response = {
+                'page': page,
+                'per_page': per_page,
+                'total': total,
+                'pages': page_count(total, per_page)
+            }
+            if normalized:
+                response['messages'] = [trim_message(data, fields, embed_sender=False) for data in items]
+                if with_sender:
+                    response['users'] = {str(data['sender_id']): data['sender'] for data in items if data['sender']}
+            else:
+                response['messages'] = [trim_message(data, fields) for data in items]
+            return negotiate_response(response), 200
+
+        # Get messages with pagination, loading only the requested columns
+        messages_query = Message.query.filter_by(conversation_id=conversation_id).options(
+            load_only(*column_attrs(Message, MESSAGE_SCHEMA, fields, always=('sender_id',) if with_sender else ()))
+        ).order_by(Message.created_at.asc(), Message.id.asc())  # id breaks ties, so pages never overlap
+        if with_sender and not normalized:
+            messages_query = messages_query.options(joinedload(Message.sender))
         paginated = messages_query.paginate(page=page, per_page=per_page, error_out=False)
 
-        messages = [msg.to_dict() for msg in paginated.items]
-
-        return jsonify({
-            'messages': messages,
+        response = {
             'page': page,
             'per_page': per_page,
             'total': paginated.total,
             'pages': paginated.pages
-        }), 200
+        }
+
+        if normalized:
+            response['messages'] = [msg.to_dict(embed_sender=False, fields=fields) for msg in paginated.items]
+            if with_sender:
+                response['users'] = side_load_users(msg.sender_id for msg in paginated.items)
+        else:
+            response['messages'] = [msg.to_dict(fields=fields) for msg in paginated.items]
+
+        return negotiate_response(response), 200
 
     except Exception as e:
         return jsonify({'error': 'Failed to fetch messages', 'details': str(e)}), 500
@@ -103,9 +356,24 @@ def send_message(current_user, conversation_id):
     """
     Send a message in a conversation (with optional file attachment)
 
+    Request Headers:
+        Idempotency-Key: Client-generated message id (optional, up to 64
+            characters). Retrying with the same key returns the original
+            message, with an "Idempotent-Replayed: true" header, instead of
+            sending (and storing the file) again.
+
     Request Form Data:
         content: Message content (optional if file is provided)
         file: File attachment (optional)
+        client_message_id: Same as Idempotency-Key, for clients that cannot set headers
+
+    Attachments count against the sender's and the conversation's storage
+    quota. Retries sent with an Idempotency-Key header are answered first,
+    even when the quota is used up. Then a request whose Content-Length
+    already exceeds what is left is refused with 413 before its body is
+    read. Otherwise the exact file size is reserved (and committed) before
+    the file is written, and given back if the file or the message cannot
+    be stored.
 
     Returns:
         {
@@ -114,15 +382,7 @@ def send_message(current_user, conversation_id):
         }
     """
     try:
-        # Get form data
-        content = request.form.get('content', '')
-        file = request.files.get('file')
-
-        # Require either content or file
-        if not content and not file:
-            return jsonify({'error': 'Message content or file is required'}), 400
-
-        # Verify user is part of the conversation
+        # Verify user is part of the conversation (before reading the body)
         participant = ConversationParticipant.query.filter_by(
             conversation_id=conversation_id,
             user_id=current_user.id
@@ -131,9 +391,38 @@ def send_message(current_user, conversation_id):
         if not participant:
             return jsonify({'error': 'You are not part of this conversation'}), 403
 
+        # A retry of a send that already went through, answered before the quota check:
+        # the first attempt may have used up the space this one would be refused for
+        client_message_id = request.headers.get('Idempotency-Key')
+        if client_message_id is not None:
+            retried = retried_send(current_user, client_message_id, conversation_id)
+            if retried:
+                return retried
+
+        # Nothing may read the body (request.form) before this check
+        left = storage_left(current_user, participant.conversation)
+        if left is not None and (request.content_length or 0) > left + BODY_ALLOWANCE:
+            return jsonify({'error': 'Not enough storage space left for this file', 'storage_left': left}), 413
+
+        # Get form data
+        content = request.form.get('content', '')
+        file = request.files.get('file')
+
+        # Clients that cannot set the header send the id as a form field
+        if client_message_id is None:
+            client_message_id = request.form.get('client_message_id')
+            if client_message_id is not None:
+                retried = retried_send(current_user, client_message_id, conversation_id)
+                if retried:
+                    return retried
+
+        # Require either content or file
+        if not content and not file:
+            return jsonify({'error': 'Message content or file is required'}), 400
+
         # Handle file upload
         file_name = None
-        file_path = None
+        file_key = None
         file_size = None
         file_type = None
         has_attachment = False
@@ -142,20 +431,29 @@ def send_message(current_user, conversation_id):
             if not allowed_file(file.filename):
                 return jsonify({'error': 'File type not allowed'}), 400
 
-            # Generate unique filename
+            # Generate unique filename (the storage key)
             original_filename = secure_filename(file.filename)
             file_extension = original_filename.rsplit('.', 1)[1].lower()
-            unique_filename = f"{uuid.uuid4().hex}.{file_extension}"
-
-            # Save file
-            upload_folder = current_app.config['UPLOAD_FOLDER']
-            os.makedirs(upload_folder, exist_ok=True)
-            file_path = os.path.join(upload_folder, unique_filename)
-            file.save(file_path)
+            file_key = f"{uuid.uuid4().hex}.{file_extension}"
+
+            # Count it against the quotas (committed now, released below if anything fails)
+            file.stream.seek(0, os.SEEK_END)
+            file_size = file.stream.tell()
+            file.stream.seek(0)
+            quota_error = reserve_storage(current_user.id, conversation_id, file_size)
+            if quota_error:
+                return jsonify({'error': quota_error}), 413
+
+            # Save file, streamed in chunks to the configured storage
+            try:
+                get_storage().save(file_key, file.stream)
+            except Exception:
+                release_storage(current_user.id, conversation_id, file_size)
+                raise
 
             # Get file info
             file_name = original_filename
-            file_size = os.path.getsize(file_path)
+            observe_upload(file_size)
             file_type = file.content_type
             has_attachment = True
 
@@ -166,35 +464,51 @@ def send_message(current_user, conversation_id):
             content=content if content else None,
             has_attachment=has_attachment,
             file_name=file_name,
-            file_path=unique_filename if has_attachment else None,  # Store only filename, not full path
+            file_path=file_key,  # Storage key, not a filesystem path
             file_size=file_size,
-            file_type=file_type
+            file_type=file_type,
+            client_message_id=client_message_id
         )
-        db.session.add(message)
-
-        # Update conversation timestamp
-        conversation = Conversation.query.get(conversation_id)
-        from datetime import datetime
-        conversation.updated_at = datetime.utcnow()
-
-        # Increment unread count for other participants
-        other_participants = ConversationParticipant.query.filter(
-            and_(
-                ConversationParticipant.conversation_id == conversation_id,
-                ConversationParticipant.user_id != current_user.id
-            )
-        ).all()
+        try:
+            db.session.add(message)
 
-        for other_participant in other_participants:
-            other_participant.unread_count += 1
-
-        db.session.commit()
+            # Update conversation timestamp and sequence; other members' unread
+            # counts follow from the sequence, so no per-member rows are written
+            conversation = participant.conversation
+            seq = conversation.record_message(participant)
+
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent attempt with the same key won; keep its message and drop our file
+            db.session.rollback()
+            if has_attachment:
+                get_storage().delete(file_key)
+                release_storage(current_user.id, conversation_id, file_size)
+            if not client_message_id:
+                raise
+            original = Message.query.filter_by(sender_id=current_user.id, client_message_id=client_message_id).one()
+            return replay_send(original, conversation_id)
+        except Exception:
+            # Nothing will refer to the file (anything missed here is left to the upload sweeper)
+            db.session.rollback()
+            if has_attachment:
+                get_storage().delete(file_key)
+                release_storage(current_user.id, conversation_id, file_size)
+            raise
+
+        record_message(conversation_id, seq, current_user.id)
+        invalidate_conversation_inboxes(conversation_id)
+        data = message.to_dict()
+        remember_message(conversation_id, seq, data)
 
         return jsonify({
             'message': 'Message sent successfully',
-            'data': message.to_dict()
+            'data': data
         }), 201
 
+    except HTTPException:
+        db.session.rollback()
+        raise  # e.g. 413 for a body over MAX_CONTENT_LENGTH, raised while parsing the form
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': 'Failed to send message', 'details': str(e)}), 500
@@ -206,24 +520,48 @@ def mark_as_read(current_user, conversation_id):
     """
     Mark all messages in a conversation as read (reset unread count)
 
+    Nothing is written when the conversation is already read. Otherwise the
+    position is handed to the read buffer (see app.utils.read_buffer) and
+    written within MARK_READ_FLUSH_INTERVAL, together with other mark-reads;
+    this user's unread counts reflect it immediately.
+
     Returns:
         {
             "message": "Messages marked as read"
         }
     """
     try:
-        # Find participant
+        # Find participant (with the conversation's sequence, in one query)
         participant = ConversationParticipant.query.filter_by(
             conversation_id=conversation_id,
             user_id=current_user.id
+        ).options(
+            joinedload(ConversationParticipant.conversation).load_only(Conversation.message_seq)
         ).first()
 
         if not participant:
             return jsonify({'error': 'You are not part of this conversation'}), 403
 
-        # Reset unread count
-        participant.unread_count = 0
-        db.session.commit()
+        # Move the read position to the latest message
+        apply_pending_reads(current_user.id, [participant])
+        if not participant.mark_read():
+            observe_mark_read('unchanged')
+            return jsonify({
+                'message': 'Messages marked as read'
+            }), 200
+
+        seq = participant.last_read_seq
+        buffer = get_read_buffer()
+        if buffer is not None:
+            set_committed_value(participant, 'last_read_seq', seq)  # Written by the buffer, not this session
+            buffer.add(current_user.id, conversation_id, seq)
+            observe_mark_read('buffered')
+        else:
+            db.session.commit()
+            observe_mark_read('written')
+
+        record_read(current_user.id, conversation_id, seq)
+        invalidate_inboxes(current_user.id)
 
         return jsonify({
             'message': 'Messages marked as read'
@@ -265,13 +603,7 @@ def start_conversation(current_user):
             return jsonify({'error': 'Recipient not found'}), 404
 
         # Check if conversation already exists between these two users
-        existing_conversation = db.session.query(Conversation).join(
-            ConversationParticipant, Conversation.id == ConversationParticipant.conversation_id
-        ).filter(
-            ConversationParticipant.user_id.in_([current_user.id, recipient_id])
-        ).group_by(Conversation.id).having(
-            db.func.count(ConversationParticipant.user_id) == 2
-        ).first()
+        existing_conversation = Conversation.find_direct(current_user.id, recipient_id)
 
         if existing_conversation:
             # Check if both users are actually in this conversation
@@ -283,32 +615,278 @@ def start_conversation(current_user):
                 }), 200
 
         # Create new conversation
-        conversation = Conversation()
+        conversation = Conversation.create_direct(current_user.id, recipient_id)
+        db.session.commit()
+
+        invalidate_user(current_user.id)
+        invalidate_user(recipient_id)
+        invalidate_inboxes(current_user.id, recipient_id)
+
+        return jsonify({
+            'message': 'Conversation started',
+            'conversation': conversation.to_dict(current_user.id)
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to start conversation', 'details': str(e)}), 500
+
+
+def parse_user_ids(values):
+    """
+    Validate a JSON list of user ids
+
+    Returns:
+        Set of user ids
+
+    Raises:
+        ValueError: If the value is not a list of integers or a user does not exist
+    """
+    if not isinstance(values, list) or not all(isinstance(v, int) and not isinstance(v, bool) for v in values):
+        raise ValueError('user ids must be a list of integers')
+
+    user_ids = set(values)
+    found = {user_id for (user_id,) in db.session.query(User.id).filter(User.id.in_(user_ids))}
+    missing = user_ids - found
+    if missing:
+        raise ValueError(f"User(s) not found: {', '.join(str(m) for m in sorted(missing))}")
+    return user_ids
+
+
+@bp.route('/groups', methods=['POST'])
+@token_required
+def create_group(current_user):
+    """
+    Create a group conversation
+
+    Request JSON:
+        {
+            "name": "Project team",
+            "member_ids": [2, 3, 4]
+        }
+
+    Returns:
+        {
+            "message": "Group created",
+            "conversation": {...}
+        }
+    """
+    try:
+        data = request.get_json() or {}
+
+        name = (data.get('name') or '').strip()
+        if not name:
+            return jsonify({'error': 'Group name is required'}), 400
+
+        try:
+            member_ids = parse_user_ids(data.get('member_ids', []))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        member_ids.discard(current_user.id)
+
+        # Create the group with its creator as owner and first member
+        conversation = Conversation(is_group=True, name=name, created_by=current_user.id)
         db.session.add(conversation)
         db.session.flush()  # Get conversation ID
+        conversation.add_members([current_user.id, *sorted(member_ids)])
+        db.session.commit()
+
+        for user_id in [current_user.id, *member_ids]:
+            invalidate_user(user_id)
+        invalidate_inboxes(current_user.id, *member_ids)
+
+        return jsonify({
+            'message': 'Group created',
+            'conversation': conversation.to_dict(current_user.id)
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to create group', 'details': str(e)}), 500
+
 
-        # Add participants
-        participant1 = ConversationParticipant(
-            conversation_id=conversation.id,
+@bp.route('/conversations/<int:conversation_id>/members', methods=['GET'])
+@token_required
+def get_members(current_user, conversation_id):
+    """
+    Get the members of a conversation with pagination
+
+    Query Parameters:
+        page (int): Page number (default: 1)
+        per_page (int): Members per page (default: 100)
+
+    Returns:
+        {
+            "members": [{...user, "joined_at": "..."}],
+            "page": 1,
+            "per_page": 100,
+            "total": 3,
+            "pages": 1
+        }
+    """
+    try:
+        # Verify user is part of the conversation
+        participant = ConversationParticipant.query.filter_by(
+            conversation_id=conversation_id,
             user_id=current_user.id
-        )
-        participant2 = ConversationParticipant(
-            conversation_id=conversation.id,
-            user_id=recipient_id
-        )
+        ).first()
 
-        db.session.add(participant1)
-        db.session.add(participant2)
+        if not participant:
+            return jsonify({'error': 'You are not part of this conversation'}), 403
+
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 100, type=int)
+
+        paginated = ConversationParticipant.query.filter_by(conversation_id=conversation_id).options(
+            joinedload(ConversationParticipant.user)
+        ).order_by(ConversationParticipant.id.asc()).paginate(page=page, per_page=per_page, error_out=False)
+
+        members = []
+        for member in paginated.items:
+            data = member.user.to_dict()
+            data['joined_at'] = member.joined_at
+            members.append(data)
+
+        return negotiate_response({
+            'members': members,
+            'page': page,
+            'per_page': per_page,
+            'total': paginated.total,
+            'pages': paginated.pages
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch members', 'details': str(e)}), 500
+
+
+@bp.route('/conversations/<int:conversation_id>/members', methods=['POST'])
+@token_required
+def add_members(current_user, conversation_id):
+    """
+    Add members to a group conversation (group owner only)
+
+    Request JSON:
+        {
+            "user_ids": [5, 6]
+        }
+
+    Returns:
+        {
+            "message": "Members added",
+            "added": [5, 6],
+            "member_count": 6
+        }
+    """
+    try:
+        conversation = Conversation.query.get(conversation_id)
+        if not conversation or not conversation.is_group:
+            return jsonify({'error': 'Group not found'}), 404
+
+        if conversation.created_by != current_user.id:
+            return jsonify({'error': 'Only the group owner can add members'}), 403
+
+        data = request.get_json() or {}
+        try:
+            user_ids = parse_user_ids(data.get('user_ids'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        # Skip users who are already members
+        existing = {
+            user_id for (user_id,) in db.session.query(ConversationParticipant.user_id).filter(
+                ConversationParticipant.conversation_id == conversation_id,
+                ConversationParticipant.user_id.in_(user_ids)
+            )
+        }
+        added = sorted(user_ids - existing)
+
+        conversation.add_members(added)
         db.session.commit()
 
+        for user_id in added:
+            invalidate_user(user_id)
+        invalidate_conversation_inboxes(conversation_id, *added)  # member_count changed for everyone
+
         return jsonify({
-            'message': 'Conversation started',
-            'conversation': conversation.to_dict(current_user.id)
-        }), 201
+            'message': 'Members added',
+            'added': added,
+            'member_count': conversation.member_count
+        }), 200
 
     except Exception as e:
         db.session.rollback()
-        return jsonify({'error': 'Failed to start conversation', 'details': str(e)}), 500
+        return jsonify({'error': 'Failed to add members', 'details': str(e)}), 500
+
+
+@bp.route('/conversations/<int:conversation_id>/members/<int:user_id>', methods=['DELETE'])
+@token_required
+def remove_member(current_user, conversation_id, user_id):
+    """
+    Remove a member from a group conversation
+
+    The group owner can remove anyone; other members can only remove themselves (leave).
+    An owner who leaves hands the group to the longest-standing remaining member.
+
+    Returns:
+        {
+            "message": "Member removed",
+            "member_count": 5,
+            "owner_id": 3
+        }
+    """
+    try:
+        conversation = Conversation.query.get(conversation_id)
+        if not conversation or not conversation.is_group:
+            return jsonify({'error': 'Group not found'}), 404
+
+        if user_id != current_user.id and conversation.created_by != current_user.id:
+            return jsonify({'error': 'Only the group owner can remove other members'}), 403
+
+        membership = ConversationParticipant.query.filter_by(
+            conversation_id=conversation_id,
+            user_id=user_id
+        ).first()
+
+        if not membership:
+            return jsonify({'error': 'Member not found'}), 404
+
+        conversation.remove_member(membership)
+        db.session.commit()
+
+        invalidate_user(user_id)
+        invalidate_conversation_inboxes(conversation_id, user_id)
+
+        return jsonify({
+            'message': 'Member removed',
+            'member_count': conversation.member_count,
+            'owner_id': conversation.created_by
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'Failed to remove member', 'details': str(e)}), 500
+
+
+def attachment_for(current_user, filename):
+    """
+    Find the message carrying an attachment, if the user may download it
+
+    Returns:
+        (message, None) or (None, error response)
+    """
+    message = Message.query.filter_by(file_path=filename).first()
+    if not message:
+        return None, (jsonify({'error': 'File not found'}), 404)
+
+    # Check if user is part of the conversation
+    participant = ConversationParticipant.query.filter_by(
+        conversation_id=message.conversation_id,
+        user_id=current_user.id
+    ).first()
+    if not participant:
+        return None, (jsonify({'error': 'Access denied'}), 403)
+
+    return message, None
 
 
 @bp.route('/files/<filename>', methods=['GET'])
@@ -317,34 +895,77 @@ def download_file(current_user, filename):
     """
     Download a file attachment
 
+    Streamed from storage through the app; prefer the URL from
+    /files/<filename>/url, which clients fetch directly.
+
     Returns:
         File download
     """
     try:
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        
-        # Verify the file exists and the user has access to it
-        message = Message.query.filter_by(file_path=filename).first()
-        
-        if not message:
-            return jsonify({'error': 'File not found'}), 404
-        
-        # Check if user is part of the conversation
-        participant = ConversationParticipant.query.filter_by(
-            conversation_id=message.conversation_id,
-            user_id=current_user.id
-        ).first()
-        
-        if not participant:
-            return jsonify({'error': 'Access denied'}), 403
-        
-        # Send file
-        return send_from_directory(
-            upload_folder,
-            filename,
-            as_attachment=True,
-            download_name=message.file_name
-        )
-        
+        message, error = attachment_for(current_user, filename)
+        if error:
+            return error
+
+        return get_storage().send(filename, message.file_name)
+
+    except FileNotFoundError:
+        return jsonify({'error': 'File not found'}), 404
+    except Exception as e:
+        return jsonify({'error': 'Failed to download file', 'details': str(e)}), 500
+
+
+@bp.route('/files/<filename>/url', methods=['GET'])
+@token_required
+def get_file_url(current_user, filename):
+    """
+    Get a short-lived URL downloading an attachment without authentication
+
+    With S3 storage the URL is pre-signed for the bucket, so the bytes never
+    pass through the app; with local storage it is a signed link to this app.
+
+    Returns:
+        {
+            "url": "https://...",
+            "expires_in": 300
+        }
+    """
+    try:
+        message, error = attachment_for(current_user, filename)
+        if error:
+            return error
+
+        expires_in = current_app.config['STORAGE_URL_EXPIRES']
+        return jsonify({
+            'url': get_storage().presigned_url(filename, message.file_name, expires_in),
+            'expires_in': expires_in
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to create download URL', 'details': str(e)}), 500
+
+
+@bp.route('/files/<filename>/signed', methods=['GET'])
+def download_signed(filename):
+    """
+    Download an attachment through a signed link (local storage only)
+
+    Query Parameters:
+        name, expires, signature: As issued by /files/<filename>/url
+
+    Returns:
+        File download
+    """
+    try:
+        storage = get_storage()
+        name = request.args.get('name', '')
+        if not hasattr(storage, 'verify') or not storage.verify(
+            filename, name, request.args.get('expires', ''), request.args.get('signature', '')
+        ):
+            return jsonify({'error': 'Invalid or expired link'}), 403
+
+        return storage.send(filename, name)
+
+    except FileNotFoundError:
+        return jsonify({'error': 'File not found'}), 404
     except Exception as e:
         return jsonify({'error': 'Failed to download file', 'details': str(e)}), 500
@@ -0,0 +1,107 @@
+from flask import Blueprint, request, jsonify, current_app
+from app import db
+from app.models.conversation import ConversationParticipant
+from app.utils.decorators import token_required
+from app.utils.presence import get_presence_store
+
+bp = Blueprint('presence', __name__, url_prefix='/api/messages')
+
+
+def is_participant(user_id, conversation_id):
+    """Check membership with a single-row lookup on the (conversation_id, user_id) unique index"""
+    return db.session.query(ConversationParticipant.id).filter_by(
+        conversation_id=conversation_id, user_id=user_id
+    ).first() is not None
+
+
+@bp.route('/conversations/<int:conversation_id>/typing', methods=['POST'])
+@token_required
+def set_typing(current_user, conversation_id):
+    """
+    Signal that the current user started or stopped typing
+
+    Held in memory (or Redis) only; nothing is written to the database.
+    Clients resend while typing, every few seconds at most: the signal lapses
+    after TYPING_TTL seconds.
+
+    Request JSON:
+        {
+            "typing": true (default) or false
+        }
+
+    Returns:
+        {
+            "typing": true
+        }
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        typing = bool(data.get('typing', True))
+
+        if not is_participant(current_user.id, conversation_id):
+            return jsonify({'error': 'You are not part of this conversation'}), 403
+
+        store = get_presence_store()
+        store.touch(current_user.id)
+        store.set_typing(conversation_id, current_user.id, typing)
+
+        return jsonify({'typing': typing}), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to update typing status', 'details': str(e)}), 500
+
+
+@bp.route('/conversations/<int:conversation_id>/presence', methods=['GET'])
+@token_required
+def get_presence(current_user, conversation_id):
+    """
+    Get which other members of a conversation are online and typing
+
+    Also marks the caller online. Meant to be polled alongside messages.
+    Online status covers at most PRESENCE_PAGE_SIZE members per call, in
+    user id order; large groups page through the rest with "after". Typing
+    comes from the conversation's own entry and is always complete.
+
+    Query Parameters:
+        after (int): Only members with a greater user id (next_cursor of the previous page)
+
+    Returns:
+        {
+            "online": [user_id, ...],
+            "typing": [user_id, ...],
+            "next_cursor": 42 or null
+        }
+    """
+    try:
+        if not is_participant(current_user.id, conversation_id):
+            return jsonify({'error': 'You are not part of this conversation'}), 403
+
+        store = get_presence_store()
+        store.touch(current_user.id)
+
+        limit = current_app.config['PRESENCE_PAGE_SIZE']
+        after = request.args.get('after', 0, type=int)
+        member_ids = [user_id for (user_id,) in db.session.query(ConversationParticipant.user_id).filter(
+            ConversationParticipant.conversation_id == conversation_id,
+            ConversationParticipant.user_id > after,
+            ConversationParticipant.user_id != current_user.id
+        ).order_by(ConversationParticipant.user_id).limit(limit + 1)]
+        next_cursor = member_ids[limit - 1] if len(member_ids) > limit else None
+        member_ids = member_ids[:limit]
+
+        # Typists were members when they signalled; drop any who left since
+        typists = store.typing(conversation_id) - {current_user.id}
+        if typists:
+            typists = {user_id for (user_id,) in db.session.query(ConversationParticipant.user_id).filter(
+                ConversationParticipant.conversation_id == conversation_id,
+                ConversationParticipant.user_id.in_(typists)
+            )}
+
+        return jsonify({
+            'online': sorted(store.online(member_ids)),
+            'typing': sorted(typists),
+            'next_cursor': next_cursor
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': 'Failed to fetch presence', 'details': str(e)}), 500
@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from app import db
-from app.models.user import User
+from app.models.user import User, USER_SCHEMA
 from app.utils.decorators import token_required, user_type_required
+from app.utils.fieldsets import parse_fields, column_attrs
+from sqlalchemy.orm import load_only
 
 bp = Blueprint('users', __name__, url_prefix='/api/users')
 
@@ -13,16 +15,26 @@ def get_all_students(current_user):
     """
     Get all students (Employer-only endpoint)
 
+    Query Parameters:
+        fields (str): Comma-separated subset of fields to return (and load)
+
     Returns:
         {
             "students": [...]
         }
     """
     try:
-        students = User.query.filter_by(user_type='student').all()
+        try:
+            fields = parse_fields(USER_SCHEMA.fields)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        students = User.query.filter_by(user_type='student').options(
+            load_only(*column_attrs(User, USER_SCHEMA, fields))
+        ).all()
 
         return jsonify({
-            'students': [student.to_dict() for student in students]
+            'students': [student.to_dict(fields) for student in students]
         }), 200
 
     except Exception as e:
@@ -0,0 +1,170 @@
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from tempfile import SpooledTemporaryFile
+
+
+def build_environ(scope, body):
+    """
+    Translate an ASGI HTTP scope into a WSGI environ
+
+    Args:
+        scope: ASGI connection scope
+        body: File object holding the complete request body
+
+    Returns:
+        WSGI environ dictionary
+    """
+    root_path = scope.get('root_path', '')
+    path = scope['path']
+    if root_path and path.startswith(root_path):
+        path = path[len(root_path):]
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': client[0],
+        'REMOTE_PORT': str(client[1]),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.input_terminated': True,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+
+    for raw_name, raw_value in scope.get('headers', ()):
+        name = raw_name.decode('latin-1').lower()
+        value = raw_value.decode('latin-1')
+        if name == 'content-type':
+            key = 'CONTENT_TYPE'
+        elif name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        if key in environ:
+            value = environ[key] + ('; ' if key == 'HTTP_COOKIE' else ',') + value
+        environ[key] = value
+    return environ
+
+
+class ASGIAdapter:
+    """
+    Serve the Flask (WSGI) application from an ASGI server such as Uvicorn
+
+    - Request bodies are received on the event loop before a thread is taken,
+      so slow uploads and idle keep-alive connections don't hold a thread
+    - The app runs in a bounded thread pool of max_threads workers, from the
+      moment the body is complete until the last response chunk is sent
+    - Bodies larger than max_body_size stop being buffered; Flask still
+      rejects them exactly as it does under WSGI
+    """
+
+    def __init__(self, wsgi_app, max_threads=8, max_body_size=None, spool_size=64 * 1024):
+        self.wsgi_app = wsgi_app
+        self.max_body_size = max_body_size
+        self.spool_size = spool_size
+        self._executor = ThreadPoolExecutor(max_workers=max_threads, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+        with SpooledTemporaryFile(max_size=self.spool_size) as body:
+            if not await self._receive_body(scope, receive, body):
+                return  # Client went away before sending the whole body
+            body.seek(0)
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(self._executor, self._run_wsgi, scope, body, send, loop)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self._executor.shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def _declared_length(self, scope):
+        for name, value in scope.get('headers', ()):
+            if name.lower() == b'content-length':
+                try:
+                    return int(value)
+                except ValueError:
+                    return None
+        return None
+
+    async def _receive_body(self, scope, receive, body):
+        limit = self.max_body_size
+        declared = self._declared_length(scope)
+        if limit is not None and declared is not None and declared > limit:
+            return True  # Flask rejects on Content-Length alone; don't buffer the upload
+
+        size = 0
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return False
+            chunk = message.get('body', b'')
+            if chunk and (limit is None or size <= limit):
+                body.write(chunk)
+                size += len(chunk)
+            if not message.get('more_body', False):
+                return True
+
+    def _run_wsgi(self, scope, body, send, loop):
+        """Run the WSGI app in a pool thread, forwarding its response to the event loop"""
+        def send_message(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        response = {}
+        started = False
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and started:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [
+                (name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers
+            ]
+            return lambda data: None  # Legacy write() callable; unused by Flask
+
+        result = self.wsgi_app(build_environ(scope, body), start_response)
+        try:
+            for chunk in result:
+                if not started:
+                    send_message({'type': 'http.response.start', 'status': response['status'],
+                                  'headers': response['headers']})
+                    started = True
+                if chunk:
+                    send_message({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not started:
+                send_message({'type': 'http.response.start', 'status': response['status'],
+                              'headers': response['headers']})
+            send_message({'type': 'http.response.body', 'body': b'', 'more_body': False})
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+
+
+def create_asgi_app(app):
+    """Wrap a Flask application for ASGI servers, sized from ASGI_THREADS"""
+    return ASGIAdapter(
+        app,
+        max_threads=app.config['ASGI_THREADS'],
+        max_body_size=app.config.get('MAX_CONTENT_LENGTH')
+    )
@@ -0,0 +1,231 @@
+import threading
+import zlib
+from collections import OrderedDict
+from flask import request
+from werkzeug.wsgi import ClosingIterator
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Content types worth compressing; attachments and images are usually compressed already
+COMPRESSIBLE_TYPES = (
+    'application/json', 'application/msgpack', 'application/javascript', 'application/xml', 'text/'
+)
+
+
+def parse_accept_encoding(header):
+    """
+    Parse an Accept-Encoding header into {coding: qvalue}
+
+    Args:
+        header: Raw header value, e.g. "gzip, deflate, br;q=0.9"
+
+    Returns:
+        Dictionary of lower-cased codings to their q-values
+    """
+    codings = {}
+    for part in header.split(','):
+        coding, _, params = part.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        codings[coding] = q
+    return codings
+
+
+class CompressionMiddleware:
+    """
+    WSGI middleware applying brotli or gzip based on Accept-Encoding
+
+    - Buffered responses are compressed when at least min_size bytes
+    - Streaming responses (no Content-Length) are compressed chunk by chunk
+      and flushed after every chunk so event streams stay live
+    - Attachments, already-encoded and non-text responses pass through untouched
+    - Compressed bodies are cached per (ETag, coding), so identical polls
+      skip the compressor entirely
+    """
+
+    def __init__(self, app, min_size=1024, gzip_level=6, brotli_quality=4, cache_size=256):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def negotiate(self, header):
+        """Pick the best supported coding for an Accept-Encoding header (or None)"""
+        if not header:
+            return None
+        codings = parse_accept_encoding(header)
+        wildcard = codings.get('*', 0.0)
+        candidates = (['br'] if brotli else []) + ['gzip']
+        best, best_q = None, 0.0
+        for coding in candidates:
+            q = codings.get(coding, wildcard)
+            if q > best_q:
+                best, best_q = coding, q
+        return best
+
+    def __call__(self, environ, start_response):
+        coding = self.negotiate(environ.get('HTTP_ACCEPT_ENCODING', ''))
+        if coding is None or environ.get('REQUEST_METHOD') == 'HEAD':
+            return self.app(environ, start_response)
+
+        captured = {}
+        written = []
+
+        def capture(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+            captured['exc_info'] = exc_info
+            return written.append
+
+        app_iter = self.app(environ, capture)
+        status = captured['status']
+        headers = captured['headers']
+
+        if not self._compressible(status, headers):
+            start_response(status, headers, captured['exc_info'])
+            if not written:
+                return app_iter
+            return ClosingIterator(self._chain(written, app_iter), getattr(app_iter, 'close', None))
+
+        header_map = {name.lower(): value for name, value in headers}
+        headers = [(n, v) for n, v in headers if n.lower() not in ('content-length', 'etag')]
+        headers.append(('Vary', 'Accept-Encoding'))
+
+        if 'content-length' not in header_map:
+            # Streaming response: compress incrementally
+            headers.append(('Content-Encoding', coding))
+            start_response(status, headers, captured['exc_info'])
+            return ClosingIterator(
+                self._stream(coding, self._chain(written, app_iter)), getattr(app_iter, 'close', None)
+            )
+
+        try:
+            body = b''.join(written) + b''.join(app_iter)
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+
+        etag = header_map.get('etag')
+        if len(body) < self.min_size:
+            if etag:
+                headers.append(('ETag', etag))
+            headers.append(('Content-Length', str(len(body))))
+            start_response(status, headers, captured['exc_info'])
+            return [body]
+
+        compressed = self._cached_compress(coding, body, etag)
+        if etag:
+            # The encoded representation differs byte-wise, so only a weak validator still holds
+            headers.append(('ETag', etag if etag.startswith('W/') else 'W/' + etag))
+        headers.append(('Content-Encoding', coding))
+        headers.append(('Content-Length', str(len(compressed))))
+        start_response(status, headers, captured['exc_info'])
+        return [compressed]
+
+    def _compressible(self, status, headers):
+        if not status.startswith('2') or status.startswith('204'):
+            return False
+        content_type = ''
+        for name, value in headers:
+            lname = name.lower()
+            if lname == 'content-encoding':
+                return False
+            if lname == 'content-disposition' and value.lower().startswith('attachment'):
+                return False
+            if lname == 'content-type':
+                content_type = value.lower()
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    @staticmethod
+    def _chain(written, app_iter):
+        yield from written
+        yield from app_iter
+
+    def compress(self, coding, body):
+        """Compress a complete body with the given coding"""
+        if coding == 'br':
+            return brotli.compress(body, quality=self.brotli_quality)
+        compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+        return compressor.compress(body) + compressor.flush()
+
+    def _cached_compress(self, coding, body, etag):
+        if not etag or not self.cache_size:
+            return self.compress(coding, body)
+
+        key = (etag, coding)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                self.cache_hits += 1
+                return cached
+            self.cache_misses += 1
+
+        compressed = self.compress(coding, body)
+        with self._lock:
+            self._cache[key] = compressed
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return compressed
+
+    def _stream(self, coding, chunks):
+        if coding == 'br':
+            compressor = brotli.Compressor(quality=self.brotli_quality)
+            for chunk in chunks:
+                if chunk:
+                    data = compressor.process(chunk) + compressor.flush()
+                    if data:
+                        yield data
+            yield compressor.finish()
+        else:
+            compressor = zlib.compressobj(self.gzip_level, zlib.DEFLATED, 31)
+            for chunk in chunks:
+                if chunk:
+                    data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                    if data:
+                        yield data
+            yield compressor.flush()
+
+
+def add_etag(response):
+    """
+    Tag successful JSON/msgpack GET responses and answer If-None-Match with 304
+
+    Registered as an after_request hook; the ETag also keys the
+    compressed-body cache of CompressionMiddleware.
+    """
+    if (request.method == 'GET' and response.status_code == 200
+            and response.mimetype in ('application/json', 'application/msgpack')
+            and not response.direct_passthrough and not response.is_streamed):
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
+def init_compression(app):
+    """Register ETag tagging and wrap the WSGI app with CompressionMiddleware"""
+    app.after_request(add_etag)
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config['COMPRESSION_MIN_SIZE'],
+        gzip_level=app.config['COMPRESSION_GZIP_LEVEL'],
+        brotli_quality=app.config['COMPRESSION_BROTLI_QUALITY'],
+        cache_size=app.config['COMPRESSION_CACHE_SIZE']
+    )
+    return app.wsgi_app
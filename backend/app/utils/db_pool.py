@@ -0,0 +1,193 @@
+import os
+import threading
+import time
+import weakref
+from flask import current_app, has_request_context, jsonify, request
+from sqlalchemy import event
+from sqlalchemy import exc as sa_exc
+from sqlalchemy.pool import QueuePool
+from app.utils.metrics import pool_waiting
+
+# Every engine set up by init_pool, so forked workers can drop inherited connections
+_engines = weakref.WeakSet()
+
+
+class PoolExhaustedError(sa_exc.TimeoutError):
+    """No database connection became available within DB_POOL_TIMEOUT"""
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records how long checkouts wait and how often they time out
+
+    Timeouts are raised as PoolExhaustedError, which the app turns into a 503.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.waits = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+        self.timeouts = 0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        pool_waiting(1)
+        try:
+            return super()._do_get()
+        except sa_exc.TimeoutError as e:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise PoolExhaustedError(str(e)) from e
+        finally:
+            pool_waiting(-1)
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.waits += 1
+                self.wait_seconds_total += waited
+                self.wait_seconds_max = max(self.wait_seconds_max, waited)
+
+    def recreate(self):
+        # Keep counters across dispose()/recreate()
+        pool = super().recreate()
+        pool.waits = self.waits
+        pool.wait_seconds_total = self.wait_seconds_total
+        pool.wait_seconds_max = self.wait_seconds_max
+        pool.timeouts = self.timeouts
+        return pool
+
+
+def pool_stats(engines):
+    """
+    Snapshot connection pool statistics
+
+    Args:
+        engines: Mapping of bind key (None for the primary) to Engine
+
+    Returns:
+        Dictionary of bind name to pool counters
+    """
+    stats = {}
+    for key, engine in engines.items():
+        pool = engine.pool
+        entry = {'pool_class': type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            entry.update({
+                'size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'checked_out': pool.checkedout(),
+                'overflow': max(pool.overflow(), 0),
+                'max_overflow': pool._max_overflow,
+            })
+        if isinstance(pool, InstrumentedQueuePool):
+            with pool._stats_lock:
+                entry.update({
+                    'waits': pool.waits,
+                    'wait_seconds_total': round(pool.wait_seconds_total, 6),
+                    'wait_seconds_max': round(pool.wait_seconds_max, 6),
+                    'timeouts': pool.timeouts,
+                })
+        stats[key or 'primary'] = entry
+    return stats
+
+
+def _is_memory_sqlite(uri):
+    return uri in ('sqlite://', 'sqlite:///:memory:') or 'mode=memory' in uri
+
+
+def configure_pool(app):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings
+
+    Must run before db.init_app(). In-memory SQLite keeps its default pool.
+    """
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('pool_pre_ping', app.config['DB_POOL_PRE_PING'])
+
+    if not _is_memory_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        options.setdefault('poolclass', InstrumentedQueuePool)
+        options.setdefault('pool_size', app.config['DB_POOL_SIZE'])
+        options.setdefault('max_overflow', app.config['DB_MAX_OVERFLOW'])
+        options.setdefault('pool_timeout', app.config['DB_POOL_TIMEOUT'])
+        options.setdefault('pool_recycle', app.config['DB_POOL_RECYCLE'])
+
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def current_statement_timeout():
+    """Statement timeout (ms) for the current request: per-view override or DB_STATEMENT_TIMEOUT_MS"""
+    timeout = current_app.config['DB_STATEMENT_TIMEOUT_MS']
+    if has_request_context() and request.endpoint:
+        view = current_app.view_functions.get(request.endpoint)
+        timeout = getattr(view, 'statement_timeout_ms', timeout)
+    return timeout
+
+
+def _set_statement_timeout(connection):
+    timeout = current_statement_timeout()
+    if timeout:
+        connection.exec_driver_sql(f'SET LOCAL statement_timeout = {int(timeout)}')
+
+
+def _acquire_connection():
+    """
+    before_request hook: take the request's connection up front so exhaustion fails fast
+
+    Skipped for preflights, unmatched URLs (404/405) and the database-free
+    DB_POOL_EXEMPT_ENDPOINTS, which would otherwise hold a connection they never use.
+    """
+    if request.method == 'OPTIONS' or request.endpoint is None:
+        return None
+    if request.endpoint in current_app.config['DB_POOL_EXEMPT_ENDPOINTS']:
+        return None
+    if request.method in ('GET', 'HEAD') and current_app.config['REPLICA_BIND_KEYS']:
+        return None  # The replica is picked once the user is known (read-your-writes)
+    from app import db
+    db.session.connection()
+    return None
+
+
+def _pool_exhausted(error):
+    response = jsonify({
+        'error': 'Service temporarily unavailable',
+        'details': 'Database connection pool exhausted, please retry'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+
+def dispose_engines_after_fork():
+    """
+    Forget pooled connections inherited from the parent process
+
+    Runs in every forked child (e.g. gunicorn workers with --preload). The
+    parent's connections are left open for the parent (close=False); the
+    child opens its own on first use.
+    """
+    for engine in list(_engines):
+        engine.dispose(close=False)
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=dispose_engines_after_fork)
+
+
+def init_pool(app, db):
+    """
+    Register statement timeouts, early connection checkout and the 503 handler
+
+    Statement timeouts use SET LOCAL and only apply to PostgreSQL. Engines are
+    disposed in forked children so a preloaded app never shares a connection
+    between processes.
+    """
+    with app.app_context():
+        for engine in db.engines.values():
+            _engines.add(engine)
+            if engine.dialect.name == 'postgresql':
+                event.listen(engine, 'begin', _set_statement_timeout)
+
+    if app.config['DB_POOL_ACQUIRE_ON_REQUEST']:
+        app.before_request(_acquire_connection)
+    app.register_error_handler(PoolExhaustedError, _pool_exhausted)
@@ -0,0 +1,168 @@
+import hashlib
+import hmac
+import itertools
+import sqlite3
+import threading
+import time
+from flask import current_app, g, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+
+READ_METHODS = ('GET', 'HEAD')
+
+# Returned after a write and echoed back by the client: "<unix time>.<signature>" until which
+# the user's reads stay on the primary, whichever worker or server handles them
+STICKY_HEADER = 'X-Primary-Until'
+
+# bind key -> (healthy, checked_at)
+_replica_health = {}
+_health_lock = threading.Lock()
+_round_robin = itertools.count()
+
+
+def replica_keys():
+    """Bind keys of the configured read replicas"""
+    return current_app.config.get('REPLICA_BIND_KEYS', ())
+
+
+def _sticky_signature(user_id, until):
+    key = hashlib.sha256(b'replica-sticky:' + current_app.config['SECRET_KEY'].encode()).digest()
+    return hmac.new(key, f'{user_id}.{until}'.encode(), hashlib.sha256).hexdigest()[:32]
+
+
+def sticky_token(user_id):
+    """STICKY_HEADER value keeping a user's reads on the primary for REPLICA_STICKY_SECONDS from now"""
+    until = int(time.time() + current_app.config['REPLICA_STICKY_SECONDS']) + 1
+    return f'{until}.{_sticky_signature(user_id, until)}'
+
+
+def is_sticky(user_id):
+    """Check if the request carries an unexpired sticky token of this user (so replicas may not have caught up)"""
+    until, _, signature = request.headers.get(STICKY_HEADER, '').partition('.')
+    if not until.isdigit() or int(until) <= time.time():
+        return False
+    return hmac.compare_digest(signature.encode(), _sticky_signature(user_id, int(until)).encode())
+
+
+def mark_replica_down(key):
+    """Take a replica out of rotation until its next health check"""
+    with _health_lock:
+        _replica_health[key] = (False, time.monotonic())
+
+
+def _replica_healthy(key, engine):
+    interval = current_app.config['REPLICA_HEALTH_CHECK_INTERVAL']
+    now = time.monotonic()
+    with _health_lock:
+        healthy, checked_at = _replica_health.get(key, (None, 0.0))
+    if healthy is not None and now - checked_at < interval:
+        return healthy
+
+    try:
+        with engine.connect() as connection:
+            connection.exec_driver_sql('SELECT 1')
+        healthy = True
+    except Exception:
+        current_app.logger.warning('Read replica %s is unavailable, using primary', key)
+        healthy = False
+
+    with _health_lock:
+        _replica_health[key] = (healthy, now)
+    return healthy
+
+
+def choose_replica(engines):
+    """
+    Pick the engine to read from for the current request
+
+    Returns:
+        A healthy replica engine, or None to use the primary
+    """
+    keys = replica_keys()
+    if not keys or not has_request_context() or request.method not in READ_METHODS:
+        return None
+
+    user_id = g.get('current_user_id')
+    if user_id is not None and is_sticky(user_id):
+        return None
+
+    start = next(_round_robin)
+    for offset in range(len(keys)):
+        key = keys[(start + offset) % len(keys)]
+        engine = engines.get(key)
+        if engine is not None and _replica_healthy(key, engine):
+            return engine
+    return None
+
+
+class RoutingSession(Session):
+    """
+    Session that sends reads of GET/HEAD requests to a read replica
+
+    Everything else (writes, flushes, non-GET requests, requests echoing a
+    sticky token from a recent write, unhealthy replicas) uses the primary.
+    The choice is made once per request and kept for its whole transaction.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and not self._flushing and has_request_context():
+            if 'db_read_bind' not in g:
+                g.db_read_bind = choose_replica(self._db.engines)
+            if g.db_read_bind is not None:
+                return g.db_read_bind
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _stick_after_write(response):
+    """after_request hook: hand the writer a token that keeps their reads on the primary for a while"""
+    user_id = g.get('current_user_id')
+    if user_id is not None and request.method not in READ_METHODS and response.status_code < 400:
+        response.headers[STICKY_HEADER] = sticky_token(user_id)
+    return response
+
+
+def _sqlite_path(engine):
+    return engine.url.database if engine.url.get_backend_name() == 'sqlite' else None
+
+
+def init_replicas(app, db):
+    """
+    Set up read-replica routing for the configured replica binds
+
+    Registers the read-your-writes hook, marks replicas down on connection
+    errors and adds a `flask sync-replicas` command that copies a SQLite
+    primary into SQLite replica files for local testing.
+    """
+    if app.config['REPLICA_BIND_KEYS']:
+        app.after_request(_stick_after_write)
+
+    with app.app_context():
+        for key in app.config['REPLICA_BIND_KEYS']:
+            engine = db.engines[key]
+
+            @event.listens_for(engine, 'handle_error')
+            def _on_error(context, key=key):
+                if context.is_disconnect or context.connection is None:
+                    mark_replica_down(key)
+
+    @app.cli.command('sync-replicas')
+    def sync_replicas():
+        """Copy the SQLite primary database into every SQLite replica"""
+        primary_path = _sqlite_path(db.engine)
+        if not primary_path:
+            raise SystemExit('sync-replicas only supports SQLite databases')
+
+        source = sqlite3.connect(primary_path)
+        try:
+            for key in app.config['REPLICA_BIND_KEYS']:
+                replica_path = _sqlite_path(db.engines[key])
+                if not replica_path:
+                    continue
+                target = sqlite3.connect(replica_path)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                print(f'{key}: copied {primary_path} -> {replica_path}')
+        finally:
+            source.close()
@@ -1,8 +1,12 @@
+import hmac
+import time
 from functools import wraps
-from flask import request, jsonify
+from flask import current_app, request, jsonify, g
 import jwt
 from app.utils.jwt_utils import decode_token
 from app.models.user import User
+from app.utils.db_pool import PoolExhaustedError
+from app.utils.metrics import observe_jwt_decode
 
 def token_required(f):
     """
@@ -16,6 +20,11 @@ def token_required(f):
     """
     @wraps(f)
     def decorated(*args, **kwargs):
+        # Sub-requests of POST /api/batch reuse the batch's authenticated user
+        batch_user = g.get('batch_user')
+        if batch_user is not None:
+            return f(batch_user, *args, **kwargs)
+
         token = None
 
         # Check if token is in the Authorization header
@@ -32,12 +41,17 @@ def token_required(f):
 
         try:
             # Decode and validate token
+            started = time.perf_counter()
             payload = decode_token(token)
+            observe_jwt_decode(time.perf_counter() - started)
 
             # Verify it's an access token
             if payload.get('type') != 'access':
                 return jsonify({'error': 'Invalid token type'}), 401
 
+            # Remember who is asking (used for read-replica stickiness)
+            g.current_user_id = payload['user_id']
+
             # Get user from database
             current_user = User.query.get(payload['user_id'])
 
@@ -48,6 +62,8 @@ def token_required(f):
             return jsonify({'error': 'Token has expired'}), 401
         except jwt.InvalidTokenError:
             return jsonify({'error': 'Invalid token'}), 401
+        except PoolExhaustedError:
+            raise  # Answered with 503 by the app's error handler
         except Exception as e:
             return jsonify({'error': 'Token validation failed', 'details': str(e)}), 401
 
@@ -84,3 +100,44 @@ def user_type_required(*allowed_types):
 
         return decorated
     return decorator
+
+
+def statement_timeout(milliseconds):
+    """
+    Decorator to override DB_STATEMENT_TIMEOUT_MS for one view (PostgreSQL only)
+
+    Usage:
+        @bp.route('/report')
+        @statement_timeout(30000)
+        def slow_report():
+            ...
+    """
+    def decorator(f):
+        f.statement_timeout_ms = milliseconds
+        return f
+    return decorator
+
+
+def admin_token_required(f):
+    """
+    Decorator for operational admin endpoints: require the ADMIN_TOKEN bearer token
+
+    Usage:
+        @bp.route('/pool')
+        @admin_token_required
+        def pool_status():
+            ...
+
+    Refuses every request (403) while ADMIN_TOKEN is not set.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        token = current_app.config['ADMIN_TOKEN']
+        if not token:
+            return jsonify({'error': 'Admin endpoints are disabled; set ADMIN_TOKEN to enable them'}), 403
+        expected = f'Bearer {token}'.encode()
+        if not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected):
+            return jsonify({'error': 'Invalid admin token'}), 401
+        return f(*args, **kwargs)
+
+    return decorated
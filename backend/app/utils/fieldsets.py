@@ -0,0 +1,43 @@
+from flask import request
+
+
+def parse_fields(allowed):
+    """
+    Parse the ?fields= query parameter (comma-separated field names)
+
+    Args:
+        allowed: Iterable of field names the endpoint can return
+
+    Returns:
+        frozenset of requested field names, or None when the parameter is absent
+
+    Raises:
+        ValueError: If an unknown field is requested
+    """
+    raw = request.args.get('fields')
+    if not raw:
+        return None
+
+    fields = frozenset(field.strip() for field in raw.split(',') if field.strip())
+    unknown = fields - set(allowed)
+    if unknown:
+        raise ValueError(f"Unknown field(s): {', '.join(sorted(unknown))}")
+
+    return fields
+
+
+def column_attrs(model, schema, fields, always=()):
+    """
+    Get the column attributes to pass to load_only() for the requested fields
+
+    Args:
+        model: Model class being queried
+        schema: ModelSchema of the model
+        fields: Requested field names, or None for every column
+        always: Extra columns the endpoint needs even if not requested
+
+    Returns:
+        List of model column attributes (always including the primary key)
+    """
+    names = {'id', *schema.only(fields).fields, *always}
+    return [getattr(model, name) for name in sorted(names)]
@@ -0,0 +1,260 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from app.utils.metrics import observe_inbox_cache
+from app.utils.redis_client import get_redis, redis
+
+logger = logging.getLogger(__name__)
+
+# Invalidations remembered (per user and per conversation, see MemoryInboxCache)
+MAX_TRACKED_INVALIDATIONS = 10000
+
+
+class MemoryInboxCache:
+    """
+    Serialized inbox responses of this process, per user and request variant
+
+    Users are evicted least recently used first once the cached bodies
+    exceed max_bytes, and entries expire after ttl seconds (which bounds how
+    long writes made by other worker processes go unnoticed).
+
+    A clock is bumped by every invalidation, and users and conversations
+    remember the clock value of their last one. lookup() returns the clock
+    as a token before the caller queries the database; the body stored with
+    it is only served while neither its user nor any conversation it lists
+    was invalidated after the token. So a response computed from data older
+    than the latest write is never served, and a send to a large group costs
+    one stamp instead of touching every member's entries.
+    """
+
+    def __init__(self, ttl=5, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # user_id -> {variant: (stored_at, token, conversation_ids, body)}
+        self._bytes = 0
+        self._clock = 0  # Bumped by every invalidation
+        self._invalidated = OrderedDict()  # ('user' | 'conversation', id) -> clock value of the last invalidation
+        self._floor = 0  # Highest clock value forgotten from _invalidated
+        self._lock = threading.Lock()
+
+    def _current(self, user_id, token, conversation_ids):
+        """Whether a body computed at token is still up to date (call with the lock held)"""
+        if self._floor > token or self._invalidated.get(('user', user_id), 0) > token:
+            return False
+        return all(self._invalidated.get(('conversation', conversation_id), 0) <= token
+                   for conversation_id in conversation_ids)
+
+    def lookup(self, user_id, variant):
+        now = time.monotonic()
+        with self._lock:
+            token = self._clock
+            variants = self._entries.get(user_id)
+            cached = variants.get(variant) if variants else None
+            if cached is None:
+                return None, token
+            stored_at, cached_token, conversation_ids, body = cached
+            if now - stored_at >= self.ttl or not self._current(user_id, cached_token, conversation_ids):
+                del variants[variant]
+                self._bytes -= len(body)
+                return None, token
+            self._entries.move_to_end(user_id)
+            return body, token
+
+    def store(self, user_id, variant, body, token, conversation_ids):
+        now = time.monotonic()
+        with self._lock:
+            if not self._current(user_id, token, conversation_ids):
+                return False  # Invalidated while this body was computed
+            variants = self._entries.setdefault(user_id, {})
+            previous = variants.get(variant)
+            if previous is not None:
+                self._bytes -= len(previous[3])
+            variants[variant] = (now, token, tuple(conversation_ids), body)
+            self._bytes += len(body)
+            self._entries.move_to_end(user_id)
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= sum(len(cached[3]) for cached in evicted.values())
+            return True
+
+    def _stamp(self, kind, ids):
+        self._clock += 1
+        for id_ in ids:
+            self._invalidated[(kind, id_)] = self._clock
+            self._invalidated.move_to_end((kind, id_))
+        while len(self._invalidated) > MAX_TRACKED_INVALIDATIONS:
+            _, forgotten = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, forgotten)
+
+    def invalidate(self, user_ids):
+        with self._lock:
+            for user_id in user_ids:
+                variants = self._entries.pop(user_id, None)
+                if variants:
+                    self._bytes -= sum(len(cached[3]) for cached in variants.values())
+            self._stamp('user', user_ids)
+
+    def invalidate_conversations(self, conversation_ids):
+        """Outdate every body listing these conversations (dropped when next looked up)"""
+        with self._lock:
+            self._stamp('conversation', conversation_ids)
+
+    def clear(self):
+        with self._lock:
+            self._clock += 1
+            self._floor = self._clock
+            self._entries.clear()
+            self._invalidated.clear()
+            self._bytes = 0
+
+
+class RedisInboxCache:
+    """
+    Serialized inbox responses shared by every worker through Redis
+
+    Works like MemoryInboxCache with the clock and the invalidation stamps
+    in Redis: invalidating a user or a conversation is an INCR of the clock
+    and one SET per id, however many members a conversation has. Bodies are
+    stored with the token and conversation ids they were computed with and
+    checked against the stamps when read (one or two round trips). Entries
+    and stamps expire, so size is bounded by the TTL and Redis' maxmemory
+    policy. Redis errors are logged and treated as misses.
+    """
+
+    def __init__(self, url, ttl=60, prefix='inbox'):
+        self.url = url
+        self.ttl = ttl
+        self.prefix = prefix
+
+    @property
+    def client(self):
+        return get_redis(self.url)
+
+    def _stamp_key(self, kind, id_):
+        return f'{self.prefix}:{kind}:{id_}'
+
+    def lookup(self, user_id, variant):
+        try:
+            clock, floor, user_stamp, entry = self.client.mget(
+                f'{self.prefix}:clock', f'{self.prefix}:floor', self._stamp_key('user', user_id),
+                f'{self.prefix}:{user_id}:{variant}'
+            )
+            token = int(clock or 0)
+            if entry is None:
+                return None, token
+            header, body = entry.split(b'\n', 1)
+            cached_token, _, conversation_ids = header.decode().partition(' ')
+            cached_token = int(cached_token)
+            if max(int(floor or 0), int(user_stamp or 0)) > cached_token:
+                return None, token
+            if conversation_ids:
+                stamps = self.client.mget([self._stamp_key('conversation', conversation_id)
+                                           for conversation_id in conversation_ids.split(',')])
+                if any(int(stamp or 0) > cached_token for stamp in stamps):
+                    return None, token
+            return body, token
+        except redis.RedisError as e:
+            logger.warning('Inbox cache unavailable: %s', e)
+            return None, None
+
+    def store(self, user_id, variant, body, token, conversation_ids):
+        if token is None:
+            return False
+        header = f"{token} {','.join(str(conversation_id) for conversation_id in conversation_ids)}\n"
+        try:
+            self.client.set(f'{self.prefix}:{user_id}:{variant}', header.encode() + body, ex=int(self.ttl))
+            return True
+        except redis.RedisError as e:
+            logger.warning('Inbox cache unavailable: %s', e)
+            return False
+
+    def _stamp(self, kind, ids):
+        clock = self.client.incr(f'{self.prefix}:clock')
+        pipe = self.client.pipeline(transaction=False)
+        for id_ in ids:
+            pipe.set(self._stamp_key(kind, id_), clock, ex=int(self.ttl) * 2)  # Outlives every body computed before
+        pipe.execute()
+
+    def invalidate(self, user_ids):
+        try:
+            self._stamp('user', user_ids)
+        except redis.RedisError as e:
+            # Stale for at most INBOX_CACHE_TTL
+            logger.warning('Inbox cache unavailable, could not invalidate %s: %s', user_ids, e)
+
+    def invalidate_conversations(self, conversation_ids):
+        try:
+            self._stamp('conversation', conversation_ids)
+        except redis.RedisError as e:
+            logger.warning('Inbox cache unavailable, could not invalidate conversations %s: %s',
+                           conversation_ids, e)
+
+    def clear(self):
+        try:
+            self.client.set(f'{self.prefix}:floor', self.client.incr(f'{self.prefix}:clock'))
+        except redis.RedisError as e:
+            logger.warning('Inbox cache unavailable, could not clear it: %s', e)
+
+
+def get_inbox_cache():
+    """The current app's inbox cache, or None when disabled"""
+    return current_app.extensions.get('inbox_cache')
+
+
+def cached_inbox(user_id, variant):
+    """
+    Look up a user's serialized inbox
+
+    Returns:
+        (body or None, token to pass to cache_inbox on a miss)
+    """
+    cache = get_inbox_cache()
+    if cache is None:
+        return None, None
+    body, token = cache.lookup(user_id, variant)
+    observe_inbox_cache(body is not None)
+    return body, token
+
+
+def cache_inbox(user_id, variant, body, token, conversation_ids):
+    """Cache a freshly computed inbox body (listing conversation_ids) unless it changed meanwhile"""
+    cache = get_inbox_cache()
+    if cache is not None and token is not None:
+        cache.store(user_id, variant, body, token, conversation_ids)
+
+
+def invalidate_inboxes(*user_ids):
+    """Drop cached inboxes after a committed write that changes them"""
+    cache = get_inbox_cache()
+    if cache is not None and user_ids:
+        cache.invalidate(user_ids)
+
+
+def invalidate_conversation_inboxes(conversation_id, *extra_user_ids):
+    """
+    Outdate every cached inbox that lists a conversation (plus extra users' inboxes)
+
+    Constant work whatever the member count. Pass users who just joined or
+    left as extra_user_ids: their cached inboxes do not list it yet, or
+    still do.
+    """
+    cache = get_inbox_cache()
+    if cache is None:
+        return
+    cache.invalidate_conversations([conversation_id])
+    if extra_user_ids:
+        cache.invalidate(extra_user_ids)
+
+
+def init_inbox_cache(app):
+    """Cache inboxes in Redis when INBOX_CACHE_REDIS_URL is set, otherwise in this process"""
+    config = app.config
+    if not config['INBOX_CACHE_ENABLED']:
+        return
+    if config['INBOX_CACHE_REDIS_URL']:
+        cache = RedisInboxCache(config['INBOX_CACHE_REDIS_URL'], config['INBOX_CACHE_TTL'])
+    else:
+        cache = MemoryInboxCache(config['INBOX_CACHE_TTL'], config['INBOX_CACHE_MAX_BYTES'])
+    app.extensions['inbox_cache'] = cache
@@ -0,0 +1,194 @@
+import hmac
+import os
+import time
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+try:
+    import prometheus_client
+    from prometheus_client import multiprocess
+except ImportError:  # pragma: no cover - optional dependency
+    prometheus_client = None
+
+# Seconds-scale buckets for request latency; JWT decoding is much faster
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+FAST_BUCKETS = (0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01)
+
+if prometheus_client is not None:
+    REQUESTS = prometheus_client.Counter(
+        'http_requests_total', 'HTTP requests by route and status', ['blueprint', 'endpoint', 'method', 'status']
+    )
+    REQUEST_SECONDS = prometheus_client.Histogram(
+        'http_request_duration_seconds', 'Request latency by route', ['blueprint', 'endpoint', 'method'],
+        buckets=LATENCY_BUCKETS
+    )
+    IN_FLIGHT = prometheus_client.Gauge(
+        'http_requests_in_flight', 'Requests being handled', multiprocess_mode='livesum'
+    )
+    STREAMS = prometheus_client.Gauge(
+        'http_streams_active', 'Streamed or file responses still being sent', multiprocess_mode='livesum'
+    )
+    DB_SECONDS = prometheus_client.Histogram(
+        'db_time_per_request_seconds', 'Time spent in SQL per request', ['endpoint'], buckets=LATENCY_BUCKETS
+    )
+    JWT_DECODE_SECONDS = prometheus_client.Histogram(
+        'jwt_decode_seconds', 'Time to decode and verify an access token', buckets=FAST_BUCKETS
+    )
+    UPLOAD_BYTES = prometheus_client.Counter(
+        'message_upload_bytes_total', 'Bytes of attachments stored'
+    )
+    MARK_READS = prometheus_client.Counter(
+        'mark_read_total', 'Mark-read calls by outcome (unchanged, buffered or written)', ['outcome']
+    )
+    INBOX_CACHE = prometheus_client.Counter(
+        'inbox_cache_requests_total', 'Inbox cache lookups by result (hit or miss)', ['result']
+    )
+    RECENT_MESSAGES = prometheus_client.Counter(
+        'recent_messages_requests_total', 'Message pages by source (hit, loaded tail or miss to the database)',
+        ['result']
+    )
+    POOL_WAITERS = prometheus_client.Gauge(
+        'db_pool_waiters', 'Threads waiting for a database connection', multiprocess_mode='livesum'
+    )
+    POOL_CHECKED_OUT = prometheus_client.Gauge(
+        'db_pool_checked_out', 'Database connections in use', ['bind'], multiprocess_mode='livesum'
+    )
+
+
+def observe_jwt_decode(seconds):
+    """Record the time token_required spent decoding a token"""
+    if prometheus_client is not None:
+        JWT_DECODE_SECONDS.observe(seconds)
+
+
+def observe_upload(size):
+    """Record bytes of an attachment written to storage"""
+    if prometheus_client is not None and size:
+        UPLOAD_BYTES.inc(size)
+
+
+def observe_mark_read(outcome):
+    """Count a mark-read call: 'unchanged', 'buffered' (write-behind) or 'written'"""
+    if prometheus_client is not None:
+        MARK_READS.labels(outcome).inc()
+
+
+def observe_inbox_cache(hit):
+    """Count an inbox cache lookup"""
+    if prometheus_client is not None:
+        INBOX_CACHE.labels('hit' if hit else 'miss').inc()
+
+
+def observe_recent_messages(result):
+    """Count a message page: 'hit' (held tail), 'loaded' (tail loaded for it) or 'miss' (paginated query)"""
+    if prometheus_client is not None:
+        RECENT_MESSAGES.labels(result).inc()
+
+
+def pool_waiting(delta):
+    """Track threads blocked in a pool checkout (called by InstrumentedQueuePool)"""
+    if prometheus_client is not None:
+        POOL_WAITERS.inc(delta)
+
+
+def _labels():
+    endpoint = request.endpoint or 'unmatched'
+    return request.blueprint or '', endpoint, request.method
+
+
+def _add_db_time(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_metrics_started', None)
+    if started is not None and has_request_context():
+        g.metrics_db_seconds = g.get('metrics_db_seconds', 0.0) + time.perf_counter() - started
+
+
+def _start_db_timer(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._metrics_started = time.perf_counter()
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    request.environ['app.metrics_in_flight'] = True  # Per request: batch sub-requests share g
+    IN_FLIGHT.inc()
+
+
+def _finish_request(response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return response
+    blueprint, endpoint, method = _labels()
+    REQUESTS.labels(blueprint, endpoint, method, str(response.status_code)).inc()
+    REQUEST_SECONDS.labels(blueprint, endpoint, method).observe(time.perf_counter() - started)
+    DB_SECONDS.labels(endpoint).observe(g.pop('metrics_db_seconds', 0.0))
+
+    from app import db
+    _update_pool_gauges(db.engines)
+
+    if response.is_streamed or response.direct_passthrough:
+        STREAMS.inc()
+        response.call_on_close(STREAMS.dec)
+    return response
+
+
+def _end_request(error=None):
+    if request.environ.pop('app.metrics_in_flight', False):
+        IN_FLIGHT.dec()
+
+
+def _update_pool_gauges(engines):
+    for key, engine in engines.items():
+        checkedout = getattr(engine.pool, 'checkedout', None)
+        if checkedout is not None:
+            POOL_CHECKED_OUT.labels(key or 'primary').set(checkedout())
+
+
+def metrics_view():
+    """
+    Prometheus metrics for every worker process
+
+    With PROMETHEUS_MULTIPROC_DIR set (see gunicorn.conf.py), values from all
+    workers are aggregated; otherwise only this process is reported. Requires
+    METRICS_TOKEN when set, and is refused while it is unset in production.
+    """
+    token = current_app.config['METRICS_TOKEN']
+    if not token and current_app.config['METRICS_REQUIRE_TOKEN']:
+        return current_app.response_class('Metrics are disabled; set METRICS_TOKEN to enable them\n', status=403,
+                                          mimetype='text/plain')
+    expected = f'Bearer {token}'.encode()
+    if token and not hmac.compare_digest(request.headers.get('Authorization', '').encode(), expected):
+        return current_app.response_class('Unauthorized\n', status=401, mimetype='text/plain')
+
+    from app import db
+    _update_pool_gauges(db.engines)
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = prometheus_client.CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = prometheus_client.REGISTRY
+    return current_app.response_class(
+        prometheus_client.generate_latest(registry), mimetype=prometheus_client.CONTENT_TYPE_LATEST
+    )
+
+
+def init_metrics(app, db):
+    """
+    Instrument requests and SQL time and serve GET /metrics
+
+    Runs before the other request hooks so requests rejected early (e.g. 503
+    on pool exhaustion) are still counted.
+    """
+    if prometheus_client is None:
+        app.logger.warning('METRICS_ENABLED is set but prometheus_client is not installed')
+        return
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _start_db_timer)
+            event.listen(engine, 'after_cursor_execute', _add_db_time)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    app.teardown_request(_end_request)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,151 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from app.utils.redis_client import get_redis, redis
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryPresenceStore:
+    """
+    Online and typing state of this process, expiring after a TTL
+
+    Entries are kept in insertion order and moved to the end when refreshed.
+    With one TTL per kind that order is also expiry order, so expired
+    entries are swept from the front in O(expired) on every write. Both maps
+    are capped (least recently active dropped first), so memory stays
+    bounded however many users come and go.
+    """
+
+    def __init__(self, online_ttl=60, typing_ttl=6, max_users=100000, max_conversations=10000):
+        self.online_ttl = online_ttl
+        self.typing_ttl = typing_ttl
+        self.max_users = max_users
+        self.max_conversations = max_conversations
+        self._online = OrderedDict()  # user_id -> expires_at
+        self._typing = OrderedDict()  # conversation_id -> OrderedDict(user_id -> expires_at)
+        self._lock = threading.Lock()
+
+    def _sweep(self, now):
+        while self._online:
+            user_id, expires_at = next(iter(self._online.items()))
+            if expires_at > now and len(self._online) <= self.max_users:
+                break
+            del self._online[user_id]
+        while self._typing:
+            conversation_id, typists = next(iter(self._typing.items()))
+            if len(self._typing) <= self.max_conversations and any(e > now for e in typists.values()):
+                break
+            del self._typing[conversation_id]
+
+    def touch(self, user_id):
+        now = time.monotonic()
+        with self._lock:
+            self._online[user_id] = now + self.online_ttl
+            self._online.move_to_end(user_id)
+            self._sweep(now)
+
+    def set_typing(self, conversation_id, user_id, typing):
+        now = time.monotonic()
+        with self._lock:
+            typists = self._typing.get(conversation_id)
+            if typing:
+                if typists is None:
+                    typists = self._typing[conversation_id] = OrderedDict()
+                typists[user_id] = now + self.typing_ttl
+                typists.move_to_end(user_id)
+                self._typing.move_to_end(conversation_id)
+            elif typists is not None:
+                typists.pop(user_id, None)
+            self._sweep(now)
+
+    def online(self, user_ids):
+        now = time.monotonic()
+        with self._lock:
+            return {user_id for user_id in user_ids if self._online.get(user_id, 0) > now}
+
+    def typing(self, conversation_id):
+        now = time.monotonic()
+        with self._lock:
+            typists = self._typing.get(conversation_id) or {}
+            return {user_id for user_id, expires_at in typists.items() if expires_at > now}
+
+
+class RedisPresenceStore:
+    """
+    Online and typing state shared by every worker through Redis
+
+    Online users are keys with an expiry; each conversation's typists are a
+    sorted set scored by expiry time, itself expiring once nobody types.
+    Redis errors are logged and treated as "nobody online/typing".
+    """
+
+    def __init__(self, url, online_ttl=60, typing_ttl=6, prefix='presence'):
+        self.url = url
+        self.online_ttl = online_ttl
+        self.typing_ttl = typing_ttl
+        self.prefix = prefix
+
+    @property
+    def client(self):
+        return get_redis(self.url)  # Per process, so forked workers get their own connections
+
+    def _online_key(self, user_id):
+        return f'{self.prefix}:online:{user_id}'
+
+    def _typing_key(self, conversation_id):
+        return f'{self.prefix}:typing:{conversation_id}'
+
+    def _call(self, default, operation):
+        try:
+            return operation()
+        except redis.RedisError as e:
+            logger.warning('Presence backend unavailable: %s', e)
+            return default
+
+    def touch(self, user_id):
+        self._call(None, lambda: self.client.set(self._online_key(user_id), 1, ex=int(self.online_ttl)))
+
+    def set_typing(self, conversation_id, user_id, typing):
+        key = self._typing_key(conversation_id)
+
+        def write():
+            pipe = self.client.pipeline(transaction=False)
+            if typing:
+                pipe.zadd(key, {user_id: time.time() + self.typing_ttl})
+                pipe.expire(key, int(self.typing_ttl) + 1)
+            else:
+                pipe.zrem(key, user_id)
+            pipe.execute()
+        self._call(None, write)
+
+    def online(self, user_ids):
+        user_ids = list(user_ids)
+        if not user_ids:
+            return set()
+        values = self._call([None] * len(user_ids),
+                            lambda: self.client.mget([self._online_key(user_id) for user_id in user_ids]))
+        return {user_id for user_id, value in zip(user_ids, values) if value is not None}
+
+    def typing(self, conversation_id):
+        key = self._typing_key(conversation_id)
+        members = self._call([], lambda: self.client.zrangebyscore(key, time.time(), '+inf'))
+        return {int(member) for member in members}
+
+
+def get_presence_store():
+    """The current app's presence store"""
+    return current_app.extensions['presence']
+
+
+def init_presence(app):
+    """Keep presence in Redis when PRESENCE_REDIS_URL is set, otherwise in this process"""
+    config = app.config
+    if config['PRESENCE_REDIS_URL']:
+        store = RedisPresenceStore(config['PRESENCE_REDIS_URL'], config['PRESENCE_TTL'], config['TYPING_TTL'])
+    else:
+        store = MemoryPresenceStore(config['PRESENCE_TTL'], config['TYPING_TTL'],
+                                    config['PRESENCE_MAX_USERS'], config['PRESENCE_MAX_CONVERSATIONS'])
+    app.extensions['presence'] = store
@@ -0,0 +1,164 @@
+import atexit
+import logging
+import os
+import threading
+import weakref
+from flask import current_app
+from sqlalchemy import bindparam, update
+from sqlalchemy.orm.attributes import set_committed_value
+from app.models.conversation import ConversationParticipant
+
+logger = logging.getLogger(__name__)
+
+
+class ReadPositionBuffer:
+    """
+    Write-behind buffer for conversation read positions (mark-read)
+
+    Positions are kept per user and conversation, so repeated mark-reads
+    of a conversation collapse into one row update carrying the highest
+    sequence. A background thread writes them every `interval` seconds in one
+    executemany UPDATE, and earlier whenever `max_pending` positions are
+    waiting. Positions stay visible to this process (pending_for) until
+    their write is committed; a failed write is retried on the next flush.
+    """
+
+    def __init__(self, app, db, interval=1.0, max_pending=10000):
+        self.app = app
+        self.db = db
+        self.interval = interval
+        self.max_pending = max_pending
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._pending = {}  # user_id -> {conversation_id: seq}
+        self._count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+
+    def _check_fork(self):
+        if self._pid != os.getpid():
+            self._reset()  # Forked: the parent's thread and locks are not ours
+
+    def add(self, user_id, conversation_id, seq):
+        """Queue a read position; an older position for the same pair is replaced"""
+        self._check_fork()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='read-positions', daemon=True)
+                self._thread.start()
+            positions = self._pending.setdefault(user_id, {})
+            current = positions.get(conversation_id)
+            if current is None:
+                self._count += 1
+            if current is None or seq > current:
+                positions[conversation_id] = seq
+            full = self._count >= self.max_pending
+        if full:
+            self._wake.set()
+
+    def pending_for(self, user_id):
+        """Unwritten read positions of a user, by conversation_id"""
+        self._check_fork()
+        with self._lock:
+            return dict(self._pending.get(user_id, ()))
+
+    def flush(self):
+        """
+        Write every pending position in one transaction
+
+        Returns:
+            Number of positions written (rows never move backwards: a newer
+            position already in the database is kept)
+        """
+        self._check_fork()
+        with self._flush_lock:
+            with self._lock:
+                batch = [(uid, cid, seq) for uid, positions in self._pending.items() for cid, seq in positions.items()]
+            if not batch:
+                return 0
+
+            table = ConversationParticipant.__table__
+            statement = update(table).where(
+                table.c.user_id == bindparam('uid'),
+                table.c.conversation_id == bindparam('cid'),
+                table.c.last_read_seq < bindparam('seq')
+            ).values(last_read_seq=bindparam('seq'))
+            with self.app.app_context():
+                try:
+                    self.db.session.execute(statement, [
+                        {'uid': uid, 'cid': cid, 'seq': seq} for uid, cid, seq in batch
+                    ])
+                    self.db.session.commit()
+                except Exception:
+                    self.db.session.rollback()
+                    raise
+
+            with self._lock:
+                for uid, cid, seq in batch:
+                    positions = self._pending.get(uid)
+                    if positions is not None and positions.get(cid) == seq:  # Not superseded while writing
+                        del positions[cid]
+                        self._count -= 1
+                        if not positions:
+                            del self._pending[uid]
+            return len(batch)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception('Failed to write read positions; retrying in %.1fs', self.interval)
+
+
+# Buffers of every app in this process, flushed at interpreter exit
+_buffers = weakref.WeakSet()
+
+
+def _flush_all():
+    for buffer in list(_buffers):
+        try:
+            buffer.flush()
+        except Exception:
+            logger.exception('Failed to write read positions at shutdown')
+
+
+atexit.register(_flush_all)
+
+
+def get_read_buffer():
+    """The current app's ReadPositionBuffer, or None when mark-read writes synchronously"""
+    return current_app.extensions.get('read_buffer')
+
+
+def pending_reads(user_id):
+    """Read positions of a user not yet written to the database, by conversation_id"""
+    buffer = get_read_buffer()
+    return buffer.pending_for(user_id) if buffer else {}
+
+
+def apply_pending_reads(user_id, memberships):
+    """Show a user's unwritten read positions on loaded ConversationParticipant rows"""
+    pending = pending_reads(user_id)
+    if not pending:
+        return
+    for membership in memberships:
+        seq = pending.get(membership.conversation_id)
+        if seq is not None and seq > (membership.last_read_seq or 0):
+            set_committed_value(membership, 'last_read_seq', seq)  # Display only; not flushed
+
+
+def init_read_buffer(app, db):
+    """Buffer mark-read writes when MARK_READ_FLUSH_INTERVAL is set (0 writes them immediately)"""
+    interval = app.config['MARK_READ_FLUSH_INTERVAL']
+    if interval <= 0:
+        return
+    buffer = ReadPositionBuffer(app, db, interval, app.config['MARK_READ_MAX_PENDING'])
+    app.extensions['read_buffer'] = buffer
+    _buffers.add(buffer)
@@ -0,0 +1,204 @@
+import threading
+from collections import OrderedDict
+from math import ceil
+from flask import current_app
+from sqlalchemy import func, select
+from sqlalchemy.orm import joinedload
+from app import db
+from app.models.conversation import Conversation, Message
+from app.utils.metrics import observe_recent_messages
+
+# Rough per-message overhead (dict, keys, datetime) on top of the string values
+MESSAGE_OVERHEAD = 400
+
+
+def _size(data):
+    """Approximate memory held by a serialized message"""
+    size = MESSAGE_OVERHEAD
+    for value in data.values():
+        if isinstance(value, str):
+            size += len(value)
+    return size
+
+
+class _Tail:
+    __slots__ = ('seq', 'total', 'messages', 'bytes')
+
+    def __init__(self, seq, total, messages):
+        self.seq = seq  # Conversation.message_seq the tail is current for
+        self.total = total  # Messages in the conversation
+        self.messages = messages  # Newest last
+        self.bytes = sum(_size(data) for data in messages)
+
+
+class RecentMessages:
+    """
+    The last messages of recently read conversations, serialized, in this process
+
+    Each conversation keeps at most per_conversation messages (as
+    Message.to_dict() dictionaries, sender embedded) with the conversation's
+    message count and message_seq. A tail is only used when its message_seq
+    matches the one the caller just read from the database, so messages sent
+    through other workers are never missed: the tail is reloaded instead.
+    Conversations are evicted least recently read first once all tails
+    exceed max_bytes.
+    """
+
+    def __init__(self, per_conversation=100, max_bytes=32 * 1024 * 1024):
+        self.per_conversation = per_conversation
+        self.max_bytes = max_bytes
+        self._tails = OrderedDict()  # conversation_id -> _Tail
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, conversation_id, seq):
+        """
+        Get the tail of a conversation as of message_seq
+
+        Returns:
+            (total, [message dict, ...] oldest first) or None when not held or stale
+        """
+        with self._lock:
+            tail = self._tails.get(conversation_id)
+            if tail is None:
+                return None
+            if tail.seq != seq:
+                self._drop(conversation_id)
+                return None
+            self._tails.move_to_end(conversation_id)
+            return tail.total, tail.messages
+
+    def put(self, conversation_id, seq, total, messages):
+        """Hold the newest messages (oldest first) of a conversation loaded from the database"""
+        tail = _Tail(seq, total, list(messages[-self.per_conversation:]))
+        with self._lock:
+            self._drop(conversation_id)
+            self._tails[conversation_id] = tail
+            self._bytes += tail.bytes
+            self._evict()
+
+    def append(self, conversation_id, seq, data):
+        """
+        Add a message just committed with message_seq seq
+
+        Only extends a tail that is exactly one message behind; any other
+        tail of the conversation is dropped and reloaded on the next read.
+        """
+        with self._lock:
+            tail = self._tails.get(conversation_id)
+            if tail is None:
+                return
+            messages = tail.messages
+            if messages and messages[-1]['id'] == data['id']:
+                tail.seq = max(tail.seq, seq)  # Already loaded with the tail
+                return
+            if tail.seq != seq - 1 or (messages and messages[-1]['created_at'] > data['created_at']):
+                self._drop(conversation_id)
+                return
+            # Replaced rather than mutated: readers may still hold the old list
+            messages = messages[1:] if len(messages) >= self.per_conversation else messages[:]
+            messages.append(data)
+            self._bytes -= tail.bytes
+            tail.seq, tail.total, tail.messages = seq, tail.total + 1, messages
+            tail.bytes = sum(_size(message) for message in messages)
+            self._bytes += tail.bytes
+            self._tails.move_to_end(conversation_id)
+            self._evict()
+
+    def clear(self):
+        with self._lock:
+            self._tails.clear()
+            self._bytes = 0
+
+    def _drop(self, conversation_id):
+        tail = self._tails.pop(conversation_id, None)
+        if tail is not None:
+            self._bytes -= tail.bytes
+
+    def _evict(self):
+        while self._bytes > self.max_bytes and self._tails:
+            _, tail = self._tails.popitem(last=False)
+            self._bytes -= tail.bytes
+
+
+def get_recent_messages():
+    """The current app's RecentMessages, or None when disabled"""
+    return current_app.extensions.get('recent_messages')
+
+
+def _load_tail(recent, conversation_id, seq):
+    """Load the newest messages, their count and message_seq in one query"""
+    rows = db.session.query(
+        Message,
+        func.count().over().label('total'),
+        select(Conversation.message_seq).where(Conversation.id == conversation_id).scalar_subquery()
+    ).filter(
+        Message.conversation_id == conversation_id
+    ).options(
+        joinedload(Message.sender)
+    ).order_by(Message.created_at.desc(), Message.id.desc()).limit(recent.per_conversation).all()
+
+    if rows:
+        _, total, seq = rows[0]
+    else:
+        total = 0
+    messages = [message.to_dict() for message, _, _ in reversed(rows)]
+    recent.put(conversation_id, seq, total, messages)
+    return total, messages
+
+
+def recent_page(conversation_id, seq, page, per_page):
+    """
+    Serve a page of messages (oldest first, like Query.paginate) from the recent-messages tail
+
+    Loads the tail when it is missing or stale and the page probably falls
+    within it.
+
+    Args:
+        seq: The conversation's message_seq as just read from the database
+
+    Returns:
+        (total, [message dict, ...]) or None when the page is not held (read it from the database)
+    """
+    recent = get_recent_messages()
+    if recent is None or page < 1 or per_page < 1:
+        return None
+    start = (page - 1) * per_page
+
+    window = recent.get(conversation_id, seq)
+    result = 'hit'
+    if window is None:
+        # message_seq counts the messages: skip loading a tail the page is not part of
+        if start < seq - recent.per_conversation:
+            observe_recent_messages('miss')
+            return None
+        window = _load_tail(recent, conversation_id, seq)
+        result = 'loaded'
+
+    total, messages = window
+    first = total - len(messages)  # Position of the oldest message held
+    if start < first:
+        observe_recent_messages('miss')
+        return None
+    observe_recent_messages(result)
+    return total, messages[start - first:start - first + per_page]
+
+
+def page_count(total, per_page):
+    """Number of pages, as Query.paginate reports it"""
+    return ceil(total / per_page) if total else 0
+
+
+def remember_message(conversation_id, seq, data):
+    """Append a committed message (Message.to_dict()) to its conversation's tail, if held"""
+    recent = get_recent_messages()
+    if recent is not None:
+        recent.append(conversation_id, seq, data)
+
+
+def init_recent_messages(app):
+    """Hold recent messages in memory unless RECENT_MESSAGES_PER_CONVERSATION is 0"""
+    per_conversation = app.config['RECENT_MESSAGES_PER_CONVERSATION']
+    if per_conversation <= 0:
+        return
+    app.extensions['recent_messages'] = RecentMessages(per_conversation, app.config['RECENT_MESSAGES_MAX_BYTES'])
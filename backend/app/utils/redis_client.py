@@ -0,0 +1,34 @@
+import os
+import threading
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - optional dependency
+    redis = None
+
+# (pid, url) -> client; connections are never shared across a fork
+_clients = {}
+_lock = threading.Lock()
+
+
+def get_redis(url):
+    """
+    Shared Redis client for url, created on first use in each process
+
+    Timeouts are short: callers use Redis for state that can be lost or
+    recomputed (presence, caches) and treat redis.RedisError as a miss.
+
+    Raises:
+        RuntimeError if the redis package is not installed
+    """
+    if redis is None:
+        raise RuntimeError('REDIS_URL is set but the redis package is not installed')
+    key = (os.getpid(), url)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+                _clients[key] = client
+    return client
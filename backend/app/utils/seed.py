@@ -0,0 +1,253 @@
+import random
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import chain
+
+import click
+from flask.cli import with_appcontext
+from sqlalchemy import bindparam, func, insert, select
+from werkzeug.security import generate_password_hash
+
+from app import db
+from app.models import User, Conversation, ConversationParticipant, Message, JobApplication
+
+BATCH_SIZE = 50000
+MAX_BIND_PARAMS = 999  # Lowest limit across supported SQLite versions
+
+ATTACHMENT_TYPES = (
+    ('pdf', 'application/pdf'),
+    ('png', 'image/png'),
+    ('jpg', 'image/jpeg'),
+    ('docx', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    ('zip', 'application/zip'),
+)
+APPLICATION_STATUSES = ('pending', 'accepted', 'rejected')
+
+
+def _insert_returning_ids(connection, table, rows):
+    """Insert rows (batched multi-row VALUES) and return their ids in order"""
+    statement = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+    return list(connection.scalars(statement, rows))
+
+
+def _bulk_insert(connection, table, columns, rows):
+    """
+    Insert tuples straight through the DBAPI, skipping per-row SQLAlchemy processing
+
+    Rows are packed into multi-row VALUES statements, so the driver executes
+    one statement per ~MAX_BIND_PARAMS values instead of one per row.
+    """
+    if not rows:
+        return
+    placeholder = '?' if connection.dialect.paramstyle == 'qmark' else '%s'
+    row_sql = f'({", ".join([placeholder] * len(columns))})'
+    prefix = f'INSERT INTO {table.name} ({", ".join(columns)}) VALUES '
+    per_statement = max(MAX_BIND_PARAMS // len(columns), 1)
+
+    packed = len(rows) - len(rows) % per_statement
+    if packed:
+        connection.exec_driver_sql(prefix + ', '.join([row_sql] * per_statement), [
+            tuple(chain.from_iterable(rows[i:i + per_statement])) for i in range(0, packed, per_statement)
+        ])
+    if packed < len(rows):
+        connection.exec_driver_sql(prefix + row_sql, rows[packed:])
+
+
+def message_counts(total, conversations, rng, skew=1.2):
+    """
+    Split total messages over conversations with a heavy-tailed (Pareto) distribution
+
+    Most conversations get a handful of messages and a few get thousands,
+    which is closer to production than an even split.
+    """
+    weights = [rng.paretovariate(skew) - 1 for _ in range(conversations)]  # Lomax: starts at zero
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for i in range(total - sum(counts)):  # Hand out the rounding remainder
+        counts[i % conversations] += 1
+    return counts
+
+
+def seed_database(users=1000, student_ratio=0.8, conversations=5000, messages=1000000,
+                  attachment_ratio=0.05, applications=2000, days=365, seed=None, log=print):
+    """
+    Bulk-generate synthetic users, direct conversations, messages and applications
+
+    Rows are written with DBAPI executemany in batches of BATCH_SIZE inside
+    one transaction, bypassing the ORM unit of work. Attachment rows carry
+    metadata only; no files are written.
+
+    Args:
+        users: Number of users (at least one of each user_type)
+        student_ratio: Fraction of users that are students
+        conversations: Number of student-employer conversations
+        messages: Total number of messages, spread with a skewed distribution
+        attachment_ratio: Fraction of messages with attachment metadata
+        applications: Number of job applications (pending/accepted/rejected)
+        days: Spread timestamps over this many days up to now
+        seed: Random seed for reproducible datasets
+        log: Progress callback taking one string
+
+    Returns:
+        Dictionary of table name to rows inserted
+    """
+    rng = random.Random(seed)
+    students = min(max(int(users * student_ratio), 1), users - 1)
+    employers = users - students
+    if students < 1 or employers < 1:
+        raise ValueError('users must be at least 2 (one student and one employer)')
+
+    now = datetime.utcnow()
+    start = now - timedelta(days=days)
+    span = (now - start).total_seconds()
+    inserted = {}
+
+    connection = db.session.connection()
+    if connection.dialect.name == 'sqlite':
+        # Trade durability for speed while seeding; reverts when the connection is closed
+        connection.exec_driver_sql('PRAGMA synchronous = OFF')
+
+    # Unique emails/usernames even when seeding into a non-empty database
+    offset = (connection.scalar(select(func.max(User.id))) or 0) + 1
+    password_hash = generate_password_hash('password')
+    user_table = User.__table__
+
+    def user_rows(user_type, count, first):
+        return [{
+            'email': f'seed-{user_type}{first + i}@example.com', 'username': f'seed-{user_type}{first + i}',
+            'password_hash': password_hash, 'user_type': user_type,
+            'full_name': f'Seed {user_type.title()} {first + i}',
+            'created_at': start + timedelta(seconds=rng.random() * span)
+        } for i in range(count)]
+
+    student_ids = _insert_returning_ids(connection, user_table, user_rows('student', students, offset))
+    employer_ids = _insert_returning_ids(connection, user_table, user_rows('employer', employers, offset))
+    inserted['users'] = users
+    log(f'users: {students} students, {employers} employers')
+
+    # Direct conversations between distinct student/employer pairs
+    conversations = min(conversations, students * employers)
+    pairs = set()
+    while len(pairs) < conversations:
+        pairs.add((rng.choice(student_ids), rng.choice(employer_ids)))
+    pairs = list(pairs)
+    counts = message_counts(messages, conversations, rng) if conversations else []
+
+    conversation_rows = []
+    for count in counts:
+        created_at = start + timedelta(seconds=rng.random() * span * 0.9)
+        conversation_rows.append({
+            'created_at': created_at, 'updated_at': created_at, 'is_group': False,
+            'member_count': 2, 'message_seq': count
+        })
+    conversation_ids = []
+    for i in range(0, len(conversation_rows), BATCH_SIZE):
+        conversation_ids += _insert_returning_ids(
+            connection, Conversation.__table__, conversation_rows[i:i + BATCH_SIZE]
+        )
+    inserted['conversations'] = len(conversation_ids)
+
+    # Bulk rows below are tuples sent straight to the DBAPI; SQLite stores datetimes as text
+    as_db_datetime = str if connection.dialect.name == 'sqlite' else (lambda value: value)
+    joined_at = as_db_datetime(now)
+
+    participant_rows = []
+    for conversation_id, (student_id, employer_id), count in zip(conversation_ids, pairs, counts):
+        participant_rows.append((conversation_id, student_id, max(count - rng.randint(0, 3), 0), joined_at))
+        participant_rows.append((conversation_id, employer_id, count, joined_at))
+    for i in range(0, len(participant_rows), BATCH_SIZE):
+        _bulk_insert(connection, ConversationParticipant.__table__,
+                     ('conversation_id', 'user_id', 'last_read_seq', 'joined_at'), participant_rows[i:i + BATCH_SIZE])
+    inserted['conversation_participants'] = len(participant_rows)
+    log(f'conversations: {len(conversation_ids)} (largest has {max(counts, default=0)} messages)')
+
+    # Messages, generated and written batch by batch to keep memory flat
+    message_columns = ('conversation_id', 'sender_id', 'content', 'created_at', 'is_system_message',
+                       'has_attachment', 'file_name', 'file_path', 'file_size', 'file_type')
+    random_ = rng.random
+    batch, written, last_message_at = [], 0, {}
+    user_bytes, conversation_bytes = defaultdict(int), defaultdict(int)
+    started = time.perf_counter()
+    for conversation_id, (student_id, employer_id), conversation_row, count in zip(
+            conversation_ids, pairs, conversation_rows, counts):
+        created_at = conversation_row['created_at']
+        step = timedelta(seconds=(now - created_at).total_seconds() / max(count, 1) * 2)
+        for n in range(count):
+            created_at = min(created_at + step * random_(), now)
+            sender_id = student_id if random_() < 0.5 else employer_id
+            content = f'Seed message {n} in conversation {conversation_id}'
+            if random_() < attachment_ratio:
+                extension, mime_type = rng.choice(ATTACHMENT_TYPES)
+                file_size = int(rng.lognormvariate(11, 1.5))
+                batch.append((conversation_id, sender_id, content, as_db_datetime(created_at), False, True,
+                              f'document-{n}.{extension}', f'seed-{conversation_id}-{n}.{extension}',
+                              file_size, mime_type))
+                user_bytes[sender_id] += file_size
+                conversation_bytes[conversation_id] += file_size
+            else:
+                batch.append((conversation_id, sender_id, content, as_db_datetime(created_at), False, False,
+                              None, None, None, None))
+            if len(batch) >= BATCH_SIZE:
+                _bulk_insert(connection, Message.__table__, message_columns, batch)
+                written += len(batch)
+                batch = []
+                log(f'messages: {written}/{messages} ({written / (time.perf_counter() - started):,.0f} rows/s)')
+        last_message_at[conversation_id] = created_at
+    _bulk_insert(connection, Message.__table__, message_columns, batch)
+    written += len(batch)
+    inserted['messages'] = written
+
+    # Conversations sort by their latest message
+    connection.execute(
+        Conversation.__table__.update().where(Conversation.__table__.c.id == bindparam('conversation_id')),
+        [{'conversation_id': cid, 'updated_at': at} for cid, at in last_message_at.items()]
+    )
+
+    # Storage usage counters (see app.utils.storage_quota)
+    for model, usage in ((User, user_bytes), (Conversation, conversation_bytes)):
+        table = model.__table__
+        if usage:
+            connection.execute(
+                table.update().where(table.c.id == bindparam('row_id')).values(
+                    storage_bytes=table.c.storage_bytes + bindparam('size')
+                ),
+                [{'row_id': row_id, 'size': size} for row_id, size in usage.items()]
+            )
+
+    application_rows = []
+    for i in range(applications):
+        applied_at = as_db_datetime(start + timedelta(seconds=rng.random() * span))
+        application_rows.append((
+            rng.choice(student_ids), rng.choice(employer_ids), f'Seed Role {i}',
+            rng.choices(APPLICATION_STATUSES, (5, 2, 3))[0], applied_at, applied_at
+        ))
+    for i in range(0, len(application_rows), BATCH_SIZE):
+        _bulk_insert(connection, JobApplication.__table__,
+                     ('student_id', 'employer_id', 'job_title', 'status', 'applied_at', 'updated_at'),
+                     application_rows[i:i + BATCH_SIZE])
+    inserted['job_applications'] = len(application_rows)
+
+    db.session.commit()
+    return inserted
+
+
+@click.command('seed')
+@click.option('--users', default=1000, show_default=True, help='Number of users.')
+@click.option('--student-ratio', default=0.8, show_default=True, help='Fraction of users that are students.')
+@click.option('--conversations', default=5000, show_default=True, help='Direct conversations.')
+@click.option('--messages', default=1000000, show_default=True, help='Total messages (skewed across conversations).')
+@click.option('--attachment-ratio', default=0.05, show_default=True, help='Fraction of messages with attachments.')
+@click.option('--applications', default=2000, show_default=True, help='Job applications at mixed statuses.')
+@click.option('--days', default=365, show_default=True, help='Spread timestamps over this many days.')
+@click.option('--seed', type=int, default=None, help='Random seed for a reproducible dataset.')
+@with_appcontext
+def seed_command(**options):
+    """Bulk-generate synthetic users, conversations, messages and applications"""
+    started = time.perf_counter()
+    inserted = seed_database(log=click.echo, **options)
+    elapsed = time.perf_counter() - started
+    total = sum(inserted.values())
+    for table, count in inserted.items():
+        click.echo(f'{table:26s} {count:>10,}')
+    click.echo(f'{total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)')
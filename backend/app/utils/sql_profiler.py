@@ -0,0 +1,148 @@
+import random
+import re
+import threading
+import time
+import weakref
+from collections import Counter
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+
+# Collapses expanded IN lists and multi-row VALUES so they count as one shape
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)*\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def statement_shape(statement):
+    """Normalize a SQL statement so repeats with different parameters compare equal"""
+    return _PLACEHOLDER_LIST.sub('(...)', _WHITESPACE.sub(' ', statement)).strip()
+
+
+class RequestProfile:
+    """SQL statements executed while handling one request"""
+
+    __slots__ = ('statements', 'seconds', 'shapes')
+
+    def __init__(self):
+        self.statements = 0
+        self.seconds = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, duration):
+        self.statements += 1
+        self.seconds += duration
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """Statement shapes executed at least threshold times (likely N+1 loads)"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is not None:
+        context._profile_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = getattr(context, '_profile_started', None)
+    if started is None:
+        return
+    duration = time.perf_counter() - started
+
+    for counter in list(_active_counters):
+        counter.append(statement)
+
+    if not has_request_context():
+        return
+    profile = g.get('sql_profile')
+    if profile is None:
+        return
+    profile.record(statement, duration)
+
+    slow_ms = current_app.config['SQL_SLOW_STATEMENT_MS']
+    if slow_ms and duration * 1000 >= slow_ms:
+        current_app.logger.warning(
+            'Slow SQL (%.1f ms) in %s %s: %s', duration * 1000, request.method, request.path, statement[:500]
+        )
+
+
+def _start_profile():
+    """before_request hook: profile a SQL_PROFILE_SAMPLE_RATE fraction of requests"""
+    rate = current_app.config['SQL_PROFILE_SAMPLE_RATE']
+    if rate >= 1 or random.random() < rate:
+        g.sql_profile = RequestProfile()
+
+
+def _finish_profile(response):
+    """after_request hook: add Server-Timing and report repeated statement shapes"""
+    profile = g.pop('sql_profile', None)
+    if profile is None:
+        return response
+
+    response.headers.add(
+        'Server-Timing', f'db;desc="{profile.statements} queries";dur={profile.seconds * 1000:.2f}'
+    )
+    for shape, count in profile.repeated(current_app.config['SQL_N_PLUS_ONE_THRESHOLD']):
+        current_app.logger.warning(
+            'Possible N+1 in %s %s: %d x %s', request.method, request.path, count, shape[:500]
+        )
+    return response
+
+
+# Statement lists of the max_statements() blocks currently open
+_active_counters = []
+_counters_lock = threading.Lock()
+_listening = weakref.WeakSet()
+
+
+def _listen(engine):
+    if engine in _listening:
+        return
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    _listening.add(engine)
+
+
+@contextmanager
+def max_statements(limit, engines=None):
+    """
+    Test helper: fail if a block executes more than limit SQL statements
+
+    Usage:
+        with max_statements(4):
+            client.get('/api/messages/conversations', headers=auth)
+
+    Args:
+        limit: Maximum number of statements allowed
+        engines: Engines to watch (default: every engine of the current app)
+
+    Raises:
+        AssertionError listing the statements when the limit is exceeded
+    """
+    if engines is None:
+        from app import db
+        engines = db.engines.values()
+    for engine in engines:
+        _listen(engine)
+
+    statements = []
+    with _counters_lock:
+        _active_counters.append(statements)
+    try:
+        yield statements
+    finally:
+        with _counters_lock:
+            _active_counters.remove(statements)
+
+    if len(statements) > limit:
+        listing = '\n'.join(f'  {i + 1}. {statement_shape(s)[:200]}' for i, s in enumerate(statements))
+        raise AssertionError(f'Expected at most {limit} SQL statements, got {len(statements)}:\n{listing}')
+
+
+def init_sql_profiler(app, db):
+    """Count and time SQL per sampled request, emitting Server-Timing and N+1 warnings"""
+    with app.app_context():
+        for engine in db.engines.values():
+            _listen(engine)
+    app.before_request(_start_profile)
+    app.after_request(_finish_profile)
@@ -0,0 +1,328 @@
+import hashlib
+import heapq
+import hmac
+import mimetypes
+import os
+import threading
+import time
+import uuid
+from shutil import copyfileobj
+from stat import S_ISREG
+from urllib.parse import quote
+from flask import current_app, send_file, url_for
+from werkzeug.security import safe_join
+
+try:
+    import boto3
+    from boto3.s3.transfer import TransferConfig
+    from botocore.exceptions import ClientError
+except ImportError:  # pragma: no cover - optional dependency
+    boto3 = None
+
+# Bytes read from / written to a stream at a time
+CHUNK_SIZE = 256 * 1024
+# Partially written local files; never served and removed on failure
+PARTIAL_PREFIX = '.partial-'
+# Where the upload sweeper moves unreferenced files before deleting them (see app.utils.upload_gc)
+QUARANTINE = '.quarantine'
+# Names LocalStorage.iter_files sorts per pass over a directory
+LIST_PAGE_SIZE = 10000
+
+
+def content_type(key):
+    """Content type served for a stored file, from its extension (never the uploader's claim)"""
+    return mimetypes.guess_type(key)[0] or 'application/octet-stream'
+
+
+def content_disposition(download_name):
+    """Content-Disposition header value that makes browsers save the file as download_name"""
+    ascii_name = download_name.encode('ascii', 'ignore').decode().replace('"', '') or 'download'
+    return f'attachment; filename="{ascii_name}"; filename*=UTF-8\'\'{quote(download_name)}'
+
+
+class _CountingReader:
+    """File-like wrapper counting the bytes read through it"""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.size += len(data)
+        return data
+
+
+class LocalStorage:
+    """
+    Attachments in a directory on this server (UPLOAD_FOLDER)
+
+    Uploads are copied in chunks to a partial file that is renamed into place,
+    so a key never names a half-written file. Downloads are sent with
+    send_file (sendfile/wsgi.file_wrapper where the server supports it).
+    Signed URLs point back at this app (download_signed), letting browsers
+    download without an Authorization header.
+    """
+
+    def __init__(self, root, secret_key):
+        self.root = root
+        self.secret_key = hashlib.sha256(b'attachment-links:' + secret_key.encode()).digest()  # Not the JWT key
+
+    def _path(self, key):
+        path = safe_join(self.root, key)
+        if path is None or os.path.basename(key).startswith(PARTIAL_PREFIX):
+            raise FileNotFoundError(key)
+        return path
+
+    def save(self, key, stream):
+        """Store stream under key; returns the number of bytes written"""
+        path = self._path(key)
+        os.makedirs(self.root, exist_ok=True)
+        partial = os.path.join(self.root, f'{PARTIAL_PREFIX}{uuid.uuid4().hex}')
+        try:
+            with open(partial, 'wb') as out:
+                copyfileobj(stream, out, CHUNK_SIZE)
+                size = out.tell()
+            os.replace(partial, path)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        return size
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def exists(self, key):
+        try:
+            return os.path.isfile(self._path(key))
+        except FileNotFoundError:
+            return False
+
+    def send(self, key, download_name):
+        """
+        Response streaming the file as an attachment
+
+        Raises:
+            FileNotFoundError: If nothing is stored under key
+        """
+        path = self._path(key)
+        if not os.path.isfile(path):
+            raise FileNotFoundError(key)
+        return send_file(path, mimetype=content_type(key), as_attachment=True, download_name=download_name)
+
+    def _signature(self, key, expires, download_name):
+        message = f'{key}\n{expires}\n{download_name}'.encode()
+        return hmac.new(self.secret_key, message, hashlib.sha256).hexdigest()
+
+    def presigned_url(self, key, download_name, expires_in):
+        expires = int(time.time() + expires_in)
+        return url_for('messaging.download_signed', filename=key, name=download_name, expires=expires,
+                       signature=self._signature(key, expires, download_name), _external=True)
+
+    def verify(self, key, download_name, expires, signature):
+        """Check a URL made by presigned_url: untampered and not expired"""
+        if not expires.isdigit() or int(expires) < time.time():
+            return False
+        return hmac.compare_digest(self._signature(key, int(expires), download_name), signature)
+
+    def iter_files(self, quarantined=False, cursor=None):
+        """
+        Stored (or quarantined) files in name order, after the name cursor (like S3's StartAfter)
+
+        Yields:
+            (key, modified_at timestamp, cursor resuming after this file)
+
+        Each page of LIST_PAGE_SIZE names is found with one pass over the
+        directory that keeps only the smallest names after the cursor, so
+        memory stays bounded and moving files out while listing (or
+        between runs) never makes the listing skip or repeat one. Leftover
+        partial files are listed too; nothing references them.
+        """
+        directory = os.path.join(self.root, QUARANTINE) if quarantined else self.root
+        after = cursor or ''
+        while True:
+            try:
+                with os.scandir(directory) as entries:
+                    names = heapq.nsmallest(LIST_PAGE_SIZE, (
+                        entry.name for entry in entries if entry.name > after and (
+                            not entry.name.startswith('.') or entry.name.startswith(PARTIAL_PREFIX)
+                        )
+                    ))
+            except FileNotFoundError:
+                return
+            for name in names:
+                try:
+                    stat = os.lstat(os.path.join(directory, name))
+                except FileNotFoundError:
+                    continue  # Removed while listing
+                if S_ISREG(stat.st_mode):
+                    yield name, stat.st_mtime, name
+            if len(names) < LIST_PAGE_SIZE:
+                return
+            after = names[-1]
+
+    def _quarantine_path(self, key):
+        return os.path.join(self.root, QUARANTINE, os.path.basename(key))
+
+    def quarantine(self, key):
+        """Move a file out of reach of downloads; its modification time becomes the quarantine time"""
+        target = self._quarantine_path(key)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(os.path.join(self.root, os.path.basename(key)), target)
+        os.utime(target)
+
+    def restore(self, key):
+        os.replace(self._quarantine_path(key), os.path.join(self.root, os.path.basename(key)))
+
+    def purge(self, key):
+        """Delete a quarantined file"""
+        try:
+            os.remove(self._quarantine_path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3Storage:
+    """
+    Attachments in an S3-compatible bucket (AWS S3, MinIO, ...)
+
+    Uploads go through boto3's managed transfer, which sends files larger
+    than one part as a multipart upload, holding at most a couple of parts in
+    memory. Downloads through the app are relayed in chunks; pre-signed URLs
+    let clients fetch straight from the bucket instead. Credentials come from
+    the usual AWS environment variables or instance role.
+    """
+
+    def __init__(self, bucket, prefix='', endpoint_url=None, region=None):
+        if boto3 is None:
+            raise RuntimeError('STORAGE_BACKEND is s3 but the boto3 package is not installed')
+        self.bucket = bucket
+        self.prefix = prefix
+        self.endpoint_url = endpoint_url
+        self.region = region
+        self.transfer = TransferConfig(multipart_chunksize=8 * 1024 * 1024, max_concurrency=2)
+        self._clients = {}  # pid -> client; never shared across a fork
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        pid = os.getpid()
+        client = self._clients.get(pid)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(pid)
+                if client is None:
+                    client = boto3.session.Session().client(
+                        's3', endpoint_url=self.endpoint_url, region_name=self.region
+                    )
+                    self._clients = {pid: client}
+        return client
+
+    def _key(self, key):
+        return self.prefix + key
+
+    def _quarantine_key(self, key):
+        return f'{self.prefix}{QUARANTINE}/{key}'
+
+    def save(self, key, stream):
+        """Store stream under key; returns the number of bytes written"""
+        reader = _CountingReader(stream)
+        self.client.upload_fileobj(reader, self.bucket, self._key(key),
+                                   ExtraArgs={'ContentType': content_type(key)}, Config=self.transfer)
+        return reader.size
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def exists(self, key):
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def send(self, key, download_name):
+        """
+        Response relaying the object in chunks
+
+        Raises:
+            FileNotFoundError: If nothing is stored under key
+        """
+        try:
+            obj = self.client.get_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                raise FileNotFoundError(key) from e
+            raise
+        body = obj['Body']
+        response = current_app.response_class(body.iter_chunks(CHUNK_SIZE), mimetype=content_type(key),
+                                              direct_passthrough=True)
+        response.content_length = obj['ContentLength']
+        response.headers['Content-Disposition'] = content_disposition(download_name)
+        response.call_on_close(body.close)
+        return response
+
+    def presigned_url(self, key, download_name, expires_in):
+        return self.client.generate_presigned_url('get_object', Params={
+            'Bucket': self.bucket,
+            'Key': self._key(key),
+            'ResponseContentDisposition': content_disposition(download_name),
+            'ResponseContentType': content_type(key)
+        }, ExpiresIn=int(expires_in))
+
+    def iter_files(self, quarantined=False, cursor=None):
+        """
+        Stored (or quarantined) objects in key order, listed a page at a time
+
+        Yields:
+            (key, modified_at timestamp, cursor resuming after this object)
+        """
+        prefix = self._quarantine_key('') if quarantined else self.prefix
+        options = {'Bucket': self.bucket, 'Prefix': prefix, 'Delimiter': '/'}  # Not the quarantine "folder"
+        if cursor:
+            options['StartAfter'] = cursor
+        for page in self.client.get_paginator('list_objects_v2').paginate(**options):
+            for obj in page.get('Contents', ()):
+                yield obj['Key'][len(prefix):], obj['LastModified'].timestamp(), obj['Key']
+
+    def _move(self, source, target):
+        self.client.copy_object(Bucket=self.bucket, Key=target, CopySource={'Bucket': self.bucket, 'Key': source})
+        self.client.delete_object(Bucket=self.bucket, Key=source)
+
+    def quarantine(self, key):
+        """Move an object out of reach of downloads; the copy's LastModified is the quarantine time"""
+        self._move(self._key(key), self._quarantine_key(key))
+
+    def restore(self, key):
+        self._move(self._quarantine_key(key), self._key(key))
+
+    def purge(self, key):
+        """Delete a quarantined object"""
+        self.client.delete_object(Bucket=self.bucket, Key=self._quarantine_key(key))
+
+
+def get_storage():
+    """The current app's attachment storage"""
+    return current_app.extensions['storage']
+
+
+def init_storage(app):
+    """Store attachments locally (UPLOAD_FOLDER) or in an S3-compatible bucket (STORAGE_BACKEND=s3)"""
+    config = app.config
+    backend = config['STORAGE_BACKEND']
+    if backend == 'local':
+        storage = LocalStorage(config['UPLOAD_FOLDER'], config['SECRET_KEY'])
+    elif backend == 's3':
+        if not config['STORAGE_S3_BUCKET']:
+            raise RuntimeError('STORAGE_BACKEND is s3 but STORAGE_S3_BUCKET is not set')
+        storage = S3Storage(config['STORAGE_S3_BUCKET'], config['STORAGE_S3_PREFIX'],
+                            config['STORAGE_S3_ENDPOINT_URL'], config['STORAGE_S3_REGION'])
+    else:
+        raise RuntimeError(f"Unknown STORAGE_BACKEND '{backend}' (expected 'local' or 's3')")
+    app.extensions['storage'] = storage
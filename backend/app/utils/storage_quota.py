@@ -0,0 +1,83 @@
+from flask import current_app
+from sqlalchemy import event, update
+from app import db
+from app.models.user import User
+from app.models.conversation import Conversation, Message
+
+# Request body allowed on top of the remaining quota: the message text and multipart framing
+BODY_ALLOWANCE = 64 * 1024
+
+
+def storage_left(user, conversation):
+    """
+    Bytes the user can still upload to the conversation
+
+    Returns:
+        The smaller of what is left of the user's and the conversation's
+        quota, or None when neither is limited
+    """
+    config = current_app.config
+    left = []
+    if config['STORAGE_QUOTA_USER_BYTES']:
+        left.append(config['STORAGE_QUOTA_USER_BYTES'] - (user.storage_bytes or 0))
+    if config['STORAGE_QUOTA_CONVERSATION_BYTES']:
+        left.append(config['STORAGE_QUOTA_CONVERSATION_BYTES'] - (conversation.storage_bytes or 0))
+    return max(min(left), 0) if left else None
+
+
+def _add_storage(user_id, conversation_id, size, quotas=(None, None)):
+    """Raise (or lower) both counters; returns the error of the first quota that stopped it, or None"""
+    for model, row_id, quota, error in (
+        (User, user_id, quotas[0], 'You have run out of storage space'),
+        (Conversation, conversation_id, quotas[1], 'This conversation has run out of storage space'),
+    ):
+        table = model.__table__
+        statement = update(table).where(table.c.id == row_id).values(storage_bytes=table.c.storage_bytes + size)
+        if quota:
+            statement = statement.where(table.c.storage_bytes + size <= quota)
+        if db.session.execute(statement).rowcount == 0:
+            return error
+    return None
+
+
+def reserve_storage(user_id, conversation_id, size):
+    """
+    Count an attachment against its sender's and conversation's usage
+
+    Each counter is raised by a single conditional UPDATE, so concurrent
+    uploads can never take a counter past its quota. The reservation is
+    committed at once, in its own short transaction: the user and
+    conversation rows are not kept locked while the file is written. Call it
+    with no pending changes in the session, and release_storage() if the
+    upload or the message insert then fails.
+
+    Returns:
+        None, or an error message when a quota would be exceeded (nothing is reserved)
+    """
+    config = current_app.config
+    error = _add_storage(user_id, conversation_id, size,
+                         (config['STORAGE_QUOTA_USER_BYTES'], config['STORAGE_QUOTA_CONVERSATION_BYTES']))
+    if error:
+        db.session.rollback()
+    else:
+        db.session.commit()
+    return error
+
+
+def release_storage(user_id, conversation_id, size):
+    """Give back a reservation whose file or message was not stored (compensating UPDATE, committed)"""
+    db.session.rollback()
+    _add_storage(user_id, conversation_id, -size)
+    db.session.commit()
+
+
+@event.listens_for(Message, 'after_delete')
+def _release_storage(mapper, connection, message):
+    """Give a deleted attachment's bytes back to its sender and conversation (same transaction)"""
+    if not message.has_attachment or not message.file_size:
+        return
+    for model, row_id in ((User, message.sender_id), (Conversation, message.conversation_id)):
+        table = model.__table__
+        connection.execute(
+            update(table).where(table.c.id == row_id).values(storage_bytes=table.c.storage_bytes - message.file_size)
+        )
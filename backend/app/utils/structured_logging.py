@@ -0,0 +1,248 @@
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+from flask.logging import default_handler
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+REDACTED = '[REDACTED]'
+
+# Mapping keys whose values are never logged
+_SENSITIVE_KEY = re.compile(r'pass(word|wd)?|token|secret|authorization|cookie|api[_-]?key', re.IGNORECASE)
+# Secrets inside free text: bearer tokens, JWTs and key=value / "key": "value" pairs
+_SENSITIVE_TEXT = (
+    (re.compile(r'(Bearer\s+)[\w.~+/-]+=*', re.IGNORECASE), r'\1' + REDACTED),
+    (re.compile(r'eyJ[\w-]+\.[\w-]+\.[\w-]*'), REDACTED),
+    (re.compile(r'''(["']?\w*(?:pass(?:word|wd)?|token|secret)\w*["']?\s*[:=]\s*)("[^"]*"|'[^']*'|[^\s,&}]+)''',
+                re.IGNORECASE), r'\1' + REDACTED),
+)
+
+# Incoming X-Request-ID values are reused only when they look like an id
+_REQUEST_ID = re.compile(r'^[\w.:-]{1,128}$')
+
+# LogRecord attributes; anything else on a record came from `extra=` and is logged as a field
+_RECORD_ATTRIBUTES = frozenset(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+def redact(value):
+    """Return value with secrets masked: sensitive mapping keys and tokens inside strings"""
+    if isinstance(value, str):
+        for pattern, replacement in _SENSITIVE_TEXT:
+            value = pattern.sub(replacement, value)
+        return value
+    if isinstance(value, dict):
+        return {
+            key: REDACTED if isinstance(key, str) and _SENSITIVE_KEY.search(key) else redact(item)
+            for key, item in value.items()
+        }
+    if isinstance(value, (list, tuple, set)):
+        return [redact(item) for item in value]
+    return value
+
+
+class RequestContextFilter(logging.Filter):
+    """Attach the correlation id and caller of the current request to every record"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = g.get('request_id')
+            record.user_id = g.get('current_user_id')
+            record.method = request.method
+            record.path = request.path
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keep only a fraction of high-volume records
+
+    Rates map logger names to the fraction kept (a rate applies to the logger
+    and its children). WARNING and above are always kept.
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = sorted(rates.items(), key=lambda item: len(item[0]), reverse=True)
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        for name, rate in self.rates:
+            if record.name == name or record.name.startswith(name + '.'):
+                return rate >= 1 or random.random() < rate
+        return True
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hand records to a background thread; never block the caller
+
+    Messages and tracebacks are rendered here, while the request's objects
+    are still valid, but redaction, encoding and I/O happen on the listener
+    thread. When the bounded queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, queue_):
+        super().__init__(queue_)
+        self.dropped = 0
+
+    def prepare(self, record):
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JSONFormatter(logging.Formatter):
+    """One JSON object per line: timestamp, level, logger, message, request context and extra fields"""
+
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': redact(record.getMessage()),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = REDACTED if _SENSITIVE_KEY.search(key) else redact(value)
+        if record.exc_text:
+            entry['exc'] = redact(record.exc_text)
+        if orjson is not None:
+            return orjson.dumps(entry, default=str).decode()
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Human-readable lines for development, redacted like the JSON output"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)s %(name)s [%(request_id)s] %(message)s')
+
+    def format(self, record):
+        if not hasattr(record, 'request_id'):
+            record.request_id = '-'
+        return redact(super().format(record))
+
+
+# The installed handler, listener and settings (one per process)
+_handler = None
+_listener = None
+_config = None
+
+
+def _start_listener():
+    global _listener
+    formatter = JSONFormatter() if _config['LOG_FORMAT'] == 'json' else TextFormatter()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(formatter)
+    _listener = QueueListener(_handler.queue, stream, respect_handler_level=True)
+    _listener.start()
+
+
+def _restart_after_fork():
+    # The writer thread does not survive fork, and it may have held the queue's lock
+    if _listener is not None:
+        _handler.queue = queue.Queue(_config['LOG_QUEUE_SIZE'])
+        _start_listener()
+
+
+def configure_logging(config):
+    """
+    Route every logger through a bounded queue to a background writer thread
+
+    Replaces the root logger's handlers; calling it again (another create_app
+    in the same process) swaps in the new settings.
+    """
+    global _handler, _config
+    flush_logs()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+
+    _config = config
+    _handler = NonBlockingQueueHandler(queue.Queue(config['LOG_QUEUE_SIZE']))
+    _handler.addFilter(RequestContextFilter())
+    if config['LOG_SAMPLE_RATES']:
+        _handler.addFilter(SamplingFilter(config['LOG_SAMPLE_RATES']))
+    root.addHandler(_handler)
+    root.setLevel(config['LOG_LEVEL'])
+    sqlalchemy_logger = logging.getLogger('sqlalchemy')
+    if sqlalchemy_logger.level == logging.NOTSET:
+        sqlalchemy_logger.setLevel(logging.WARNING)  # Pool housekeeping is logged at INFO
+    _start_listener()
+
+
+def flush_logs():
+    """Write out queued records and stop the writer thread"""
+    global _listener
+    if _listener is not None:
+        try:
+            _listener.stop()
+        except queue.Full:
+            pass  # No room for the stop sentinel; the daemon thread dies with the process
+        _listener = None
+
+
+def _assign_request_id():
+    incoming = request.headers.get('X-Request-ID', '')
+    g.request_id = incoming if _REQUEST_ID.match(incoming) else uuid.uuid4().hex
+    g.log_started = time.perf_counter()
+
+
+_access_logger = logging.getLogger('app.access')
+
+
+def _log_request(response):
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    started = g.pop('log_started', None)
+    if started is not None:
+        level = logging.ERROR if response.status_code >= 500 else logging.INFO
+        duration_ms = round((time.perf_counter() - started) * 1000, 2)
+        _access_logger.log(level, '%s %s %d %.2fms', request.method, request.path, response.status_code,
+                           duration_ms, extra={
+                               'status': response.status_code, 'duration_ms': duration_ms,
+                               'endpoint': request.endpoint
+                           })
+    return response
+
+
+def init_logging(app):
+    """
+    Structured, non-blocking logging with per-request correlation ids
+
+    Every request gets an id (a valid incoming X-Request-ID or a new one),
+    echoed in the X-Request-ID response header and attached to every record
+    logged while handling it, plus one 'app.access' record per request.
+    """
+    configure_logging(app.config)
+    app.logger.removeHandler(default_handler)
+    app.before_request(_assign_request_id)
+    app.after_request(_log_request)
+
+
+atexit.register(flush_logs)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
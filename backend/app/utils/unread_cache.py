@@ -0,0 +1,129 @@
+import threading
+import time
+from collections import OrderedDict
+from flask import current_app
+from app import db
+from app.models.conversation import Conversation, ConversationParticipant
+from app.utils.read_buffer import pending_reads
+
+# user_id -> (loaded_at, {conversation_id: last_read_seq})
+_read_positions = OrderedDict()
+# conversation_id -> message_seq (highest seen by this process)
+_message_seqs = OrderedDict()
+_lock = threading.Lock()
+
+
+def _remember_seq(conversation_id, seq):
+    current = _message_seqs.get(conversation_id)
+    if current is None or seq > current:
+        _message_seqs[conversation_id] = seq
+    _message_seqs.move_to_end(conversation_id)
+    while len(_message_seqs) > current_app.config['UNREAD_CACHE_MAX_CONVERSATIONS']:
+        _message_seqs.popitem(last=False)
+
+
+def _cached_counts(user_id, ttl, now):
+    entry = _read_positions.get(user_id)
+    if not entry or now - entry[0] >= ttl:
+        return None
+
+    counts = {}
+    for conversation_id, last_read_seq in entry[1].items():
+        seq = _message_seqs.get(conversation_id)
+        if seq is None:
+            return None  # Conversation sequence evicted; reload
+        if seq > last_read_seq:
+            counts[conversation_id] = seq - last_read_seq
+
+    _read_positions.move_to_end(user_id)
+    return counts
+
+
+def get_unread_counts(user_id):
+    """
+    Get unread counters for a user, loading them from the database on a miss
+
+    The cache holds each user's read positions and each conversation's
+    message sequence, kept current by the write paths of this process
+    (record_message / record_read). UNREAD_CACHE_TTL bounds how long writes
+    made by other worker processes can go unnoticed.
+
+    Args:
+        user_id: User's ID
+
+    Returns:
+        Dictionary mapping conversation_id to unread count (only non-zero entries)
+    """
+    ttl = current_app.config['UNREAD_CACHE_TTL']
+    now = time.monotonic()
+
+    with _lock:
+        counts = _cached_counts(user_id, ttl, now)
+        if counts is not None:
+            return counts
+
+    # Single query over the memberships of this user
+    rows = db.session.query(
+        ConversationParticipant.conversation_id,
+        ConversationParticipant.last_read_seq,
+        Conversation.message_seq
+    ).join(
+        Conversation, Conversation.id == ConversationParticipant.conversation_id
+    ).filter(
+        ConversationParticipant.user_id == user_id
+    ).all()
+
+    pending = pending_reads(user_id)  # Mark-reads not written to the database yet
+
+    counts = {}
+    with _lock:
+        positions = {}
+        for conversation_id, last_read_seq, message_seq in rows:
+            positions[conversation_id] = max(last_read_seq or 0, pending.get(conversation_id, 0))
+            _remember_seq(conversation_id, message_seq or 0)
+            unread = _message_seqs[conversation_id] - positions[conversation_id]
+            if unread > 0:
+                counts[conversation_id] = unread
+
+        _read_positions[user_id] = (now, positions)
+        _read_positions.move_to_end(user_id)
+        while len(_read_positions) > current_app.config['UNREAD_CACHE_MAX_USERS']:
+            _read_positions.popitem(last=False)
+
+    return counts
+
+
+def record_message(conversation_id, seq, sender_id=None):
+    """
+    Update the cache after a committed message write
+
+    One update regardless of the number of members: unread counts are
+    derived from the conversation sequence.
+    """
+    with _lock:
+        _remember_seq(conversation_id, seq)
+        if sender_id is not None:
+            entry = _read_positions.get(sender_id)
+            if entry and conversation_id in entry[1]:
+                entry[1][conversation_id] = max(entry[1][conversation_id], seq)
+
+
+def record_read(user_id, conversation_id, seq):
+    """Update the cache after a committed mark-read"""
+    with _lock:
+        entry = _read_positions.get(user_id)
+        if entry and conversation_id in entry[1]:
+            entry[1][conversation_id] = max(entry[1][conversation_id], seq)
+
+
+def invalidate_user(user_id):
+    """Drop a user's cached read positions (e.g. after membership changes)"""
+    with _lock:
+        _read_positions.pop(user_id, None)
+
+
+def clear_unread_cache():
+    """Drop every cached counter"""
+    with _lock:
+        _read_positions.clear()
+        _message_seqs.clear()
@@ -0,0 +1,154 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+from itertools import islice
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+from app import db
+from app.models.conversation import Message
+from app.utils.storage import get_storage
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+
+def referenced_keys(keys):
+    """The subset of storage keys some message points at (one indexed IN query)"""
+    if not keys:
+        return set()
+    return set(db.session.execute(select(Message.file_path).where(Message.file_path.in_(keys))).scalars())
+
+
+def _batches(files, size):
+    while True:
+        batch = list(islice(files, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _load_state(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def _save_state(path, state):
+    partial = f'{path}.tmp'
+    with open(partial, 'w') as f:
+        json.dump(state, f)
+    os.replace(partial, path)
+
+
+@contextmanager
+def _exclusive(path):
+    """Hold a lock next to the state file so two sweeps never interleave"""
+    if fcntl is None:
+        yield
+        return
+    with open(f'{path}.lock', 'w') as lock:
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise click.ClickException('Another upload sweep is running') from None
+        yield
+
+
+def sweep_uploads(storage, state_path, batch_size=500, min_age=3600, grace_period=7 * 86400,
+                  max_batches=None, dry_run=False, log=lambda message: None):
+    """
+    Find stored files no message refers to, quarantine them, and delete them after a grace period
+
+    A pass has two phases, each walking the storage a batch at a time:
+
+    - live: files older than min_age (so uploads whose message is still
+      being committed are left alone) are checked against Message.file_path
+      in one query per batch; unreferenced ones are moved to quarantine.
+    - quarantine: files quarantined more than grace_period ago are deleted,
+      unless a message refers to them again, in which case they are restored.
+
+    Memory use is one batch, whatever the number of files. Progress (phase,
+    listing cursor and counts) is saved to state_path after every batch, so
+    a sweep stopped by max_batches, a deploy or a crash resumes where it left
+    off. Files are only ever moved or deleted after the database check.
+
+    Returns:
+        The state after this run ('done' is True when a full pass completed)
+    """
+    state = _load_state(state_path)
+    if state.get('done', True):
+        state = {'phase': 'live', 'cursor': None, 'started_at': time.time(), 'done': False,
+                 'scanned': 0, 'quarantined': 0, 'restored': 0, 'deleted': 0}
+    batches = 0
+
+    while state['phase'] in ('live', 'quarantine'):
+        quarantined = state['phase'] == 'quarantine'
+        files = storage.iter_files(quarantined=quarantined, cursor=state['cursor'])
+        for batch in _batches(files, batch_size):
+            now = time.time()
+            age_limit = grace_period if quarantined else min_age
+            candidates = [key for key, modified_at, _ in batch if now - modified_at >= age_limit]
+            referenced = referenced_keys(candidates)
+            db.session.rollback()  # Don't hold a transaction (or connection) between batches
+
+            for key in candidates:
+                if quarantined and key in referenced:
+                    state['restored'] += 1
+                    if not dry_run:
+                        storage.restore(key)
+                elif quarantined:
+                    state['deleted'] += 1
+                    if not dry_run:
+                        storage.purge(key)
+                elif key not in referenced:
+                    state['quarantined'] += 1
+                    if not dry_run:
+                        storage.quarantine(key)
+
+            state['scanned'] += len(batch)
+            state['cursor'] = batch[-1][2]
+            batches += 1
+            if not dry_run:
+                _save_state(state_path, state)
+            if max_batches is not None and batches >= max_batches:
+                log(f"stopped after {batches} batches in the {state['phase']} phase; run again to resume")
+                return state
+
+        state['phase'], state['cursor'] = ('quarantine', None) if not quarantined else ('finished', None)
+        if not dry_run:
+            _save_state(state_path, state)
+
+    state['done'] = True
+    log(f"pass complete in {time.time() - state['started_at']:.0f}s: {state['scanned']:,} files scanned, "
+        f"{state['quarantined']:,} quarantined, {state['restored']:,} restored, {state['deleted']:,} deleted")
+    if not dry_run:
+        _save_state(state_path, state)
+    return state
+
+
+@click.command('gc-uploads')
+@click.option('--batch-size', default=500, show_default=True, help='Files listed and checked per query.')
+@click.option('--min-age', default=3600, show_default=True, help='Seconds before an unreferenced file is an orphan.')
+@click.option('--grace-period', default=7 * 86400, show_default=True,
+              help='Seconds an orphan stays in quarantine before it is deleted.')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches (resume on the next run).')
+@click.option('--state-file', default=None, help='Progress file (default: <instance path>/upload_gc_state.json).')
+@click.option('--dry-run', is_flag=True, help='Report what would be moved or deleted; change nothing.')
+@with_appcontext
+def gc_uploads_command(state_file, **options):
+    """Quarantine, then delete, stored attachments that no message refers to"""
+    if state_file is None:
+        os.makedirs(current_app.instance_path, exist_ok=True)
+        state_file = os.path.join(current_app.instance_path, 'upload_gc_state.json')
+    with _exclusive(state_file):
+        state = sweep_uploads(get_storage(), state_file, log=click.echo, **options)
+    click.echo(f"{state['scanned']:,} scanned, {state['quarantined']:,} quarantined, "
+               f"{state['restored']:,} restored, {state['deleted']:,} deleted so far this pass")
@@ -0,0 +1,108 @@
+from datetime import datetime, timedelta, timezone
+from flask import request, jsonify, current_app
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional dependency
+    msgpack = None
+
+MSGPACK_MIMETYPE = 'application/msgpack'
+
+# msgpack extension type used for a list of objects sharing the same keys
+TABLE_EXT_TYPE = 1
+
+_EPOCH = datetime(1970, 1, 1)
+_MILLISECOND = timedelta(milliseconds=1)
+
+
+def wants_msgpack():
+    """Check if the client prefers msgpack over JSON (Accept: application/msgpack)"""
+    if msgpack is None:
+        return False
+    best = request.accept_mimetypes.best_match(['application/json', MSGPACK_MIMETYPE])
+    return best == MSGPACK_MIMETYPE
+
+
+def to_millis(value):
+    """Convert a datetime (naive values are UTC) to integer milliseconds since the epoch"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return (value - _EPOCH) // _MILLISECOND
+
+
+def _default(obj):
+    if isinstance(obj, datetime):
+        return to_millis(obj)
+    if isinstance(obj, Table):
+        return msgpack.ExtType(TABLE_EXT_TYPE, _packb([obj.columns, obj.rows]))
+    raise TypeError(f'Object of type {type(obj).__name__} is not msgpack serializable')
+
+
+def _packb(obj):
+    return msgpack.packb(obj, default=_default, datetime=False)
+
+
+class Table:
+    """A list of same-shaped objects packed as column names plus row values"""
+
+    __slots__ = ('columns', 'rows')
+
+    def __init__(self, columns, rows):
+        self.columns = columns
+        self.rows = rows
+
+
+def compact(obj):
+    """
+    Prepare a response payload for the binary wire format
+
+    Lists of dictionaries that share the same keys become Tables so the keys
+    are sent once instead of once per row. Datetimes become integer
+    milliseconds when packed.
+    """
+    if isinstance(obj, dict):
+        return {key: compact(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        if obj and isinstance(obj[0], dict):
+            keys = obj[0].keys()
+            if all(isinstance(item, dict) and item.keys() == keys for item in obj):
+                columns = list(keys)
+                return Table(columns, [[compact(item[key]) for key in columns] for item in obj])
+        return [compact(item) for item in obj]
+    return obj
+
+
+def packb(obj):
+    """Serialize a response payload to compact msgpack bytes"""
+    return _packb(compact(obj))
+
+
+def _ext_hook(code, data):
+    if code == TABLE_EXT_TYPE:
+        columns, rows = unpackb(data)
+        return [dict(zip(columns, row)) for row in rows]
+    return msgpack.ExtType(code, data)
+
+
+def unpackb(data):
+    """
+    Decode a msgpack payload produced by packb, expanding tables back into dicts
+
+    Reference decoder for internal services and tests; timestamps stay integers.
+    """
+    return msgpack.unpackb(data, ext_hook=_ext_hook, strict_map_key=False, raw=False)
+
+
+def negotiate_response(payload):
+    """
+    Build a JSON or msgpack response for payload based on the Accept header
+
+    Usage:
+        return negotiate_response({'messages': [...]}), 200
+    """
+    if wants_msgpack():
+        response = current_app.response_class(packb(payload), mimetype=MSGPACK_MIMETYPE)
+    else:
+        response = jsonify(payload)
+    response.vary.add('Accept')
+    return response
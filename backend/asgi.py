@@ -0,0 +1,7 @@
+"""ASGI entry point for async servers like Uvicorn (uvicorn asgi:app)"""
+from app import create_app
+from app.utils.asgi import create_asgi_app
+
+# Create the Flask application and serve it through the ASGI adapter
+flask_app = create_app()
+app = create_asgi_app(flask_app)
@@ -0,0 +1,177 @@
+"""
+Benchmark WSGI (gunicorn) against ASGI (uvicorn) serving under slow clients
+
+Starts both servers on the same seeded SQLite database, checks that they
+return identical responses, then polls the inbox from several clients while
+other clients upload message bodies slowly. Reports latency and throughput
+of the polls for each mode.
+
+Usage:
+    python benchmarks/bench_asgi.py [--pollers 8] [--slow-uploads 4] [--duration 5] [--threads 2]
+"""
+import argparse
+import http.client
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from common import create_bench_app, seed_conversation
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, database_uri, threads):
+    env = dict(os.environ, DATABASE_URL=database_uri, ASGI_THREADS=str(threads), COMPRESSION_ENABLED='false')
+    if mode == 'wsgi':
+        command = [sys.executable, '-m', 'gunicorn', 'wsgi:app', '--bind', f'127.0.0.1:{port}',
+                   '--workers', '1', '--threads', str(threads), '--log-level', 'warning']
+    else:
+        command = [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', str(port),
+                   '--workers', '1', '--log-level', 'warning', '--no-access-log']
+    process = subprocess.Popen(command, cwd=BACKEND_DIR, env=env)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        try:
+            request(port, 'GET', '/admin/pool')
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f'{mode} server did not start')
+
+
+def request(port, method, path, headers=None, body=None):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=60)
+    try:
+        connection.request(method, path, body=body, headers=headers or {})
+        response = connection.getresponse()
+        return response.status, response.getheader('Content-Type'), response.read()
+    finally:
+        connection.close()
+
+
+def slow_upload(port, path, auth, seconds, stop):
+    """Send a message whose multipart body trickles in over `seconds`"""
+    boundary = 'bench-boundary'
+    body = (f'--{boundary}\r\nContent-Disposition: form-data; name="content"\r\n\r\n'
+            f'{"slow upload " * 200}\r\n--{boundary}--\r\n').encode()
+    pieces = 20
+    step = len(body) // pieces + 1
+    while not stop.is_set():
+        sock = socket.create_connection(('127.0.0.1', port))
+        try:
+            head = (f'POST {path} HTTP/1.1\r\nHost: localhost\r\nAuthorization: {auth}\r\n'
+                    f'Content-Type: multipart/form-data; boundary={boundary}\r\n'
+                    f'Content-Length: {len(body)}\r\nConnection: close\r\n\r\n')
+            sock.sendall(head.encode())
+            for i in range(0, len(body), step):
+                sock.sendall(body[i:i + step])
+                time.sleep(seconds / pieces)
+            while sock.recv(65536):
+                pass
+        finally:
+            sock.close()
+
+
+def poll(port, path, headers, stop, latencies, errors):
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            status, _, _ = request(port, 'GET', path, headers)
+        except OSError:
+            errors.append(1)
+            continue
+        latencies.append(time.perf_counter() - start)
+        if status != 200:
+            errors.append(status)
+
+
+def run_load(port, auth, conversation_id, args):
+    stop = threading.Event()
+    latencies, errors = [], []
+    send_path = f'/api/messages/conversations/{conversation_id}/send'
+    workers = [
+        threading.Thread(target=slow_upload, args=(port, send_path, auth['Authorization'], args.slow_seconds, stop))
+        for _ in range(args.slow_uploads)
+    ]
+    workers += [
+        threading.Thread(target=poll, args=(port, '/api/messages/conversations', auth, stop, latencies, errors))
+        for _ in range(args.pollers)
+    ]
+    for worker in workers:
+        worker.start()
+    time.sleep(args.duration)
+    stop.set()
+    for worker in workers:
+        worker.join()
+
+    if not latencies:
+        return 'no requests completed'
+    latencies.sort()
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    return (f'{len(latencies) / args.duration:8.1f} req/s   p50 {statistics.median(latencies) * 1e3:8.2f} ms   '
+            f'p95 {p95 * 1e3:8.2f} ms   errors {len(errors)}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--conversations', type=int, default=20)
+    parser.add_argument('--pollers', type=int, default=8)
+    parser.add_argument('--slow-uploads', type=int, default=4)
+    parser.add_argument('--slow-seconds', type=float, default=2.0, help='time each slow upload takes')
+    parser.add_argument('--duration', type=float, default=5.0)
+    parser.add_argument('--threads', type=int, default=2, help='gunicorn threads / ASGI_THREADS')
+    args = parser.parse_args()
+
+    app = create_bench_app()
+    database_uri = app.config['SQLALCHEMY_DATABASE_URI']
+    auth, conversation_id = seed_conversation(app, args.messages, args.conversations)
+
+    parity_paths = [
+        '/api/messages/conversations',
+        '/api/messages/conversations?shape=normalized',
+        f'/api/messages/conversations/{conversation_id}/messages',
+        '/api/messages/unread',
+        '/api/auth/me',
+        '/api/jobs/applications',
+    ]
+
+    servers = {}
+    try:
+        for mode in ('wsgi', 'asgi'):
+            port = free_port()
+            servers[mode] = (start_server(mode, port, database_uri, args.threads), port)
+
+        mismatches = []
+        for path in parity_paths:
+            results = [request(port, 'GET', path, auth) for _, port in servers.values()]
+            wsgi, asgi = [(status, content_type, json.loads(body)) for status, content_type, body in results]
+            if wsgi != asgi:
+                mismatches.append(path)
+        print(f'identical responses: {len(parity_paths) - len(mismatches)}/{len(parity_paths)}'
+              + (f' (differs: {", ".join(mismatches)})' if mismatches else ''))
+
+        print(f'{args.pollers} inbox pollers, {args.slow_uploads} slow uploads, {args.threads} threads')
+        for mode, (_, port) in servers.items():
+            print(f'  {mode}: {run_load(port, auth, conversation_id, args)}')
+    finally:
+        for process, _ in servers.values():
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
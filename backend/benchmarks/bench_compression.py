@@ -0,0 +1,51 @@
+"""
+Benchmark bytes-on-wire and CPU cost of response compression
+
+Requests the message history and inbox with identity, gzip and brotli
+Accept-Encoding and reports response size and CPU time per request,
+with and without the compressed-body cache.
+
+Usage:
+    python benchmarks/bench_compression.py [--messages 50] [--conversations 20] [--repeat 100]
+"""
+import argparse
+import time
+
+from common import create_bench_app, seed_conversation
+
+
+def measure(client, url, headers, repeat):
+    response = client.get(url, headers=headers)
+    size = len(response.get_data())
+    start = time.process_time()
+    for _ in range(repeat):
+        client.get(url, headers=headers).get_data()
+    return size, (time.process_time() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--conversations', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    for cache_size in (0, 256):
+        app = create_bench_app(COMPRESSION_CACHE_SIZE=cache_size)
+        auth, conversation_id = seed_conversation(app, args.messages, args.conversations)
+        client = app.test_client()
+
+        urls = {
+            'message history': f'/api/messages/conversations/{conversation_id}/messages',
+            'inbox': '/api/messages/conversations',
+        }
+        print(f'compressed-body cache: {"on" if cache_size else "off"}')
+        for name, url in urls.items():
+            for coding in ('identity', 'gzip', 'br'):
+                headers = dict(auth, **{'Accept-Encoding': coding})
+                size, cpu = measure(client, url, headers, args.repeat)
+                print(f'  {name:16s} {coding:9s} {size:8d} bytes   {cpu * 1e3:7.3f} ms CPU/request')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+"""
+Check the inbox cache stays consistent under concurrent writes, and measure it
+
+Seeds a dataset, then runs --concurrency threads for --duration seconds that
+poll inboxes, send messages and mark conversations read. After every send the
+sender's inbox is fetched and must show that message (or a newer one) at
+once. At the end each user's cached inbox is compared with one computed from
+the database. Reports stale reads, hit rate and inbox latency with the cache
+on and off.
+
+Usage:
+    python benchmarks/bench_inbox_cache.py [--concurrency 8] [--duration 5] [--students 100]
+"""
+import argparse
+import random
+import threading
+import time
+from collections import Counter
+
+from common import create_bench_app, seed_dataset
+from app.utils import metrics
+from app.utils.jwt_utils import generate_access_token
+
+MIX = {'inbox': 10, 'send': 2, 'read': 2}
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))] if values else None
+
+
+def _hit_counts():
+    """(hits, misses) counted by the inbox_cache_requests_total metric so far, (0, 0) without prometheus_client"""
+    if metrics.prometheus_client is None:
+        return 0, 0
+    registry = metrics.prometheus_client.REGISTRY
+    return tuple(registry.get_sample_value('inbox_cache_requests_total', {'result': result}) or 0
+                 for result in ('hit', 'miss'))
+
+
+def run(args, enabled):
+    app = create_bench_app(INBOX_CACHE_ENABLED=enabled)
+    dataset = seed_dataset(app, args.students, args.employers, args.conversations, args.messages,
+                           pending_applications=0, seed=args.seed)
+    with app.app_context():
+        tokens = {
+            user_id: {'Authorization': f'Bearer {generate_access_token(user_id, user_type)}'}
+            for user_type, ids in (('student', dataset['student_ids']), ('employer', dataset['employer_ids']))
+            for user_id in ids
+        }
+    users = [user_id for user_id in tokens if dataset['conversations'].get(user_id)]
+    stats = Counter()
+    latencies = []
+    lock = threading.Lock()
+    before = _hit_counts()
+    deadline = time.monotonic() + args.duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        client = app.test_client()
+        names, weights = zip(*MIX.items())
+        while time.monotonic() < deadline:
+            name = rng.choices(names, weights)[0]
+            user_id = rng.choice(users)
+            conversation_id = rng.choice(dataset['conversations'][user_id])
+            if name == 'inbox':
+                start = time.perf_counter()
+                client.get('/api/messages/conversations', headers=tokens[user_id])
+                with lock:
+                    latencies.append(time.perf_counter() - start)
+            elif name == 'read':
+                client.post(f'/api/messages/conversations/{conversation_id}/mark-read', headers=tokens[user_id])
+            else:
+                sent = client.post(f'/api/messages/conversations/{conversation_id}/send',
+                                   data={'content': f'consistency {rng.random()}'},
+                                   headers=tokens[user_id]).get_json()['data']
+                inbox = client.get('/api/messages/conversations', headers=tokens[user_id]).get_json()
+                shown = next(c for c in inbox['conversations'] if c['id'] == conversation_id)
+                with lock:
+                    stats['sends'] += 1
+                    if (shown.get('last_message') or {}).get('id', 0) < sent['id']:
+                        stats['stale_after_write'] += 1
+
+    threads = [threading.Thread(target=worker, args=(args.seed + i,)) for i in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    after = _hit_counts()
+    stats['hits'], stats['misses'] = after[0] - before[0], after[1] - before[1]
+
+    # Every cached inbox must equal a freshly computed one
+    cache = app.extensions.get('inbox_cache')
+    client = app.test_client()
+    if cache is not None:
+        cached = {user_id: client.get('/api/messages/conversations', headers=tokens[user_id]).get_json()
+                  for user_id in users}
+        cache.clear()
+        for user_id in users:
+            fresh = client.get('/api/messages/conversations', headers=tokens[user_id]).get_json()
+            stats['stale_at_end'] += cached[user_id] != fresh
+
+    return stats, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--students', type=int, default=100)
+    parser.add_argument('--employers', type=int, default=20)
+    parser.add_argument('--conversations', type=int, default=3, help='conversations per student')
+    parser.add_argument('--messages', type=int, default=20, help='messages per conversation')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per run')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    failed = False
+    for enabled in (False, True):
+        stats, latencies = run(args, enabled)
+        label = 'cache on ' if enabled else 'cache off'
+        p50, p95 = (round(percentile(latencies, f) * 1e3, 2) for f in (0.5, 0.95))
+        print(f'{label}: {len(latencies)} inbox polls, p50 {p50}ms, p95 {p95}ms, {stats["sends"]} sends, '
+              f'stale after write {stats["stale_after_write"]}, stale at end {stats["stale_at_end"]}'
+              + (f', hit rate {stats["hits"] / max(stats["hits"] + stats["misses"], 1):.1%}' if enabled else ''))
+        failed = failed or stats['stale_after_write'] or stats['stale_at_end']
+
+    raise SystemExit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
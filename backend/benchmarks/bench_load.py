@@ -0,0 +1,251 @@
+"""
+Load-test the hot API paths with concurrent clients
+
+Seeds a dataset into a fresh SQLite file (or --database-url), then drives the
+real endpoints from --concurrency threads for --duration seconds with a
+weighted mix of: login, inbox poll, message page, send, mark-read and
+accept application. Reports p50/p95/p99 latency, throughput and SQL statements per
+request, and saves everything as JSON so runs can be compared across commits.
+
+Usage:
+    python benchmarks/bench_load.py [--concurrency 8] [--duration 10] [--students 100]
+                                    [--output results.json] [--compare previous.json]
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from sqlalchemy import event
+
+from common import create_bench_app, seed_dataset
+from app import db
+from app.utils.jwt_utils import generate_access_token
+
+SCENARIOS = ('login', 'inbox', 'messages', 'send', 'read', 'accept')
+DEFAULT_MIX = 'login=1,inbox=10,messages=6,send=3,read=4,accept=1'
+
+# Statements executed by the current thread's request
+_counter = threading.local()
+
+
+def _count_statement(*args):
+    _counter.statements = getattr(_counter, 'statements', 0) + 1
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(fraction * (len(values) - 1))))]
+
+
+class Workload:
+    """Seeded users, tokens and shared state the scenarios draw from"""
+
+    def __init__(self, app, dataset):
+        self.dataset = dataset
+        self.users = dataset['student_ids'] + dataset['employer_ids']
+        with app.app_context():
+            self.tokens = {
+                user_id: {'Authorization': f'Bearer {generate_access_token(user_id, user_type)}'}
+                for user_type, ids in (('student', dataset['student_ids']), ('employer', dataset['employer_ids']))
+                for user_id in ids
+            }
+        self.chatting_users = [user_id for user_id in self.users if dataset['conversations'].get(user_id)]
+        self._pending = list(dataset['pending_applications'])
+        self._lock = threading.Lock()
+
+    def next_application(self):
+        with self._lock:
+            return self._pending.pop() if self._pending else None
+
+    def login(self, client, rng):
+        user_id = rng.choice(self.users)
+        kind = 'student' if user_id in self.dataset['student_ids'] else 'employer'
+        index = (self.dataset['student_ids'] if kind == 'student' else self.dataset['employer_ids']).index(user_id)
+        return client.post('/api/auth/login', json={
+            'email': f'load-{kind}{index}@example.com', 'password': self.dataset['password']
+        })
+
+    def inbox(self, client, rng):
+        return client.get('/api/messages/conversations', headers=self.tokens[rng.choice(self.users)])
+
+    def messages(self, client, rng):
+        user_id = rng.choice(self.chatting_users)
+        conversation_id = rng.choice(self.dataset['conversations'][user_id])
+        return client.get(f'/api/messages/conversations/{conversation_id}/messages?page=1&per_page=50',
+                          headers=self.tokens[user_id])
+
+    def send(self, client, rng):
+        user_id = rng.choice(self.chatting_users)
+        conversation_id = rng.choice(self.dataset['conversations'][user_id])
+        return client.post(f'/api/messages/conversations/{conversation_id}/send',
+                           data={'content': f'load test {rng.random()}'}, headers=self.tokens[user_id])
+
+    def read(self, client, rng):
+        user_id = rng.choice(self.chatting_users)
+        conversation_id = rng.choice(self.dataset['conversations'][user_id])
+        return client.post(f'/api/messages/conversations/{conversation_id}/mark-read', headers=self.tokens[user_id])
+
+    def accept(self, client, rng):
+        application = self.next_application()
+        if application is None:
+            return None  # Pending applications used up; seed more with --applications
+        application_id, employer_id = application
+        return client.post(f'/api/jobs/applications/{application_id}/accept', headers=self.tokens[employer_id])
+
+
+def run_worker(app, workload, mix, deadline, seed, samples):
+    rng = random.Random(seed)
+    client = app.test_client()
+    names, weights = zip(*mix.items())
+    while time.monotonic() < deadline:
+        name = rng.choices(names, weights)[0]
+        _counter.statements = 0
+        start = time.perf_counter()
+        response = getattr(workload, name)(client, rng)
+        elapsed = time.perf_counter() - start
+        if response is None:
+            continue
+        samples[name].append((elapsed, _counter.statements, response.status_code))
+
+
+def summarize(samples, duration):
+    latencies = [elapsed for elapsed, _, _ in samples]
+    statements = [count for _, count, _ in samples]
+    errors = sum(1 for _, _, status in samples if status >= 400)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / duration, 2),
+        'latency_ms': {
+            name: round(percentile(latencies, fraction) * 1e3, 3) if latencies else None
+            for name, fraction in (('p50', 0.50), ('p95', 0.95), ('p99', 0.99))
+        },
+        'sql_statements': {
+            'mean': round(sum(statements) / len(statements), 2) if statements else None,
+            'max': max(statements) if statements else None,
+        },
+    }
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise SystemExit(f'Unknown scenario {name!r}; choose from {", ".join(SCENARIOS)}')
+        mix[name] = float(weight or 1)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(result, previous=None):
+    print(f"{'scenario':10s} {'requests':>9s} {'req/s':>8s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} "
+          f"{'SQL/req':>8s} {'errors':>7s}")
+    for name, stats in list(result['scenarios'].items()) + [('total', result['total'])]:
+        latency = stats['latency_ms']
+        line = (f"{name:10s} {stats['requests']:9d} {stats['throughput_rps']:8.1f} "
+                f"{latency['p50'] or 0:9.2f} {latency['p95'] or 0:9.2f} {latency['p99'] or 0:9.2f} "
+                f"{stats['sql_statements']['mean'] or 0:8.1f} {stats['errors']:7d}")
+        before = (previous or {}).get('scenarios', {}).get(name) if name != 'total' else (previous or {}).get('total')
+        if before and before['latency_ms']['p95'] and latency['p95']:
+            change = (latency['p95'] - before['latency_ms']['p95']) / before['latency_ms']['p95'] * 100
+            line += f'   p95 {change:+.1f}% vs {previous["meta"].get("commit") or "previous"}'
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', help='e.g. postgresql://localhost/cn_load (must be empty)')
+    parser.add_argument('--students', type=int, default=100)
+    parser.add_argument('--employers', type=int, default=20)
+    parser.add_argument('--conversations', type=int, default=3, help='conversations per student')
+    parser.add_argument('--messages', type=int, default=50, help='messages per conversation')
+    parser.add_argument('--applications', type=int, default=500, help='pending applications to accept')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help=f'scenario weights (default {DEFAULT_MIX})')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON results file (default benchmarks/results/<commit>-<time>.json)')
+    parser.add_argument('--compare', help='previous JSON results to compare p95 latency against')
+    args = parser.parse_args()
+
+    mix = parse_mix(args.mix)
+    app = create_bench_app(args.database_url)
+    app.logger.disabled = True
+
+    seed_start = time.perf_counter()
+    dataset = seed_dataset(app, args.students, args.employers, args.conversations,
+                           args.messages, args.applications, seed=args.seed)
+    seed_seconds = time.perf_counter() - seed_start
+    workload = Workload(app, dataset)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            event.listen(engine, 'before_cursor_execute', _count_statement)
+
+    samples = defaultdict(list)
+    per_worker = [defaultdict(list) for _ in range(args.concurrency)]
+    deadline = time.monotonic() + args.duration
+    threads = [
+        threading.Thread(target=run_worker, args=(app, workload, mix, deadline, args.seed + i, per_worker[i]))
+        for i in range(args.concurrency)
+    ]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    for worker_samples in per_worker:
+        for name, values in worker_samples.items():
+            samples[name].extend(values)
+
+    result = {
+        'meta': {
+            'commit': git_commit(),
+            'timestamp': datetime.utcnow().isoformat() + 'Z',
+            'python': platform.python_version(),
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+            'seed_seconds': round(seed_seconds, 3),
+            'duration_seconds': round(elapsed, 3),
+            'args': vars(args),
+        },
+        'scenarios': {name: summarize(samples[name], elapsed) for name in SCENARIOS if name in samples},
+        'total': summarize([sample for values in samples.values() for sample in values], elapsed),
+    }
+
+    previous = None
+    if args.compare:
+        with open(args.compare) as f:
+            previous = json.load(f)
+    print_report(result, previous)
+
+    output = args.output or os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), 'results',
+        f"{result['meta']['commit'] or 'local'}-{datetime.utcnow():%Y%m%dT%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'results saved to {output}')
+
+
+if __name__ == '__main__':
+    main()
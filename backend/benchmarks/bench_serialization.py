@@ -0,0 +1,151 @@
+"""
+Microbenchmark for API response serialization
+
+Compares the previous per-row to_dict (isoformat() + 'Z' on every datetime)
+encoded with the standard library against the compiled model schemas
+encoded with FastJSONProvider.
+
+Usage:
+    python benchmarks/bench_serialization.py [--messages 50] [--conversations 50] [--repeat 200]
+"""
+import argparse
+import json
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from app.models import User, Conversation, ConversationParticipant, Message
+from app.utils.json_provider import FastJSONProvider, orjson
+
+
+def legacy_user(u):
+    return {
+        'id': u.id,
+        'email': u.email,
+        'username': u.username,
+        'user_type': u.user_type,
+        'full_name': u.full_name,
+        'created_at': (u.created_at.isoformat() + 'Z') if u.created_at else None
+    }
+
+
+def legacy_message(m):
+    return {
+        'id': m.id,
+        'conversation_id': m.conversation_id,
+        'sender_id': m.sender_id,
+        'sender': legacy_user(m.sender) if m.sender else None,
+        'content': m.content,
+        'created_at': m.created_at.isoformat() + 'Z',
+        'is_system_message': m.is_system_message,
+        'has_attachment': m.has_attachment,
+        'file_name': m.file_name,
+        'file_path': m.file_path,
+        'file_size': m.file_size,
+        'file_type': m.file_type,
+        'client_message_id': m.client_message_id
+    }
+
+
+def legacy_conversation(c, current_user_id):
+    last_message = c.messages[-1] if c.messages else None
+    unread_count = 0
+    other_participant = None
+    for participant in c.participants:
+        if participant.user_id == current_user_id:
+            unread_count = participant.unread_count
+        else:
+            other_participant = legacy_user(participant.user)
+    return {
+        'id': c.id,
+        'name': c.name,
+        'is_group': c.is_group,
+        'created_by': c.created_by,
+        'member_count': c.member_count,
+        'created_at': c.created_at.isoformat() + 'Z',
+        'updated_at': c.updated_at.isoformat() + 'Z',
+        'last_message': legacy_message(last_message) if last_message else None,
+        'unread_count': unread_count,
+        'other_participant': other_participant,
+        'participants': [legacy_user(p.user) for p in c.participants]
+    }
+
+
+def legacy_dumps(obj):
+    # Flask's DefaultJSONProvider settings outside debug mode
+    return json.dumps(obj, sort_keys=True, ensure_ascii=True, separators=(',', ':'))
+
+
+def build_fixtures(n_messages, n_conversations):
+    now = datetime(2024, 1, 1, 12, 0, 0, 123456)
+    me = User(id=1, email='me@example.com', username='me', user_type='student',
+              full_name='Me Myself', created_at=now)
+
+    history = []
+    other = User(id=2, email='other@example.com', username='other', user_type='employer',
+                 full_name='Other Person', created_at=now)
+    for i in range(n_messages):
+        history.append(Message(
+            id=i + 1, conversation_id=1, sender_id=(me if i % 2 else other).id,
+            sender=me if i % 2 else other, content=f'Message number {i} ' * 4,
+            created_at=now + timedelta(seconds=i), is_system_message=False,
+            has_attachment=False
+        ))
+
+    inbox = []
+    for i in range(n_conversations):
+        peer = User(id=100 + i, email=f'peer{i}@example.com', username=f'peer{i}',
+                    user_type='employer', full_name=f'Peer {i}', created_at=now)
+        conversation = Conversation(id=i + 1, created_at=now, updated_at=now + timedelta(minutes=i),
+                                    is_group=False, member_count=2, message_seq=5)
+        conversation.participants = [
+            ConversationParticipant(user_id=me.id, user=me, last_read_seq=5 - i % 3),
+            ConversationParticipant(user_id=peer.id, user=peer, last_read_seq=5),
+        ]
+        conversation.messages = [Message(
+            id=10000 + i, conversation_id=i + 1, sender_id=peer.id, sender=peer,
+            content='Latest message', created_at=now, is_system_message=False,
+            has_attachment=False
+        )]
+        inbox.append(conversation)
+
+    return me, history, inbox
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--conversations', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args()
+
+    app = Flask(__name__)
+    provider = FastJSONProvider(app)
+    me, history, inbox = build_fixtures(args.messages, args.conversations)
+
+    cases = {
+        'message history': (
+            lambda: legacy_dumps({'messages': [legacy_message(m) for m in history]}),
+            lambda: provider.dumps({'messages': [m.to_dict() for m in history]}),
+        ),
+        'inbox': (
+            lambda: legacy_dumps({'conversations': [legacy_conversation(c, me.id) for c in inbox]}),
+            lambda: provider.dumps({'conversations': [c.to_dict(me.id) for c in inbox]}),
+        ),
+    }
+
+    print(f"orjson: {'available' if orjson else 'not installed (stdlib fallback)'}")
+    for name, (legacy, fast) in cases.items():
+        assert json.loads(legacy()) == json.loads(fast()), f'{name}: output mismatch'
+        legacy_time = min(timeit.repeat(legacy, number=args.repeat, repeat=5)) / args.repeat
+        fast_time = min(timeit.repeat(fast, number=args.repeat, repeat=5)) / args.repeat
+        print(f'{name:16s} legacy {legacy_time * 1e6:9.1f} us   fast {fast_time * 1e6:9.1f} us   '
+              f'speedup {legacy_time / fast_time:4.2f}x')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,70 @@
+"""
+Benchmark worker startup: imports, create_app() and the first request
+
+Each sample runs in a fresh interpreter. Reports import time, app creation
+time (with and without the startup schema check) and the time a worker
+forked from a preloaded app needs to answer its first request.
+
+Usage:
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs inside the child interpreter; prints a JSON dict of timings in seconds
+PROBE = r'''
+import json, os, sys, time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+
+read_fd, write_fd = os.pipe()
+forked = time.perf_counter()
+pid = os.fork()
+if pid == 0:
+    os.close(read_fd)
+    status = app.test_client().get('/admin/database/json').status_code
+    os.write(write_fd, json.dumps([status, time.perf_counter() - forked]).encode())
+    os._exit(0)
+os.close(write_fd)
+status, first_request = json.loads(os.read(read_fd, 1024))
+os.waitpid(pid, 0)
+assert status == 200, status
+print(json.dumps({'import': imported - start, 'create_app': created - imported, 'fork_first_request': first_request}))
+'''
+
+
+def sample(create_all, database_uri):
+    env = dict(os.environ, DATABASE_URL=database_uri, DB_CREATE_ALL='true' if create_all else 'false')
+    output = subprocess.run([sys.executable, '-c', PROBE], cwd=BACKEND_DIR, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    database_uri = 'sqlite:///' + os.path.join(tempfile.mkdtemp(prefix='cn-bench-'), 'bench.db')
+    sample(True, database_uri)  # Create the schema and warm the OS file cache
+
+    for create_all in (True, False):
+        runs = [sample(create_all, database_uri) for _ in range(args.runs)]
+        print(f'DB_CREATE_ALL={str(create_all).lower()}')
+        for key in ('import', 'create_app', 'fork_first_request'):
+            median = statistics.median(run[key] for run in runs)
+            print(f'  {key:20s} {median * 1e3:8.2f} ms (median of {args.runs})')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""
+Compare JSON and msgpack responses on seeded data
+
+For the message history, inbox and unread endpoints this reports the
+payload size and the server (request) and client (decode) latency of
+Accept: application/json versus Accept: application/msgpack.
+
+Usage:
+    python benchmarks/bench_wire_format.py [--messages 50] [--conversations 20] [--repeat 100]
+"""
+import argparse
+import json
+import time
+
+from common import create_bench_app, seed_conversation
+from app.utils.wire_format import unpackb, MSGPACK_MIMETYPE
+
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - start) / repeat
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--messages', type=int, default=50)
+    parser.add_argument('--conversations', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=100)
+    args = parser.parse_args()
+
+    # Measure the wire format alone, not compression
+    app = create_bench_app(COMPRESSION_ENABLED=False)
+    auth, conversation_id = seed_conversation(app, args.messages, args.conversations)
+    client = app.test_client()
+
+    urls = {
+        'message history': f'/api/messages/conversations/{conversation_id}/messages',
+        'inbox': '/api/messages/conversations',
+        'unread': '/api/messages/unread',
+    }
+    decoders = {'application/json': json.loads, MSGPACK_MIMETYPE: unpackb}
+
+    for name, url in urls.items():
+        for mimetype, decode in decoders.items():
+            headers = dict(auth, Accept=mimetype)
+            body, request_time = timed(lambda: client.get(url, headers=headers).get_data(), args.repeat)
+            _, decode_time = timed(lambda: decode(body), args.repeat)
+            print(f'{name:16s} {mimetype:20s} {len(body):8d} bytes   '
+                  f'request {request_time * 1e3:7.3f} ms   decode {decode_time * 1e6:8.1f} us')
+
+
+if __name__ == '__main__':
+    main()
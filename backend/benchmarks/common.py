@@ -0,0 +1,167 @@
+"""Shared helpers for the benchmark scripts: a throwaway app and seeded data"""
+import os
+import random
+import sys
+import tempfile
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app, db
+from sqlalchemy import insert
+from werkzeug.security import generate_password_hash
+from app.models import User, Conversation, ConversationParticipant, Message, JobApplication
+from app.utils.jwt_utils import generate_access_token
+
+
+def create_bench_app(database_uri=None, **overrides):
+    """
+    Create an app backed by a temporary SQLite database (or database_uri)
+
+    Returns:
+        Flask application with tables created
+    """
+    workdir = tempfile.mkdtemp(prefix='cn-bench-')
+
+    class BenchConfig(Config):
+        SQLALCHEMY_DATABASE_URI = database_uri or 'sqlite:///' + os.path.join(workdir, 'bench.db')
+        UPLOAD_FOLDER = os.path.join(workdir, 'uploads')
+
+    for key, value in overrides.items():
+        setattr(BenchConfig, key, value)
+
+    return create_app(BenchConfig)
+
+
+def seed_conversation(app, n_messages=50, n_conversations=1):
+    """
+    Seed a student with n_conversations employer chats of n_messages each
+
+    Returns:
+        (auth headers for the student, id of the first conversation)
+    """
+    with app.app_context():
+        now = datetime.utcnow()
+        student = User(email='bench-student@example.com', username='bench-student',
+                       user_type='student', full_name='Bench Student')
+        student.set_password('password')
+        db.session.add(student)
+        db.session.flush()
+
+        first_conversation_id = None
+        for c in range(n_conversations):
+            employer = User(email=f'bench-employer{c}@example.com', username=f'bench-employer{c}',
+                            user_type='employer', full_name=f'Bench Employer {c}', password_hash='x')
+            conversation = Conversation(created_at=now, updated_at=now, member_count=2, message_seq=n_messages)
+            db.session.add_all([employer, conversation])
+            db.session.flush()
+            first_conversation_id = first_conversation_id or conversation.id
+
+            db.session.add_all([
+                ConversationParticipant(conversation_id=conversation.id, user_id=student.id,
+                                        last_read_seq=max(n_messages - 3, 0)),
+                ConversationParticipant(conversation_id=conversation.id, user_id=employer.id,
+                                        last_read_seq=n_messages),
+            ])
+            db.session.add_all([
+                Message(
+                    conversation_id=conversation.id,
+                    sender_id=employer.id if i % 2 else student.id,
+                    content=f'Benchmark message {i}: lorem ipsum dolor sit amet, consectetur adipiscing elit.',
+                    created_at=now + timedelta(seconds=i)
+                )
+                for i in range(n_messages)
+            ])
+
+        db.session.commit()
+        token = generate_access_token(student.id, student.user_type)
+
+    return {'Authorization': f'Bearer {token}'}, first_conversation_id
+
+
+def _insert_ids(model, rows):
+    """Bulk insert rows and return their primary keys in order"""
+    if not rows:
+        return []
+    statement = insert(model).returning(model.id, sort_by_parameter_order=True)
+    return list(db.session.scalars(statement, rows))
+
+
+def seed_dataset(app, students=100, employers=20, conversations_per_student=3,
+                 messages_per_conversation=20, pending_applications=200, password='password', seed=0):
+    """
+    Bulk-seed users, one-to-one conversations with messages and pending applications
+
+    Every user shares one password hash (hashing is deliberately slow).
+    Student i talks to conversations_per_student distinct employers.
+
+    Returns:
+        Dictionary with student_ids, employer_ids, conversations
+        ({user_id: [conversation ids]}), pending_applications
+        ([(application_id, employer_id)]) and the shared password
+    """
+    rng = random.Random(seed)
+    conversations_per_student = min(conversations_per_student, employers)
+
+    with app.app_context():
+        now = datetime.utcnow()
+        password_hash = generate_password_hash(password)
+
+        def user_rows(user_type, count):
+            return [{
+                'email': f'load-{user_type}{i}@example.com', 'username': f'load-{user_type}{i}',
+                'password_hash': password_hash, 'user_type': user_type,
+                'full_name': f'Load {user_type.title()} {i}', 'created_at': now
+            } for i in range(count)]
+
+        student_ids = _insert_ids(User, user_rows('student', students))
+        employer_ids = _insert_ids(User, user_rows('employer', employers))
+
+        pairs = [
+            (student_id, employer_ids[(i + j) % employers])
+            for i, student_id in enumerate(student_ids)
+            for j in range(conversations_per_student)
+        ]
+        last_message_at = now + timedelta(seconds=messages_per_conversation)
+        conversation_ids = _insert_ids(Conversation, [{
+            'created_at': now, 'updated_at': last_message_at, 'is_group': False,
+            'member_count': 2, 'message_seq': messages_per_conversation
+        } for _ in pairs])
+
+        participant_rows, message_rows = [], []
+        conversations = {}
+        for conversation_id, (student_id, employer_id) in zip(conversation_ids, pairs):
+            conversations.setdefault(student_id, []).append(conversation_id)
+            conversations.setdefault(employer_id, []).append(conversation_id)
+            participant_rows += [
+                {'conversation_id': conversation_id, 'user_id': student_id, 'joined_at': now,
+                 'last_read_seq': max(messages_per_conversation - rng.randint(0, 3), 0)},
+                {'conversation_id': conversation_id, 'user_id': employer_id, 'joined_at': now,
+                 'last_read_seq': messages_per_conversation},
+            ]
+            message_rows += [{
+                'conversation_id': conversation_id,
+                'sender_id': employer_id if i % 2 else student_id,
+                'content': f'Load test message {i}: lorem ipsum dolor sit amet, consectetur adipiscing elit.',
+                'created_at': now + timedelta(seconds=i), 'is_system_message': False, 'has_attachment': False
+            } for i in range(messages_per_conversation)]
+        db.session.execute(insert(ConversationParticipant), participant_rows)
+        if message_rows:
+            db.session.execute(insert(Message), message_rows)
+
+        application_rows = [{
+            'student_id': rng.choice(student_ids), 'employer_id': rng.choice(employer_ids),
+            'job_title': f'Load Test Role {i}', 'status': 'pending', 'applied_at': now, 'updated_at': now
+        } for i in range(pending_applications)] if student_ids and employer_ids else []
+        application_ids = _insert_ids(JobApplication, application_rows)
+        db.session.commit()
+
+    return {
+        'student_ids': student_ids,
+        'employer_ids': employer_ids,
+        'conversations': conversations,
+        'pending_applications': [(application_id, row['employer_id'])
+                                 for application_id, row in zip(application_ids, application_rows)],
+        'password': password,
+    }
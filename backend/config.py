@@ -4,17 +4,58 @@ from datetime import timedelta
 # Get the base directory
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+# Production defaults favour fast startup and failing fast over queueing requests
+_production = os.environ.get('FLASK_ENV') == 'production'
+
+
+def _sample_rates(value):
+    """Parse 'logger=rate,...' (e.g. 'app.access=0.1') into a dict"""
+    rates = {}
+    for part in value.split(','):
+        name, _, rate = part.partition('=')
+        if name.strip():
+            rates[name.strip()] = float(rate or 1)
+    return rates
+
+
+def _database_url(url):
+    """Normalize Heroku/Railway style postgres:// URLs for SQLAlchemy"""
+    if url and url.startswith('postgres://'):
+        return url.replace('postgres://', 'postgresql://', 1)
+    return url
+
+
 class Config:
     # Secret key for JWT - use environment variable in production
     SECRET_KEY = os.environ.get('SECRET_KEY') or 'dev-secret-key-change-in-production'
 
     # Database configuration - Railway compatible
-    DATABASE_URL = os.environ.get('DATABASE_URL')
-    if DATABASE_URL and DATABASE_URL.startswith('postgres://'):
-        DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
+    DATABASE_URL = _database_url(os.environ.get('DATABASE_URL'))
 
     SQLALCHEMY_DATABASE_URI = DATABASE_URL or ('sqlite:///' + os.path.join(basedir, 'instance', 'cn_project.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Create missing tables at startup; production runs `flask init-db` once instead
+    DB_CREATE_ALL = os.environ.get('DB_CREATE_ALL', 'false' if _production else 'true').lower() == 'true'
+
+    # Read replicas (comma-separated URLs); GET requests read from them
+    REPLICA_DATABASE_URLS = [
+        _database_url(url.strip()) for url in os.environ.get('REPLICA_DATABASE_URLS', '').split(',') if url.strip()
+    ]
+    SQLALCHEMY_BINDS = {f'replica_{i}': url for i, url in enumerate(REPLICA_DATABASE_URLS)}
+    REPLICA_BIND_KEYS = tuple(SQLALCHEMY_BINDS)
+    REPLICA_STICKY_SECONDS = float(os.environ.get('REPLICA_STICKY_SECONDS', 5))  # read-your-writes window
+    REPLICA_HEALTH_CHECK_INTERVAL = float(os.environ.get('REPLICA_HEALTH_CHECK_INTERVAL', 10))
+
+    # Connection pool (applied to the primary and every replica engine)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 10 if _production else 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 5 if _production else 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 2 if _production else 30))  # seconds before 503
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 1800))  # below typical server idle timeouts
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() == 'true'
+    DB_POOL_ACQUIRE_ON_REQUEST = os.environ.get('DB_POOL_ACQUIRE_ON_REQUEST', 'true').lower() == 'true'
+    # Views that need no database (or must never wait for a connection) skip the up-front checkout
+    DB_POOL_EXEMPT_ENDPOINTS = {'admin.pool_status', 'metrics', 'messaging.download_signed', 'static'}
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 5000 if _production else 0))  # PostgreSQL only
 
     # JWT configuration
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=1)
@@ -25,6 +66,82 @@ class Config:
     MAX_CONTENT_LENGTH = 50 * 1024 * 1024  # 50MB max file size
     ALLOWED_EXTENSIONS = {'txt', 'pdf', 'png', 'jpg', 'jpeg', 'gif', 'doc', 'docx', 'xls', 'xlsx', 'zip', 'rar'}
 
+    # Attachment storage: 'local' (UPLOAD_FOLDER, one server) or 's3' (any S3-compatible bucket, shared)
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+    STORAGE_S3_BUCKET = os.environ.get('STORAGE_S3_BUCKET')
+    STORAGE_S3_PREFIX = os.environ.get('STORAGE_S3_PREFIX', 'attachments/')
+    STORAGE_S3_ENDPOINT_URL = os.environ.get('STORAGE_S3_ENDPOINT_URL')  # e.g. http://localhost:9000 for MinIO
+    STORAGE_S3_REGION = os.environ.get('STORAGE_S3_REGION')
+    STORAGE_URL_EXPIRES = int(os.environ.get('STORAGE_URL_EXPIRES', 300))  # seconds a download URL stays valid
+
+    # Attachment storage quotas in bytes (0 for unlimited)
+    STORAGE_QUOTA_USER_BYTES = int(os.environ.get('STORAGE_QUOTA_USER_BYTES', 1024 ** 3))
+    STORAGE_QUOTA_CONVERSATION_BYTES = int(os.environ.get('STORAGE_QUOTA_CONVERSATION_BYTES', 5 * 1024 ** 3))
+
+    # Unread counter cache (seconds before counters written by other workers are reloaded)
+    UNREAD_CACHE_TTL = float(os.environ.get('UNREAD_CACHE_TTL', 5))
+    UNREAD_CACHE_MAX_USERS = int(os.environ.get('UNREAD_CACHE_MAX_USERS', 10000))
+    UNREAD_CACHE_MAX_CONVERSATIONS = int(os.environ.get('UNREAD_CACHE_MAX_CONVERSATIONS', 100000))
+
+    # Mark-read is write-behind: positions are coalesced and written every interval (0 writes each immediately)
+    MARK_READ_FLUSH_INTERVAL = float(os.environ.get('MARK_READ_FLUSH_INTERVAL', 1.0))  # seconds
+    MARK_READ_MAX_PENDING = int(os.environ.get('MARK_READ_MAX_PENDING', 10000))  # flush early beyond this
+
+    # Presence and typing indicators (in memory; shared through Redis when PRESENCE_REDIS_URL/REDIS_URL is set)
+    PRESENCE_REDIS_URL = os.environ.get('PRESENCE_REDIS_URL') or os.environ.get('REDIS_URL')
+    PRESENCE_TTL = float(os.environ.get('PRESENCE_TTL', 60))  # seconds online after the last activity
+    TYPING_TTL = float(os.environ.get('TYPING_TTL', 6))  # seconds a typing signal lasts
+    PRESENCE_MAX_USERS = int(os.environ.get('PRESENCE_MAX_USERS', 100000))
+    PRESENCE_MAX_CONVERSATIONS = int(os.environ.get('PRESENCE_MAX_CONVERSATIONS', 10000))
+    PRESENCE_PAGE_SIZE = int(os.environ.get('PRESENCE_PAGE_SIZE', 200))  # members whose online status one poll returns
+
+    # Inbox cache: serialized conversation lists per user, dropped on every write that changes them.
+    # In memory the TTL bounds how long writes handled by other workers go unnoticed; use Redis for several workers
+    INBOX_CACHE_ENABLED = os.environ.get('INBOX_CACHE_ENABLED', 'true').lower() == 'true'
+    INBOX_CACHE_REDIS_URL = os.environ.get('INBOX_CACHE_REDIS_URL') or os.environ.get('REDIS_URL')
+    INBOX_CACHE_TTL = float(os.environ.get('INBOX_CACHE_TTL', 300 if INBOX_CACHE_REDIS_URL else 5))  # seconds
+    INBOX_CACHE_MAX_BYTES = int(os.environ.get('INBOX_CACHE_MAX_BYTES', 64 * 1024 * 1024))  # in memory only
+
+    # Newest messages of recently read conversations, held in memory per worker (0 disables)
+    RECENT_MESSAGES_PER_CONVERSATION = int(os.environ.get('RECENT_MESSAGES_PER_CONVERSATION', 100))
+    RECENT_MESSAGES_MAX_BYTES = int(os.environ.get('RECENT_MESSAGES_MAX_BYTES', 32 * 1024 * 1024))  # approximate
+
+    # Response compression (gzip/brotli) for JSON and text responses
+    COMPRESSION_ENABLED = os.environ.get('COMPRESSION_ENABLED', 'true').lower() == 'true'
+    COMPRESSION_MIN_SIZE = int(os.environ.get('COMPRESSION_MIN_SIZE', 1024))  # bytes
+    COMPRESSION_GZIP_LEVEL = 6
+    COMPRESSION_BROTLI_QUALITY = 4
+    COMPRESSION_CACHE_SIZE = 256  # compressed bodies cached per ETag
+
+    # Per-request SQL profiling: Server-Timing header, slow statement and N+1 warnings
+    SQL_PROFILE_SAMPLE_RATE = float(os.environ.get('SQL_PROFILE_SAMPLE_RATE', 0.01 if _production else 1.0))
+    SQL_SLOW_STATEMENT_MS = float(os.environ.get('SQL_SLOW_STATEMENT_MS', 200))  # 0 disables
+    SQL_N_PLUS_ONE_THRESHOLD = int(os.environ.get('SQL_N_PLUS_ONE_THRESHOLD', 5))  # repeats of one statement shape
+
+    # POST /api/batch: sub-requests per batch, threads for concurrent GET sub-requests (keep within the pool)
+    BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 20))
+    BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 4))
+
+    # Logging: JSON lines (or text) written to stdout by a background thread, secrets redacted
+    LOG_FORMAT = os.environ.get('LOG_FORMAT', 'json' if _production else 'text')
+    LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO').upper()
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))  # records beyond this are dropped
+    # Fraction of INFO/DEBUG records kept per logger; one app.access record is logged per request
+    LOG_SAMPLE_RATES = _sample_rates(os.environ.get('LOG_SAMPLE_RATES', 'app.access=0.1' if _production else ''))
+
+    # Prometheus metrics at /metrics; set METRICS_TOKEN to require "Authorization: Bearer <token>".
+    # Without a token they are refused when METRICS_REQUIRE_TOKEN is on (the default in production)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    METRICS_REQUIRE_TOKEN = os.environ.get('METRICS_REQUIRE_TOKEN', str(_production)).lower() == 'true'
+
+    # Operational admin endpoints (/admin/pool, /admin/storage) require "Authorization: Bearer <ADMIN_TOKEN>";
+    # they are refused while it is unset
+    ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+    # ASGI mode (asgi.py): worker threads running the app; keep within the connection pool
+    ASGI_THREADS = int(os.environ.get('ASGI_THREADS', 8))
+
     # CORS configuration
     CORS_HEADERS = 'Content-Type'
 
@@ -0,0 +1,38 @@
+"""Gunicorn settings, read automatically when gunicorn starts from this directory"""
+import gc
+import glob
+import os
+import tempfile
+
+# Import and build the app once in the master; workers share its memory copy-on-write.
+# Database engines are disposed in each worker after fork (see app.utils.db_pool).
+preload_app = os.environ.get('GUNICORN_PRELOAD', 'true').lower() == 'true'
+
+# Workers write metrics to files here so /metrics can aggregate every process.
+# Must exist before prometheus_client is imported, i.e. before the preloaded app
+# loads (which happens ahead of the on_starting hook), so it is prepared here.
+# This file is read again on every HUP, so nothing here may touch live files.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'cn-prometheus'))
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def on_starting(server):
+    # Once per master start: drop metric files left over from a previous run (the master's own may already be open)
+    own_suffix = f'_{os.getpid()}.db'
+    for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+        if not path.endswith(own_suffix):
+            os.remove(path)
+
+
+def when_ready(server):
+    # Keep the garbage collector from touching (and so copying) the preloaded objects in workers
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    # Drop the dead worker's live gauges so they stop counting towards /metrics
+    try:
+        from prometheus_client import multiprocess
+    except ImportError:
+        return
+    multiprocess.mark_process_dead(worker.pid)
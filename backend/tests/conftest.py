@@ -0,0 +1,55 @@
+"""Shared fixtures: a throwaway app on a temporary SQLite database and users to act as"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app import create_app
+
+
+@pytest.fixture
+def app(tmp_path):
+    class TestConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'test.db')
+        UPLOAD_FOLDER = str(tmp_path / 'uploads')
+        DB_CREATE_ALL = True
+
+    return create_app(TestConfig)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def register(client):
+    """Register a user; returns (user dict, auth headers)"""
+    def register(username, user_type='student'):
+        response = client.post('/api/auth/register', json={
+            'email': f'{username}@example.com', 'username': username,
+            'password': 'password', 'user_type': user_type
+        })
+        assert response.status_code == 201, response.get_json()
+        data = response.get_json()
+        return data['user'], {'Authorization': f"Bearer {data['access_token']}"}
+
+    return register
+
+
+@pytest.fixture
+def direct_conversation(client, register):
+    """A student and an employer with an accepted application; returns (student, employer, conversation id)"""
+    student = register('student')
+    employer = register('employer', 'employer')
+    response = client.post('/api/jobs/applications', json={'employer_id': employer[0]['id'], 'job_title': 'Developer'},
+                           headers=student[1])
+    assert response.status_code == 201, response.get_json()
+    application_id = response.get_json()['application']['id']
+    response = client.post(f'/api/jobs/applications/{application_id}/accept', headers=employer[1])
+    assert response.status_code == 200, response.get_json()
+    return student, employer, response.get_json()['conversation']['id']
@@ -0,0 +1,170 @@
+"""The API behaves the same through the Flask test client (WSGI) and the ASGI adapter"""
+import asyncio
+import io
+import json
+
+import pytest
+from werkzeug.test import EnvironBuilder
+
+from app.utils.asgi import create_asgi_app
+
+# Differ per request by design
+VOLATILE_HEADERS = {'x-request-id', 'server-timing', 'date'}  # date: the two calls may straddle a second
+
+
+class Result:
+    def __init__(self, status, headers, body, chunks=1):
+        self.status = status
+        self.headers = {name.lower(): value for name, value in headers if name.lower() not in VOLATILE_HEADERS}
+        self.body = body
+        self.chunks = chunks  # Non-empty body messages (ASGI) or iterations (WSGI)
+
+    def json(self):
+        return json.loads(self.body)
+
+
+def call_wsgi(app, method, path, **kwargs):
+    response = app.test_client().open(path, method=method, buffered=False, **kwargs)
+    chunks = [chunk for chunk in response.response if chunk]
+    response.close()
+    return Result(response.status_code, response.headers.items(), b''.join(chunks), len(chunks))
+
+
+def call_asgi(app, method, path, **kwargs):
+    environ = EnvironBuilder(path, method=method, **kwargs).get_environ()
+    body = environ['wsgi.input'].read()
+    headers = [('host', 'localhost')]
+    headers += [(key[5:].replace('_', '-').lower(), value) for key, value in environ.items() if key.startswith('HTTP_')
+                and key != 'HTTP_HOST']
+    if environ.get('CONTENT_TYPE'):
+        headers.append(('content-type', environ['CONTENT_TYPE']))
+    if environ.get('CONTENT_LENGTH'):
+        headers.append(('content-length', environ['CONTENT_LENGTH']))
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': environ['PATH_INFO'], 'query_string': environ['QUERY_STRING'].encode('latin-1'),
+        'root_path': '', 'client': ('127.0.0.1', 50000), 'server': ('localhost', 80),
+        'headers': [(name.encode('latin-1'), value.encode('latin-1')) for name, value in headers],
+    }
+    incoming = [{'type': 'http.request', 'body': body[i:i + 4096], 'more_body': i + 4096 < len(body)}
+                for i in range(0, max(len(body), 1), 4096)]
+    sent = []
+
+    async def receive():
+        return incoming.pop(0) if incoming else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(create_asgi_app(app)(scope, receive, send))
+    start = sent[0]
+    assert start['type'] == 'http.response.start'
+    chunks = [message['body'] for message in sent[1:] if message.get('body')]
+    assert sent[-1] == {'type': 'http.response.body', 'body': b'', 'more_body': False}
+    headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in start['headers']]
+    return Result(start['status'], headers, b''.join(chunks), len(chunks))
+
+
+SERVERS = {'wsgi': call_wsgi, 'asgi': call_asgi}
+
+
+@pytest.fixture(params=sorted(SERVERS))
+def serve(request, app):
+    """Send a request through one server interface: serve(method, path, **EnvironBuilder arguments)"""
+    return lambda method, path, **kwargs: SERVERS[request.param](app, method, path, **kwargs)
+
+
+@pytest.fixture
+def conversation_with_file(client, direct_conversation):
+    (_, student_headers), (_, employer_headers), conversation_id = direct_conversation
+    content = bytes(range(256)) * 1024  # 256KB: several chunks
+    response = client.post(f'/api/messages/conversations/{conversation_id}/send',
+                           data={'content': 'report', 'file': (io.BytesIO(content), 'report.pdf')},
+                           headers=employer_headers, content_type='multipart/form-data')
+    assert response.status_code == 201
+    return student_headers, conversation_id, response.get_json()['data']['file_path'], content
+
+
+def test_auth(serve, register):
+    register('alice')
+    response = serve('POST', '/api/auth/login', json={'email': 'alice@example.com', 'password': 'password'})
+    assert response.status == 200
+    tokens = response.json()
+    assert tokens['user']['username'] == 'alice'
+
+    response = serve('GET', '/api/auth/me', headers={'Authorization': f"Bearer {tokens['access_token']}"})
+    assert response.status == 200
+    assert response.json()['user']['username'] == 'alice'
+
+    response = serve('POST', '/api/auth/login', json={'email': 'alice@example.com', 'password': 'wrong'})
+    assert response.status == 401
+
+
+def test_send(serve, direct_conversation):
+    (_, headers), _, conversation_id = direct_conversation
+    path = f'/api/messages/conversations/{conversation_id}/send'
+    response = serve('POST', path, data={'content': 'hello', 'file': (io.BytesIO(b'x' * 100000), 'a.txt')},
+                     headers={**headers, 'Idempotency-Key': 'send-1'}, content_type='multipart/form-data')
+    assert response.status == 201
+    sent = response.json()['data']
+    assert (sent['content'], sent['file_size']) == ('hello', 100000)
+
+    replay = serve('POST', path, data={'content': 'hello'}, headers={**headers, 'Idempotency-Key': 'send-1'})
+    assert replay.status == 201
+    assert replay.headers['idempotent-replayed'] == 'true'
+    assert replay.json()['data']['id'] == sent['id']
+
+
+def test_streaming_download(serve, conversation_with_file):
+    headers, _, file_path, content = conversation_with_file
+    response = serve('GET', f'/api/messages/files/{file_path}', headers=headers)
+    assert response.status == 200
+    assert response.body == content
+    assert response.chunks > 1
+    assert response.headers['content-length'] == str(len(content))
+    assert response.headers['content-disposition'].startswith('attachment')
+
+
+@pytest.mark.parametrize('method, path, status', [
+    ('GET', '/api/messages/conversations', 401),  # No token
+    ('GET', '/api/does-not-exist', 404),
+    ('DELETE', '/api/auth/login', 405),
+])
+def test_error_paths(serve, method, path, status):
+    assert serve(method, path).status == status
+
+
+def test_error_paths_of_a_conversation(app, serve, register, conversation_with_file):
+    headers, conversation_id, file_path, _ = conversation_with_file
+    _, outsider = register('outsider')
+
+    assert serve('GET', f'/api/messages/conversations/{conversation_id}/messages', headers=outsider).status == 403
+    assert serve('POST', f'/api/messages/conversations/{conversation_id}/send', data={},
+                 headers=headers).status == 400
+    assert serve('GET', '/api/messages/files/missing.pdf', headers=headers).status == 404
+
+    app.config['MAX_CONTENT_LENGTH'] = 1024
+    response = serve('POST', f'/api/messages/conversations/{conversation_id}/send',
+                     data={'file': (io.BytesIO(b'x' * 4096), 'big.txt')}, headers=headers,
+                     content_type='multipart/form-data')
+    assert response.status == 413
+
+
+def test_identical_responses(app, register, conversation_with_file):
+    headers, conversation_id, file_path, _ = conversation_with_file
+    requests = [
+        ('GET', '/api/messages/conversations', {'headers': headers}),
+        ('GET', '/api/messages/conversations?shape=normalized&fields=id,last_message', {'headers': headers}),
+        ('GET', f'/api/messages/conversations/{conversation_id}/messages?per_page=5',
+         {'headers': {**headers, 'Accept-Encoding': 'gzip'}}),
+        ('GET', f'/api/messages/conversations/{conversation_id}/messages',
+         {'headers': {**headers, 'Accept': 'application/msgpack'}}),
+        ('GET', f'/api/messages/files/{file_path}', {'headers': headers}),
+        ('GET', '/api/messages/unread', {'headers': headers}),
+        ('GET', '/api/messages/conversations', {}),
+        ('GET', '/api/messages/files/missing.pdf', {'headers': headers}),
+        ('POST', '/api/auth/login', {'json': {'email': 'student@example.com', 'password': 'wrong'}}),
+    ]
+    for method, path, kwargs in requests:
+        wsgi, asgi = call_wsgi(app, method, path, **kwargs), call_asgi(app, method, path, **kwargs)
+        assert (wsgi.status, wsgi.headers, wsgi.body) == (asgi.status, asgi.headers, asgi.body), (method, path)
@@ -0,0 +1,38 @@
+"""The up-front connection checkout only happens for views that use the database"""
+import io
+
+import pytest
+from sqlalchemy import event
+
+from app import db
+
+
+@pytest.fixture
+def checkouts(app):
+    """Count connections checked out of the primary pool"""
+    counter = []
+    with app.app_context():
+        engine = db.engine
+    listener = lambda *args: counter.append(1)  # noqa: E731
+    event.listen(engine, 'checkout', listener)
+    yield counter
+    event.remove(engine, 'checkout', listener)
+
+
+def test_database_free_requests_take_no_connection(client, direct_conversation, checkouts):
+    (_, student_headers), (_, employer_headers), conversation_id = direct_conversation
+    response = client.post(f'/api/messages/conversations/{conversation_id}/send',
+                           data={'content': 'report', 'file': (io.BytesIO(b'%PDF-1.4'), 'report.pdf')},
+                           headers=employer_headers, content_type='multipart/form-data')
+    file_path = response.get_json()['data']['file_path']
+    url = client.get(f'/api/messages/files/{file_path}/url', headers=student_headers).get_json()['url']
+
+    checkouts.clear()
+    response = client.get(url)
+    assert response.status_code == 200
+    assert response.data == b'%PDF-1.4'
+    assert client.get('/api/no-such-route').status_code == 404
+    assert checkouts == []
+
+    client.get('/api/messages/unread', headers=student_headers)
+    assert checkouts == [1]
@@ -0,0 +1,80 @@
+"""Read-your-writes across workers: the sticky token travels with the client, not in process memory"""
+import pytest
+
+from config import Config
+from app import create_app
+from app.utils import db_routing
+from app.utils.db_routing import STICKY_HEADER
+
+
+@pytest.fixture
+def app(tmp_path):
+    class ReplicaConfig(Config):
+        TESTING = True
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + str(tmp_path / 'primary.db')
+        SQLALCHEMY_BINDS = {'replica_0': 'sqlite:///' + str(tmp_path / 'replica.db')}
+        REPLICA_BIND_KEYS = ('replica_0',)
+        UPLOAD_FOLDER = str(tmp_path / 'uploads')
+        DB_CREATE_ALL = True
+
+    return create_app(ReplicaConfig)
+
+
+@pytest.fixture
+def lagging_replica(app, client, register):
+    """A student and an employer copied to the replica, which then stops catching up"""
+    student = register('student')
+    employer = register('employer', 'employer')
+    result = app.test_cli_runner().invoke(args=['sync-replicas'])
+    assert result.exit_code == 0, result.output
+    return student, employer
+
+
+def apply(client, student, employer):
+    response = client.post('/api/jobs/applications', json={'employer_id': employer[0]['id'], 'job_title': 'Developer'},
+                           headers=student[1])
+    assert response.status_code == 201, response.get_json()
+    return response
+
+
+def application_count(client, headers):
+    response = client.get('/api/jobs/applications', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return len(response.get_json()['applications'])
+
+
+def test_write_response_keeps_later_reads_on_primary(client, lagging_replica):
+    student, employer = lagging_replica
+    sticky = apply(client, student, employer).headers[STICKY_HEADER]
+
+    # Another worker only knows what the request carries
+    assert application_count(client, student[1]) == 0
+    assert application_count(client, {**student[1], STICKY_HEADER: sticky}) == 1
+
+
+def test_forged_foreign_or_expired_tokens_read_the_replica(app, client, lagging_replica, monkeypatch):
+    student, employer = lagging_replica
+    sticky = apply(client, student, employer).headers[STICKY_HEADER]
+    until, _, signature = sticky.partition('.')
+
+    forged = f'{int(until) + 3600}.{signature}'
+    assert application_count(client, {**student[1], STICKY_HEADER: forged}) == 0
+    assert application_count(client, {**employer[1], STICKY_HEADER: sticky}) == 0
+
+    monkeypatch.setattr(db_routing.time, 'time', lambda: int(until) + 1)
+    assert application_count(client, {**student[1], STICKY_HEADER: sticky}) == 0
+
+
+def test_batch_reads_after_its_own_write(client, lagging_replica):
+    student, employer = lagging_replica
+    response = client.post('/api/batch', json={'requests': [
+        {'method': 'POST', 'path': '/api/jobs/applications',
+         'json': {'employer_id': employer[0]['id'], 'job_title': 'Developer'}},
+        {'method': 'GET', 'path': '/api/jobs/applications'}
+    ]}, headers=student[1])
+    assert response.status_code == 200
+    created, listed = response.get_json()['responses']
+    assert created['status'] == 201
+    assert len(listed['body']['applications']) == 1
+    assert STICKY_HEADER in response.headers
+
@@ -0,0 +1,26 @@
+"""Group ownership survives the owner leaving"""
+from app import db
+from app.models.conversation import Conversation
+
+
+def test_owner_leaving_hands_group_to_longest_standing_member(app, client, register):
+    owner, owner_headers = register('owner', 'employer')
+    first, first_headers = register('first')
+    second, _ = register('second')
+    group_id = client.post('/api/messages/groups', json={'name': 'Team', 'member_ids': [first['id']]},
+                           headers=owner_headers).get_json()['conversation']['id']
+    client.post(f'/api/messages/conversations/{group_id}/members', json={'user_ids': [second['id']]},
+                headers=owner_headers)
+
+    response = client.delete(f"/api/messages/conversations/{group_id}/members/{owner['id']}", headers=owner_headers)
+    assert response.status_code == 200
+    assert response.get_json() == {'message': 'Member removed', 'member_count': 2, 'owner_id': first['id']}
+
+    # The new owner can now manage the group
+    response = client.delete(f"/api/messages/conversations/{group_id}/members/{second['id']}", headers=first_headers)
+    assert response.status_code == 200
+
+    response = client.delete(f"/api/messages/conversations/{group_id}/members/{first['id']}", headers=first_headers)
+    assert response.get_json()['owner_id'] is None
+    with app.app_context():
+        assert db.session.get(Conversation, group_id).member_count == 0
@@ -0,0 +1,131 @@
+"""The inbox cache never serves an inbox older than the reader's own writes, in process or in Redis"""
+import random
+import threading
+
+import pytest
+
+from app.utils import inbox_cache
+from app.utils.inbox_cache import MemoryInboxCache, RedisInboxCache
+
+
+@pytest.fixture(params=['memory', 'redis'])
+def cache(request, app, monkeypatch):
+    if request.param == 'memory':
+        cache = MemoryInboxCache(ttl=300)
+    else:
+        fakeredis = pytest.importorskip('fakeredis')
+        server = fakeredis.FakeRedis()
+        monkeypatch.setattr(inbox_cache, 'get_redis', lambda url: server)
+        cache = RedisInboxCache('redis://test', ttl=300)
+    app.extensions['inbox_cache'] = cache
+    return cache
+
+
+def inbox(client, headers):
+    response = client.get('/api/messages/conversations', headers=headers)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_concurrent_writes_never_leave_a_stale_inbox(app, client, register, cache):
+    users = [register(f'user{i}') for i in range(5)]
+    response = client.post('/api/messages/groups', json={
+        'name': 'Everyone', 'member_ids': [user['id'] for user, _ in users[1:]]
+    }, headers=users[0][1])
+    group_id = response.get_json()['conversation']['id']
+    pair = client.post('/api/messages/groups', json={'name': 'Pair', 'member_ids': [users[1][0]['id']]},
+                       headers=users[0][1]).get_json()['conversation']['id']
+    conversations = {user['id']: [group_id] for user, _ in users}
+    conversations[users[0][0]['id']].append(pair)
+    conversations[users[1][0]['id']].append(pair)
+
+    stale, errors = [], []
+
+    def worker(seed):
+        rng = random.Random(seed)
+        worker_client = app.test_client()
+        try:
+            for _ in range(40):
+                user, headers = rng.choice(users)
+                conversation_id = rng.choice(conversations[user['id']])
+                action = rng.choice(('poll', 'poll', 'send', 'read'))
+                if action == 'poll':
+                    inbox(worker_client, headers)
+                elif action == 'send':
+                    sent = worker_client.post(f'/api/messages/conversations/{conversation_id}/send',
+                                              data={'content': f'message {rng.random()}'}, headers=headers)
+                    assert sent.status_code == 201, sent.get_json()
+                    shown = next(conversation for conversation in inbox(worker_client, headers)['conversations']
+                                 if conversation['id'] == conversation_id)
+                    if shown['last_message']['id'] < sent.get_json()['data']['id']:
+                        stale.append(('send', user['id'], conversation_id))
+                else:
+                    worker_client.post(f'/api/messages/conversations/{conversation_id}/mark-read', headers=headers)
+                    inbox(worker_client, headers)
+        except Exception as e:  # Reported from the main thread
+            errors.append(e)
+
+    threads = [threading.Thread(target=worker, args=(seed,)) for seed in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert not stale
+
+    # What each user would be served now equals a freshly computed inbox
+    cached = {user['id']: inbox(client, headers) for user, headers in users}
+    cache.clear()
+    for user, headers in users:
+        assert cached[user['id']] == inbox(client, headers)
+
+
+def test_send_outdates_every_member_inbox(client, register, cache):
+    owner, member = register('owner'), register('member')
+    group_id = client.post('/api/messages/groups', json={'name': 'Group', 'member_ids': [member[0]['id']]},
+                           headers=owner[1]).get_json()['conversation']['id']
+    assert inbox(client, member[1])['conversations'][0]['last_message'] is None
+    inbox(client, member[1])  # Cached now
+
+    client.post(f'/api/messages/conversations/{group_id}/send', data={'content': 'hello'}, headers=owner[1])
+
+    shown = inbox(client, member[1])['conversations'][0]
+    assert shown['last_message']['content'] == 'hello'
+    assert shown['unread_count'] == 1
+
+
+def test_membership_changes_reach_joined_and_removed_users(client, register, cache):
+    owner, member, newcomer = register('owner'), register('member'), register('newcomer')
+    group_id = client.post('/api/messages/groups', json={'name': 'Group', 'member_ids': [member[0]['id']]},
+                           headers=owner[1]).get_json()['conversation']['id']
+    for _, headers in (owner, member, newcomer):
+        inbox(client, headers)
+
+    client.post(f'/api/messages/conversations/{group_id}/members', json={'user_ids': [newcomer[0]['id']]},
+                headers=owner[1])
+    assert [c['id'] for c in inbox(client, newcomer[1])['conversations']] == [group_id]
+    assert inbox(client, member[1])['conversations'][0]['member_count'] == 3
+
+    client.delete(f"/api/messages/conversations/{group_id}/members/{member[0]['id']}", headers=owner[1])
+    assert inbox(client, member[1])['conversations'] == []
+
+
+def test_body_computed_before_an_invalidation_is_not_served(cache):
+    _, token = cache.lookup(1, 'variant')
+    cache.invalidate_conversations([7])
+    cache.store(1, 'variant', b'old', token, [7])
+    assert cache.lookup(1, 'variant')[0] is None
+
+    _, token = cache.lookup(1, 'variant')
+    cache.invalidate([1])
+    cache.store(1, 'variant', b'old', token, [7])
+    assert cache.lookup(1, 'variant')[0] is None
+
+    _, token = cache.lookup(1, 'variant')
+    cache.store(1, 'variant', b'fresh', token, [7])
+    assert cache.lookup(1, 'variant')[0] == b'fresh'
+    cache.invalidate_conversations([8])  # Not listed: still served
+    assert cache.lookup(1, 'variant')[0] == b'fresh'
+    cache.clear()
+    assert cache.lookup(1, 'variant')[0] is None
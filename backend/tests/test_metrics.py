@@ -0,0 +1,36 @@
+"""Access to /metrics and the multiprocess file housekeeping in gunicorn.conf.py"""
+import os
+import runpy
+
+import pytest
+
+pytest.importorskip('prometheus_client')
+
+
+def test_metrics_refused_without_token_when_required(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_REQUIRE_TOKEN', True)
+    assert client.get('/metrics').status_code == 403
+
+
+def test_metrics_token(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, 'METRICS_REQUIRE_TOKEN', True)
+    monkeypatch.setitem(app.config, 'METRICS_TOKEN', 'scrape')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer scrape'})
+    assert response.status_code == 200
+    assert b'http_requests_total' in response.data
+
+
+def test_metric_files_cleared_on_start_not_on_reload(tmp_path, monkeypatch):
+    monkeypatch.setenv('PROMETHEUS_MULTIPROC_DIR', str(tmp_path))
+    stale = tmp_path / 'counter_1.db'
+    own = tmp_path / f'gauge_livesum_{os.getpid()}.db'
+    stale.write_bytes(b'')
+    own.write_bytes(b'')
+
+    settings = runpy.run_path(os.path.join(os.path.dirname(os.path.dirname(__file__)), 'gunicorn.conf.py'))
+    assert stale.exists()  # loading (or reloading on HUP) the config leaves files alone
+    settings['on_starting'](None)
+    assert not stale.exists()
+    assert own.exists()
@@ -0,0 +1,34 @@
+"""Presence polls stay bounded however large the group"""
+from app.utils.sql_profiler import max_statements
+
+
+def test_large_group_pages_online_members(app, client, register, monkeypatch):
+    monkeypatch.setitem(app.config, 'PRESENCE_PAGE_SIZE', 2)
+    owner, owner_headers = register('owner', 'employer')
+    members = [register(f'member{i}') for i in range(5)]
+    group_id = client.post('/api/messages/groups', json={
+        'name': 'Team', 'member_ids': [user['id'] for user, _ in members]
+    }, headers=owner_headers).get_json()['conversation']['id']
+    for _, headers in members:
+        client.get(f'/api/messages/conversations/{group_id}/presence', headers=headers)
+    client.post(f'/api/messages/conversations/{group_id}/typing', json={'typing': True}, headers=members[4][1])
+
+    online, cursor = [], 0
+    while cursor is not None:
+        with app.app_context(), max_statements(4):
+            response = client.get(f'/api/messages/conversations/{group_id}/presence?after={cursor}',
+                                  headers=owner_headers)
+        data = response.get_json()
+        assert len(data['online']) <= 2
+        assert data['typing'] == [members[4][0]['id']]
+        online += data['online']
+        cursor = data['next_cursor']
+    assert online == sorted(user['id'] for user, _ in members)
+
+
+def test_non_members_are_turned_away(client, register, direct_conversation):
+    _, headers = register('outsider')
+    conversation_id = direct_conversation[2]
+    assert client.get(f'/api/messages/conversations/{conversation_id}/presence', headers=headers).status_code == 403
+    response = client.post(f'/api/messages/conversations/{conversation_id}/typing', json={}, headers=headers)
+    assert response.status_code == 403
@@ -0,0 +1,68 @@
+"""Statement budgets of the hot endpoints: an N+1 or an extra round trip fails here first"""
+import pytest
+
+from app.utils.sql_profiler import max_statements
+
+
+@pytest.fixture
+def busy_student(app, client, register, direct_conversation):
+    """A student in one busy direct conversation and four groups, so per-conversation queries would show"""
+    (student, student_headers), (_, employer_headers), conversation_id = direct_conversation
+    for i in range(4):
+        owner, owner_headers = register(f'owner{i}', 'employer')
+        group_id = client.post('/api/messages/groups', json={'name': f'Group {i}', 'member_ids': [student['id']]},
+                               headers=owner_headers).get_json()['conversation']['id']
+        client.post(f'/api/messages/conversations/{group_id}/send', data={'content': 'hello'}, headers=owner_headers)
+    for i in range(30):
+        client.post(f'/api/messages/conversations/{conversation_id}/send', data={'content': f'message {i}'},
+                    headers=employer_headers)
+    return student_headers, conversation_id
+
+
+def request_within(app, limit, send):
+    with app.app_context(), max_statements(limit):
+        response = send()
+    assert response.status_code < 300, response.get_json()
+    return response
+
+
+def test_inbox(app, client, busy_student):
+    headers, _ = busy_student
+    app.extensions['inbox_cache'].clear()
+    # User, memberships with conversations, direct members, last messages
+    request_within(app, 4, lambda: client.get('/api/messages/conversations', headers=headers))
+    # Cached: only the user
+    request_within(app, 1, lambda: client.get('/api/messages/conversations', headers=headers))
+
+
+def test_message_page(app, client, busy_student):
+    headers, conversation_id = busy_student
+    url = f'/api/messages/conversations/{conversation_id}/messages?page=2&per_page=10'
+    app.extensions['recent_messages'].clear()
+    # User, membership, recent messages with their count
+    request_within(app, 3, lambda: client.get(url, headers=headers))
+    # From the recent-messages tail
+    request_within(app, 2, lambda: client.get(url, headers=headers))
+
+
+def test_message_page_from_database(app, client, busy_student):
+    headers, conversation_id = busy_student
+    app.extensions.pop('recent_messages')
+    # User, membership, count, page with senders
+    request_within(app, 4, lambda: client.get(
+        f'/api/messages/conversations/{conversation_id}/messages?page=2&per_page=10', headers=headers
+    ))
+
+
+def test_send(app, client, busy_student):
+    headers, conversation_id = busy_student
+    request_within(app, 9, lambda: client.post(
+        f'/api/messages/conversations/{conversation_id}/send', data={'content': 'hi'}, headers=headers
+    ))
+
+
+def test_mark_read(app, client, busy_student):
+    headers, conversation_id = busy_student
+    # The read position itself is written later by the read buffer
+    request_within(app, 2, lambda: client.post(f'/api/messages/conversations/{conversation_id}/mark-read',
+                                               headers=headers))
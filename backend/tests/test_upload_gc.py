@@ -0,0 +1,51 @@
+"""The upload sweeper quarantines every orphan exactly once, however often it is stopped and resumed"""
+import io
+import os
+import time
+
+from app.utils import storage
+from app.utils.upload_gc import sweep_uploads
+
+
+def backdate(path, seconds):
+    then = time.time() - seconds
+    os.utime(path, (then, then))
+
+
+def test_resumed_sweeps_skip_no_orphan(app, client, direct_conversation, tmp_path, monkeypatch):
+    monkeypatch.setattr(storage, 'LIST_PAGE_SIZE', 3)  # Several directory passes per batch and run
+    (_, headers), _, conversation_id = direct_conversation
+    response = client.post(f'/api/messages/conversations/{conversation_id}/send',
+                           data={'file': (io.BytesIO(b'kept'), 'kept.txt')}, headers=headers,
+                           content_type='multipart/form-data')
+    referenced = response.get_json()['data']['file_path']
+
+    uploads = app.config['UPLOAD_FOLDER']
+    orphans = {f'orphan{i:02d}.txt' for i in range(17)}
+    for name in orphans | {referenced}:
+        path = os.path.join(uploads, name)
+        if name in orphans:
+            with open(path, 'wb') as f:
+                f.write(b'x')
+        backdate(path, 7200)
+    with open(os.path.join(uploads, 'fresh.txt'), 'wb') as f:
+        f.write(b'x')
+
+    state_path = str(tmp_path / 'state.json')
+    runs = 0
+    with app.app_context():
+        while not sweep_uploads(app.extensions['storage'], state_path, batch_size=2, max_batches=1,
+                                grace_period=86400)['done']:
+            runs += 1
+
+    assert runs > 5
+    assert set(os.listdir(os.path.join(uploads, storage.QUARANTINE))) == orphans
+    assert set(os.listdir(uploads)) == {referenced, 'fresh.txt', storage.QUARANTINE}
+
+    # Past the grace period: deleted, unless referenced again
+    quarantine = os.path.join(uploads, storage.QUARANTINE)
+    for name in orphans:
+        backdate(os.path.join(quarantine, name), 2 * 86400)
+    with app.app_context():
+        sweep_uploads(app.extensions['storage'], state_path, batch_size=2, grace_period=86400)
+    assert os.listdir(quarantine) == []
@@ -55,7 +55,8 @@ function ConversationList({
                 <div className="conversation-info">
                   <div className="conversation-header">
                     <span className="conversation-name">
-                      {otherParticipant?.full_name ||
+                      {conversation.name ||
+                        otherParticipant?.full_name ||
                         otherParticipant?.username ||
                         'Unknown User'}
                     </span>
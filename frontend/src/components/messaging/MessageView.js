@@ -9,18 +9,25 @@ function MessageView({ conversation, currentUser, onMessageSent }) {
   const [loading, setLoading] = useState(true);
   const [sending, setSending] = useState(false);
   const [fileError, setFileError] = useState('');
+  const [presence, setPresence] = useState({ online: [], typing: [] });
   const messagesEndRef = useRef(null);
   const fileInputRef = useRef(null);
+  const lastTypingSentRef = useRef(0);
 
   const MAX_FILE_SIZE = 50 * 1024 * 1024; // 50MB in bytes
+  const SEND_ATTEMPTS = 3;
+  const TYPING_SIGNAL_INTERVAL = 3000; // ms between "typing" signals while typing
 
   useEffect(() => {
+    setPresence({ online: [], typing: [] });
     fetchMessages();
+    fetchPresence();
     markAsRead();
 
-    // Poll for new messages every 3 seconds
+    // Poll for new messages and presence every 3 seconds
     const pollInterval = setInterval(() => {
       fetchMessages();
+      fetchPresence();
     }, 3000);
 
     // Cleanup interval on unmount or conversation change
@@ -38,7 +45,16 @@ function MessageView({ conversation, currentUser, onMessageSent }) {
   const fetchMessages = async () => {
     try {
       const response = await messagingAPI.getMessages(conversation.id);
-      setMessages(response.data.messages);
+      const stored = response.data.messages;
+      // Keep optimistic messages until the server returns them
+      setMessages((current) => [
+        ...stored,
+        ...current.filter(
+          (message) =>
+            message.pending &&
+            !stored.some((s) => s.client_message_id === message.client_message_id)
+        ),
+      ]);
     } catch (err) {
       console.error('Failed to load messages:', err);
     } finally {
@@ -46,6 +62,28 @@ function MessageView({ conversation, currentUser, onMessageSent }) {
     }
   };
 
+  const fetchPresence = async () => {
+    try {
+      const response = await messagingAPI.getPresence(conversation.id);
+      setPresence(response.data);
+    } catch (err) {
+      console.error('Failed to load presence:', err);
+    }
+  };
+
+  // Tell the other members we're typing, at most every TYPING_SIGNAL_INTERVAL
+  const signalTyping = (typing) => {
+    const now = Date.now();
+    if (typing && now - lastTypingSentRef.current < TYPING_SIGNAL_INTERVAL) return;
+    lastTypingSentRef.current = typing ? now : 0;
+    messagingAPI.sendTyping(conversation.id, typing).catch(() => {});
+  };
+
+  const handleInputChange = (e) => {
+    setNewMessage(e.target.value);
+    signalTyping(e.target.value.length > 0);
+  };
+
   const markAsRead = async () => {
     try {
       await messagingAPI.markAsRead(conversation.id);
@@ -76,33 +114,80 @@ function MessageView({ conversation, currentUser, onMessageSent }) {
     }
   };
 
+  const newClientMessageId = () =>
+    window.crypto?.randomUUID
+      ? window.crypto.randomUUID()
+      : `${Date.now()}-${Math.random().toString(36).slice(2)}`;
+
+  // Retry timeouts, network errors and 503s with the same id; the server never stores a message twice
+  const sendWithRetry = async (content, file, clientMessageId) => {
+    for (let attempt = 1; ; attempt++) {
+      try {
+        return await messagingAPI.sendMessage(conversation.id, content, file, clientMessageId);
+      } catch (err) {
+        const retriable = !err.response || err.response.status === 503;
+        if (!retriable || attempt >= SEND_ATTEMPTS) throw err;
+        await new Promise((resolve) => setTimeout(resolve, 500 * attempt));
+      }
+    }
+  };
+
   const handleSendMessage = async (e) => {
     e.preventDefault();
 
     if (!newMessage.trim() && !selectedFile) return;
 
+    const content = newMessage;
+    const file = selectedFile;
+    const clientMessageId = newClientMessageId();
+
     setSending(true);
     setFileError('');
+    signalTyping(false);
+
+    // Show the message right away; it is replaced by the stored one below
+    setMessages((current) => [
+      ...current,
+      {
+        id: `pending-${clientMessageId}`,
+        client_message_id: clientMessageId,
+        sender_id: currentUser.id,
+        content: content || null,
+        has_attachment: !!file,
+        file_name: file?.name,
+        file_size: file?.size,
+        created_at: new Date().toISOString(),
+        pending: true,
+      },
+    ]);
+    setNewMessage('');
+    setSelectedFile(null);
+    if (fileInputRef.current) {
+      fileInputRef.current.value = '';
+    }
 
     try {
-      const response = await messagingAPI.sendMessage(
-        conversation.id,
-        newMessage,
-        selectedFile
-      );
-
-      // Add new message to the list
-      setMessages([...messages, response.data.data]);
-      setNewMessage('');
-      setSelectedFile(null);
-      if (fileInputRef.current) {
-        fileInputRef.current.value = '';
-      }
+      const response = await sendWithRetry(content, file, clientMessageId);
+      const stored = response.data.data;
+
+      setMessages((current) => {
+        const others = current.filter(
+          (message) => message.client_message_id !== clientMessageId
+        );
+        return others.some((message) => message.id === stored.id)
+          ? others
+          : [...others, stored];
+      });
 
       // Notify parent component
       onMessageSent();
     } catch (err) {
       console.error('Failed to send message:', err);
+      setMessages((current) =>
+        current.filter((message) => message.client_message_id !== clientMessageId)
+      );
+      setNewMessage(content);
+      setSelectedFile(file);
       setFileError(err.response?.data?.error || 'Failed to send message');
     } finally {
       setSending(false);
@@ -110,6 +195,21 @@ function MessageView({ conversation, currentUser, onMessageSent }) {
   };
 
   const handleDownloadFile = async (filename, originalFilename) => {
+    try {
+      // Short-lived direct link: the browser streams the file to disk itself
+      const { data } = await messagingAPI.getFileUrl(filename);
+      const link = document.createElement('a');
+      link.href = data.url;
+      // Save under the original name (cross-origin links rely on the response's Content-Disposition)
+      link.setAttribute('download', originalFilename);
+      document.body.appendChild(link);
+      link.click();
+      link.remove();
+      return;
+    } catch (err) {
+      console.error('Failed to get download link, downloading through the API:', err);
+    }
+
     try {
       const response = await messagingAPI.downloadFile(filename);
       const url = window.URL.createObjectURL(new Blob([response.data]));
@@ -144,6 +244,8 @@ function MessageView({ conversation, currentUser, onMessageSent }) {
   };
 
   const otherParticipant = conversation.other_participant;
+  const someoneTyping = presence.typing.length > 0;
+  const otherOnline = otherParticipant && presence.online.includes(otherParticipant.id);
 
   return (
     <div className="message-view">
@@ -153,13 +255,20 @@ function MessageView({ conversation, currentUser, onMessageSent }) {
         </div>
         <div>
           <h3>
-            {otherParticipant?.full_name ||
+            {conversation.name ||
+              otherParticipant?.full_name ||
               otherParticipant?.username ||
               'Unknown User'}
           </h3>
           <span className="user-type-badge">
             {otherParticipant?.user_type}
           </span>
+          {otherOnline && <span className="presence-online">online</span>}
+          {someoneTyping && (
+            <span className="typing-indicator">
+              {conversation.is_group ? 'Someone is typing…' : 'typing…'}
+            </span>
+          )}
         </div>
       </div>
 
@@ -179,7 +288,9 @@ function MessageView({ conversation, currentUser, onMessageSent }) {
                   key={message.id}
                   className={`message ${
                     isSentByMe ? 'sent' : 'received'
-                  } ${message.is_system_message ? 'system' : ''}`}
+                  } ${message.is_system_message ? 'system' : ''} ${
+                    message.pending ? 'pending' : ''
+                  }`}
                 >
                   {message.content && (
                     <div className="message-content">
@@ -198,6 +309,7 @@ function MessageView({ conversation, currentUser, onMessageSent }) {
                       </div>
                       <button
                         className="download-btn"
+                        disabled={message.pending}
                         onClick={() =>
                           handleDownloadFile(
                             message.file_path,
@@ -255,7 +367,7 @@ function MessageView({ conversation, currentUser, onMessageSent }) {
             <input
               type="text"
               value={newMessage}
-              onChange={(e) => setNewMessage(e.target.value)}
+              onChange={handleInputChange}
               placeholder="Type a message..."
               disabled={sending}
               className="message-input"
@@ -12,12 +12,18 @@ const api = axios.create({
 });
 
 // Request interceptor to add token to headers
+// Read-your-writes token from the last write; sent back so reads right after it skip lagging replicas
+let primaryUntil = null;
+
 api.interceptors.request.use(
   (config) => {
     const accessToken = localStorage.getItem('access_token');
     if (accessToken) {
       config.headers.Authorization = `Bearer ${accessToken}`;
     }
+    if (primaryUntil) {
+      config.headers['X-Primary-Until'] = primaryUntil;
+    }
     return config;
   },
   (error) => {
@@ -28,6 +34,9 @@ api.interceptors.request.use(
 // Response interceptor to handle token refresh
 api.interceptors.response.use(
   (response) => {
+    if (response.headers['x-primary-until']) {
+      primaryUntil = response.headers['x-primary-until'];
+    }
     return response;
   },
   async (error) => {
@@ -88,29 +97,48 @@ export const authAPI = {
 // Messaging API
 export const messagingAPI = {
   getConversations: () => api.get('/messages/conversations'),
+  getUnreadCounts: () => api.get('/messages/unread'),
   getMessages: (conversationId, page = 1, perPage = 50) =>
     api.get(`/messages/conversations/${conversationId}/messages`, {
       params: { page, per_page: perPage },
     }),
-  sendMessage: (conversationId, content, file = null) => {
+  // clientMessageId makes retries safe: the server returns the original message for a repeated id
+  sendMessage: (conversationId, content, file = null, clientMessageId = null) => {
     const formData = new FormData();
     if (content) formData.append('content', content);
     if (file) formData.append('file', file);
 
-    return api.post(`/messages/conversations/${conversationId}/send`, formData, {
-      headers: {
-        'Content-Type': 'multipart/form-data',
-      },
-    });
+    const headers = { 'Content-Type': 'multipart/form-data' };
+    if (clientMessageId) headers['Idempotency-Key'] = clientMessageId;
+
+    return api.post(`/messages/conversations/${conversationId}/send`, formData, { headers });
   },
   downloadFile: (filename) =>
     api.get(`/messages/files/${filename}`, {
       responseType: 'blob',
     }),
+  getFileUrl: (filename) =>
+    api.get(`/messages/files/${filename}/url`),
   markAsRead: (conversationId) =>
     api.post(`/messages/conversations/${conversationId}/mark-read`),
+  sendTyping: (conversationId, typing = true) =>
+    api.post(`/messages/conversations/${conversationId}/typing`, { typing }),
+  getPresence: (conversationId) =>
+    api.get(`/messages/conversations/${conversationId}/presence`),
   startConversation: (recipientId) =>
     api.post('/messages/conversations/start', { recipient_id: recipientId }),
+  createGroup: (name, memberIds) =>
+    api.post('/messages/groups', { name, member_ids: memberIds }),
+  getMembers: (conversationId, page = 1, perPage = 100) =>
+    api.get(`/messages/conversations/${conversationId}/members`, {
+      params: { page, per_page: perPage },
+    }),
+  addMembers: (conversationId, userIds) =>
+    api.post(`/messages/conversations/${conversationId}/members`, {
+      user_ids: userIds,
+    }),
+  removeMember: (conversationId, userId) =>
+    api.delete(`/messages/conversations/${conversationId}/members/${userId}`),
 };
 
 // Jobs API